@@ -1,5 +1,40 @@
 from django.contrib import admin
-from .models import Textbook, Order, OrderItem
+from django.utils import timezone
+from .models import Textbook, Order, OrderItem, Task
+from .choices import registry as choice_registry
+from .pagination import EstimatedCountPaginator
+
+class LevelListFilter(admin.SimpleListFilter):
+    """
+    Filter by academic level, offering the known levels.
+
+    The default filter for a plain CharField lists the distinct values
+    found in the table, which means scanning every order. Orders storing
+    a level by its display name ("ND 1") are matched too.
+    """
+    title = 'level'
+    parameter_name = 'level'
+
+    def lookups(self, request, model_admin):
+        return list(choice_registry['level'])
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(level__in=choice_registry['level'].stored_values(self.value()))
+        return queryset
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Base admin for tables that grow without bound.
+
+    Totals are estimated rather than counted, and the unfiltered total is
+    not counted again beside filtered results. Search fields should use
+    exact or ``prefix`` lookups on indexed columns, such as
+    ``reference__exact``; ``icontains`` scans the whole table, and so
+    does ``startswith`` on SQLite (see core.models.Prefix).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(Textbook)
 class TextbookAdmin(admin.ModelAdmin):
@@ -9,27 +44,57 @@ class TextbookAdmin(admin.ModelAdmin):
     """
     list_display = ('title', 'department', 'level', 'price')
     list_filter = ('department', 'level')
-    search_fields = ('title', 'department')
+    list_select_related = ('department',)
+    search_fields = ('title', 'department__name')
     ordering = ('title',)
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdmin):
     """
     Admin configuration for OrderItem model.
     Customizes how order items are displayed and managed in the admin interface.
+    
+    Search matches an exact order reference or the start of the cached
+    book title (case-sensitive), both of which are indexed.
     """
     list_display = ('order', 'textbook', 'quantity', 'price')
     list_filter = ('order__status',)
-    search_fields = ('order__reference', 'textbook__title')
+    list_select_related = ('order', 'textbook')
+    search_fields = ('order__reference__exact', 'book_title__prefix')
+    raw_id_fields = ('order', 'textbook')
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     """
     Admin configuration for Order model.
     Customizes how orders are displayed and managed in the admin interface.
+    
+    Search matches an exact reference, or the start of a matric number or
+    student name (case-sensitive), all of which are indexed.
     """
     list_display = ('reference', 'student_name', 'matric_number', 'department', 'level', 'status', 'total_amount', 'created_at')
-    list_filter = ('status', 'department', 'level', 'created_at')
-    search_fields = ('reference', 'student_name', 'student_email', 'matric_number')
-    readonly_fields = ('created_at',)
+    list_filter = ('status', 'department', LevelListFilter, 'created_at')
+    list_select_related = ('department',)
+    search_fields = ('reference__exact', 'matric_number__prefix', 'student_name__prefix')
+    readonly_fields = ('created_at', 'legacy_department')
     ordering = ('-created_at',)
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    """
+    Admin configuration for Task model.
+    Lists queued background tasks and lets staff retry failed ones.
+    """
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('name__startswith',)
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    ordering = ('-run_at',)
+    actions = ('retry',)
+
+    @admin.action(description='Retry selected tasks')
+    def retry(self, request, queryset):
+        retried = queryset.exclude(status='running').update(
+            status='queued', attempts=0, run_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f'{retried} task(s) queued again.')
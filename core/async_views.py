@@ -0,0 +1,154 @@
+"""
+Async-native catalogue reads.
+
+These views mirror the read side of TextbookViewSet (list, retrieve and
+filters) as ``async def`` Django views, so under ASGI a slow client waiting
+on a catalogue page does not hold a worker thread. Database access goes
+through the async ORM (``aaggregate``, ``afirst``, ``aget`` and async
+iteration) and responses share the JSON shape, pagination cursors,
+conditional GET handling and catalogue cache of the synchronous endpoints.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from .cache import get_catalogue_cache
+from .choices import registry as choice_registry
+from .fastpath import compile_serializer, ordering_columns
+from .pagination import KeysetCursorPagination
+from .renderers import FastJSONRenderer
+from .serializers import TextbookSerializer
+from .views import catalogue_validators, filters_validators, textbook_queryset
+
+renderer = FastJSONRenderer()
+
+
+async def catalogue_queryset(params, fields=None):
+    """
+    Build the filtered catalogue queryset without blocking the event loop.
+
+    Searching may read the database while the queryset is built, so that
+    case runs in a thread; plain filters stay on the loop once the
+    department map, which serialization also reads, is loaded.
+    """
+    await choice_registry.aget('department')
+    if params.get('search'):
+        return await sync_to_async(textbook_queryset)(params, fields)
+    return textbook_queryset(params, fields)
+
+
+def sparse_fields(request):
+    """
+    Parse ``?fields=`` as TextbookViewSet does.
+
+    Returns:
+        tuple: The requested fields (or None), and the 400 response to send
+        instead if the parameter is invalid (or None)
+    """
+    try:
+        return TextbookSerializer.requested_fields(request.GET), None
+    except ValidationError as exc:
+        return None, json_response(exc.detail, status=400)
+
+
+def json_response(data, status=200, headers=None):
+    """Render data exactly as the synchronous views' JSON renderer does."""
+    return HttpResponse(renderer.render(data), status=status, content_type='application/json', headers=headers)
+
+
+async def cached_json_response(request, namespace, validators, producer):
+    """
+    Serve data from the catalogue cache, awaiting ``producer`` on a miss.
+
+    The ETag/Last-Modified headers from ``validators`` are copied onto the
+    response, and X-Cache reports whether it was a HIT or MISS. The body is
+    cached under the ETag, as TextbookViewSet.cached_response does.
+    """
+    # Paginated responses embed absolute links, so the origin is part of the key.
+    origin = f"{request.scheme}://{request.get_host()}"
+    etag = validators['ETag'].strip('"')
+    data, hit = await get_catalogue_cache().aget_or_set(
+        f"{origin}/async:{namespace}:{etag}", request.GET, producer
+    )
+    headers = {'X-Cache': 'HIT' if hit else 'MISS'}
+    for header in ('ETag', 'Last-Modified'):
+        if header in validators:
+            headers[header] = validators[header]
+    return json_response(data, headers=headers)
+
+
+@require_GET
+async def textbook_list(request):
+    """
+    List textbooks, paginated with the same keyset cursors as GET /textbooks/.
+
+    Filters:
+        department: Filter by academic department
+        level: Filter by academic level
+        search: Ranked prefix search over title, course code and description
+        fields: Sparse fieldset, such as ``card``
+    """
+    fields, invalid = sparse_fields(request)
+    if invalid is not None:
+        return invalid
+    queryset = await catalogue_queryset(request.GET, fields)
+    summary = await queryset.aaggregate(count=Count('id'), last_modified=Max('updated_at'))
+    validators, conditional = catalogue_validators(
+        request, 'list', summary['last_modified'], f"count={summary['count']}"
+    )
+    if conditional is not None:
+        return conditional
+
+    async def produce():
+        drf_request = Request(request)
+        paginator = KeysetCursorPagination()
+        compiled = compile_serializer(TextbookSerializer, fields)
+        rows = compiled.values(queryset, *ordering_columns(paginator))
+        page = await paginator.apaginate_queryset(rows, drf_request)
+        data = compiled.serialize(page, {'request': drf_request})
+        return paginator.get_paginated_response(data).data
+
+    return await cached_json_response(request, 'list', validators, produce)
+
+
+@require_GET
+async def textbook_detail(request, pk):
+    """
+    Retrieve a textbook, as GET /textbooks/{id}/ does.
+    """
+    fields, invalid = sparse_fields(request)
+    if invalid is not None:
+        return invalid
+    queryset = (await catalogue_queryset(request.GET, fields)).filter(pk=pk)
+    last_modified = await queryset.values_list('updated_at', flat=True).afirst()
+    validators, conditional = catalogue_validators(
+        request, f"detail:{pk}", last_modified, f"exists={last_modified is not None}"
+    )
+    if conditional is not None:
+        return conditional
+    if last_modified is None:
+        return json_response({'detail': 'No Textbook matches the given query.'}, status=404)
+
+    async def produce():
+        textbook = await queryset.aget()
+        return TextbookSerializer(textbook, fields=fields, context={'request': Request(request)}).data
+
+    return await cached_json_response(request, f"detail:{pk}", validators, produce)
+
+
+@require_GET
+async def textbook_filters(request):
+    """
+    Get available filter options for textbooks.
+
+    Returns:
+        dict: Available departments and levels for filtering
+    """
+    await choice_registry.aget('department')
+    options, headers, conditional = filters_validators(request)
+    if conditional is not None:
+        return conditional
+    return json_response(options.data, headers=headers)
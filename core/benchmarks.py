@@ -0,0 +1,215 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks run against a throwaway test database so they never touch the
+configured one.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Department, Order, OrderItem, Textbook
+
+SUBJECTS = (
+    'Programming', 'Data Structures', 'Algorithms', 'Thermodynamics', 'Fluid Mechanics',
+    'Circuit Theory', 'Organic Chemistry', 'Microbiology', 'Financial Accounting',
+    'Cost Accounting', 'Marketing Principles', 'Broadcasting', 'Statistics',
+    'Calculus', 'Surveying', 'Food Processing', 'Digital Electronics', 'Databases',
+)
+QUALIFIERS = (
+    'Introduction to', 'Principles of', 'Advanced', 'Applied', 'Fundamentals of', 'Essentials of',
+)
+COURSE_PREFIXES = ('COM', 'CTE', 'CVE', 'EEE', 'MEE', 'CHE', 'SLT', 'FDT', 'ACC', 'BAM', 'MKT', 'MAC')
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """
+    Run the enclosed block against a freshly migrated test database.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def seed_textbooks(count, seed=0, batch_size=5000, stock=1000):
+    """
+    Insert ``count`` synthetic textbooks spread over every department and level.
+
+    Args:
+        count (int): Number of textbooks to create
+        seed (int): Random seed, so datasets are reproducible
+        batch_size (int): Rows per bulk insert
+        stock (int): Initial stock of every textbook
+
+    Returns:
+        int: Number of textbooks created
+    """
+    rng = random.Random(seed)
+    departments = list(Department.objects.order_by('id').values_list('id', flat=True))
+    levels = [choice[0] for choice in Textbook.LEVEL_CHOICES]
+    offset = Textbook.objects.count()
+    batch = []
+    for index in range(offset, offset + count):
+        subject = rng.choice(SUBJECTS)
+        batch.append(Textbook(
+            title=f'{rng.choice(QUALIFIERS)} {subject} {index}',
+            course_code=f'{rng.choice(COURSE_PREFIXES)} {rng.randint(100, 499)}',
+            department_id=departments[index % len(departments)],
+            level=levels[(index // len(departments)) % len(levels)],
+            price=Decimal(rng.randint(1500, 9000)),
+            description=f'Course text covering {subject.lower()} for {rng.choice(levels).upper()} students.',
+            stock=stock,
+            is_popular=index % 17 == 0,
+            is_new=index % 23 == 0,
+        ))
+        if len(batch) >= batch_size:
+            Textbook.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Textbook.objects.bulk_create(batch)
+    return count
+
+
+def seed_orders(count, items_per_order=3, seed=0, batch_size=2000):
+    """
+    Insert ``count`` synthetic orders spread over the last 180 days.
+
+    Each order gets between one and ``items_per_order`` items drawn from the
+    existing textbooks. Stock is not touched.
+
+    Returns:
+        int: Number of orders created
+    """
+    rng = random.Random(seed)
+    textbooks = list(Textbook.objects.values_list('id', 'title', 'course_code', 'price', 'department', 'level'))
+    statuses = ('completed', 'completed', 'pending', 'failed')
+    now = timezone.now()
+    offset = Order.objects.count()
+
+    for start in range(0, count, batch_size):
+        orders, carts = [], []
+        for index in range(offset + start, offset + min(start + batch_size, count)):
+            cart = rng.sample(textbooks, rng.randint(1, min(items_per_order, len(textbooks))))
+            quantities = [rng.randint(1, 3) for _ in cart]
+            student = cart[0]
+            orders.append(Order(
+                reference=f'BENCH-{index:08d}',
+                status=rng.choice(statuses),
+                total_amount=sum(book[3] * quantity for book, quantity in zip(cart, quantities)),
+                student_name=f'Student {index % 5000}',
+                student_email=f'student{index % 5000}@example.com',
+                matric_number=f'F/ND/{index % 5000:05d}',
+                department_id=student[4],
+                level=student[5],
+                phone_number='08000000000',
+            ))
+            carts.append(list(zip(cart, quantities)))
+        Order.objects.bulk_create(orders)
+        for order in orders:
+            # Spread creation times so date filters and cursors have work to do.
+            order.created_at = now - timedelta(minutes=rng.randint(0, 180 * 24 * 60))
+        Order.objects.bulk_update(orders, ['created_at'])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, textbook_id=book[0], book_title=book[1], course_code=book[2],
+                      price=book[3], quantity=quantity)
+            for order, cart in zip(orders, carts)
+            for book, quantity in cart
+        ])
+    return count
+
+
+def measure(func, repeat):
+    """
+    Call ``func`` repeatedly and return each call's latency in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    """Return the ``pct`` percentile of samples using nearest-rank."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(samples):
+    """
+    Summarize latency samples.
+
+    Returns:
+        dict: count, mean, p50, p95 and p99 in milliseconds
+    """
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples), 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+    }
+
+
+def run_scenario(request, repeat, warmup=5):
+    """
+    Time a request-issuing callable and summarize latency and throughput.
+
+    Args:
+        request: Callable taking the iteration number and returning a response
+        repeat (int): Timed iterations
+        warmup (int): Untimed iterations run first
+
+    Returns:
+        dict: summarize() output plus ``throughput_rps`` and ``errors``
+    """
+    for iteration in range(warmup):
+        request(-1 - iteration)
+    samples, errors = [], 0
+    started = time.perf_counter()
+    for iteration in range(repeat):
+        call_started = time.perf_counter()
+        response = request(iteration)
+        samples.append((time.perf_counter() - call_started) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize(samples),
+        'throughput_rps': round(repeat / elapsed, 2) if elapsed else 0.0,
+        'errors': errors,
+    }
+
+
+def compare(results, baseline):
+    """
+    Compare scenario results against a baseline run.
+
+    Returns:
+        dict: Per scenario, the relative change of p50, p99 and throughput
+        (e.g. ``-0.25`` is 25% lower than the baseline)
+    """
+    changes = {}
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            metric: round((current[metric] - previous[metric]) / previous[metric], 4) if previous[metric] else None
+            for metric in ('p50_ms', 'p99_ms', 'throughput_rps')
+        }
+    return changes
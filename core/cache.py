@@ -0,0 +1,324 @@
+"""
+Versioned read-through cache for the public textbook catalogue.
+
+Cached catalogue responses are keyed by a generation counter plus the
+normalized query parameters of the request. Any change to a textbook bumps
+the generation, which orphans every previously cached entry at once; stale
+entries simply expire from the backend.
+
+The backend is configured through the ``CATALOGUE_CACHE`` setting::
+
+    CATALOGUE_CACHE = {
+        'BACKEND': 'core.cache.LocalMemoryBackend',
+        'OPTIONS': {},
+        'TIMEOUT': 300,
+        'KEY_PREFIX': 'catalogue',
+    }
+
+Backends implement the small Redis command subset used here (``get``,
+``set`` with ``ex``/``nx``, ``incr`` and ``delete``), so a ``redis.Redis``
+client or any object with the same interface can be plugged in through
+RedisBackend.
+"""
+import hashlib
+import json
+import threading
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+DEFAULT_SETTINGS = {
+    'BACKEND': 'core.cache.LocalMemoryBackend',
+    'OPTIONS': {},
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'catalogue',
+}
+
+
+class LocalMemoryBackend:
+    """
+    Thread-safe in-process backend with per-key expiry.
+
+    Args:
+        max_entries (int): Entries kept before the oldest ones are evicted
+    """
+    # Operations never wait on I/O, so async callers may use it directly.
+    blocking = False
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return None if entry is None else entry[0]
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return False
+            if key not in self._data and len(self._data) >= self.max_entries:
+                self._data.pop(next(iter(self._data)))
+            expires_at = time.monotonic() + ex if ex else None
+            self._data[key] = (value, expires_at)
+            return True
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[0]) + 1 if entry else 1
+            self._data[key] = (value, entry[1] if entry else None)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            return int(self._data.pop(key, None) is not None)
+
+
+class RedisBackend:
+    """
+    Backend delegating to a Redis client.
+
+    Args:
+        client: Object implementing the redis-py ``get``/``set``/``incr``/
+            ``delete`` interface. Built from ``url`` when omitted.
+        url (str): Redis connection URL, used only when ``client`` is None
+    """
+    def __init__(self, client=None, url='redis://localhost:6379/0'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get(self, key):
+        value = self.client.get(key)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        return value
+
+    def set(self, key, value, ex=None, nx=False):
+        return bool(self.client.set(key, value, ex=ex, nx=nx))
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def delete(self, key):
+        return self.client.delete(key)
+
+
+def normalize_params(params):
+    """
+    Build a canonical, order-independent string from query parameters.
+
+    Blank values are dropped and the remaining values are stripped, so
+    ``?level=ND 1&search=`` and ``?level= ND 1`` share a cache entry.
+
+    Args:
+        params: A QueryDict or mapping of parameter names to values
+
+    Returns:
+        str: URL-encoded, sorted parameter string
+    """
+    if hasattr(params, 'lists'):
+        items = params.lists()
+    else:
+        items = ((key, value if isinstance(value, (list, tuple)) else [value]) for key, value in params.items())
+    pairs = []
+    for key, values in items:
+        for value in values:
+            value = str(value).strip()
+            if value:
+                pairs.append((key, value))
+    return urlencode(sorted(pairs))
+
+
+def async_wrap(func):
+    """Wrap a non-blocking callable so it can be awaited."""
+    async def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+
+
+class CatalogueCache:
+    """
+    Generation-versioned cache for catalogue responses.
+
+    Args:
+        backend: Storage backend (see LocalMemoryBackend)
+        timeout (int): Seconds each cached response lives
+        key_prefix (str): Namespace for every key written by this cache
+    """
+    def __init__(self, backend, timeout=300, key_prefix='catalogue'):
+        self.backend = backend
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def generation_key(self):
+        return f'{self.key_prefix}:generation'
+
+    def generation(self):
+        """
+        Return the current catalogue generation.
+
+        A missing counter (first use or eviction) is seeded from the clock
+        rather than zero so entries from an earlier counter are never reused.
+        """
+        value = self.backend.get(self.generation_key)
+        if value is None:
+            self.backend.set(self.generation_key, time.time_ns(), nx=True)
+            value = self.backend.get(self.generation_key)
+        return int(value)
+
+    def invalidate(self):
+        """Bump the generation, orphaning every cached catalogue response."""
+        if self.backend.get(self.generation_key) is None:
+            self.generation()
+        return self.backend.incr(self.generation_key)
+
+    def make_key(self, namespace, params):
+        digest = hashlib.sha1(normalize_params(params).encode('utf-8')).hexdigest()
+        return f'{self.key_prefix}:{self.generation()}:{namespace}:{digest}'
+
+    def get_or_set(self, namespace, params, producer):
+        """
+        Return cached data for a request, computing it on a miss.
+
+        Args:
+            namespace (str): Logical endpoint name, e.g. ``list`` or ``detail:12``
+            params: Query parameters identifying the response variant
+            producer: Callable returning JSON-serializable response data
+
+        Returns:
+            tuple: ``(data, hit)`` where ``hit`` tells whether the cache served it
+        """
+        key, data = self.lookup(namespace, params)
+        if data is not None:
+            return data, True
+        data = producer()
+        self.store(key, data)
+        return data, False
+
+    async def aget_or_set(self, namespace, params, producer):
+        """
+        Async counterpart of get_or_set taking an async ``producer``.
+
+        Backends that block on I/O (anything without ``blocking = False``)
+        are called from a worker thread so the event loop keeps running.
+        """
+        if getattr(self.backend, 'blocking', True):
+            lookup = sync_to_async(self.lookup, thread_sensitive=False)
+            store = sync_to_async(self.store, thread_sensitive=False)
+        else:
+            lookup, store = async_wrap(self.lookup), async_wrap(self.store)
+        key, data = await lookup(namespace, params)
+        if data is not None:
+            return data, True
+        data = await producer()
+        await store(key, data)
+        return data, False
+
+    def lookup(self, namespace, params):
+        """
+        Find the cached data for a request and record the hit or miss.
+
+        Returns:
+            tuple: ``(key, data)`` with ``data`` None on a miss
+        """
+        key = self.make_key(namespace, params)
+        cached = self.backend.get(key)
+        self._record(hit=cached is not None)
+        return key, None if cached is None else json.loads(cached)
+
+    def store(self, key, data):
+        self.backend.set(key, json.dumps(data, cls=JSONEncoder), ex=self.timeout)
+
+    def _record(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """
+        Get hit/miss counters for this process.
+
+        Returns:
+            dict: hits, misses, hit_ratio and the current generation
+        """
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else 0.0,
+            'generation': self.generation(),
+        }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+
+_catalogue_cache = None
+_catalogue_cache_lock = threading.Lock()
+
+
+def get_catalogue_cache():
+    """
+    Get the process-wide catalogue cache, building it from settings on first use.
+    """
+    global _catalogue_cache
+    if _catalogue_cache is None:
+        with _catalogue_cache_lock:
+            if _catalogue_cache is None:
+                config = {**DEFAULT_SETTINGS, **getattr(settings, 'CATALOGUE_CACHE', {})}
+                backend = import_string(config['BACKEND'])(**config['OPTIONS'])
+                _catalogue_cache = CatalogueCache(
+                    backend,
+                    timeout=config['TIMEOUT'],
+                    key_prefix=config['KEY_PREFIX'],
+                )
+    return _catalogue_cache
+
+
+def invalidate_catalogue():
+    """
+    Invalidate the catalogue once the current transaction commits.
+
+    Deferring to commit prevents a concurrent reader from caching the old
+    rows under the new generation.
+    """
+    transaction.on_commit(lambda: get_catalogue_cache().invalidate())
+
+
+@receiver(setting_changed)
+def reset_catalogue_cache(setting, **kwargs):
+    global _catalogue_cache
+    if setting == 'CATALOGUE_CACHE':
+        _catalogue_cache = None
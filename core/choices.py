@@ -0,0 +1,188 @@
+"""
+Lookup maps for choice fields, built once per process.
+
+Storefront filters arrive as display names ("Computer Science", "ND 1"),
+while staff tools and stored rows use keys. A ChoiceMap answers both with
+dict lookups instead of scanning the choices on every request, and the
+registry holds one map per choice set. Departments live in their own
+table; their map also resolves primary keys, is loaded on first use and
+is dropped whenever a department changes (see core.signals), so
+serializers and filters never join or query for them.
+"""
+import hashlib
+import json
+import threading
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+
+from .models import Department, Order, Textbook
+
+FilterOptions = namedtuple('FilterOptions', ['data', 'etag'])
+
+
+class ChoiceMap:
+    """
+    Bidirectional map between choice keys and display names.
+
+    Lookups ignore case and surrounding whitespace, and accept either the
+    key or the display name; when a display name equals another choice's
+    key, the key wins.
+
+    Args:
+        choices: Iterable of ``(key, display name)`` pairs
+    """
+    def __init__(self, choices):
+        self.choices = tuple((str(key), str(label)) for key, label in choices)
+        self.labels = dict(self.choices)
+        self._lookup = {label.casefold(): key for key, label in self.choices}
+        self._lookup.update((key.casefold(), key) for key, _ in self.choices)
+
+    def resolve(self, value):
+        """Return the key for a key or display name, or None if it matches no choice."""
+        if not value:
+            return None
+        return self._lookup.get(str(value).strip().casefold())
+
+    def label(self, key):
+        """Return the display name of a key, or None for an unknown key."""
+        return self.labels.get(key)
+
+    def stored_values(self, value):
+        """
+        Return every stored form of a choice: the value itself, its key and its display name.
+        """
+        key = self.resolve(value)
+        if key is None:
+            return {value}
+        return {value, key, self.labels[key]}
+
+    def __contains__(self, key):
+        return key in self.labels
+
+    def __iter__(self):
+        return iter(self.choices)
+
+    def __len__(self):
+        return len(self.choices)
+
+
+class DepartmentMap(ChoiceMap):
+    """
+    ChoiceMap over Department rows, keyed by code.
+
+    The "unknown" department is left out of the choices and lookups, so it
+    is never offered as a filter or accepted for a textbook; it is kept as
+    ``unknown`` and still rendered by code().
+
+    Args:
+        departments: Iterable of Department instances
+    """
+    def __init__(self, departments):
+        departments = list(departments)
+        self.unknown = next((d for d in departments if d.code == Department.UNKNOWN_CODE), None)
+        catalogue = [department for department in departments if department is not self.unknown]
+        super().__init__((department.code, department.name) for department in catalogue)
+        self.by_code = {department.code: department for department in catalogue}
+        self.codes = {department.pk: department.code for department in departments}
+
+    def department(self, value):
+        """Return the Department for a code or name, or None if it matches none."""
+        return self.by_code.get(self.resolve(value))
+
+    def code(self, pk):
+        """Return the code of a department primary key, or None if it is unknown."""
+        return self.codes.get(pk)
+
+
+class ChoiceRegistry:
+    """
+    Named ChoiceMaps, either static or loaded lazily.
+
+    A source is an iterable of ``(key, display name)`` pairs, built into a
+    map immediately, or a callable returning such pairs or a ChoiceMap,
+    called on first use and again after invalidate().
+    """
+    def __init__(self):
+        self._sources = {}
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, source):
+        with self._lock:
+            self._sources[name] = source
+            self._maps.pop(name, None)
+            if not callable(source):
+                self._maps[name] = ChoiceMap(source)
+
+    def get(self, name):
+        choice_map = self._maps.get(name)
+        if choice_map is None:
+            source = self._sources[name]
+            choice_map = source()
+            if not isinstance(choice_map, ChoiceMap):
+                choice_map = ChoiceMap(choice_map)
+            with self._lock:
+                # Keep the map unless the source changed meanwhile.
+                if self._sources.get(name) is source:
+                    self._maps.setdefault(name, choice_map)
+        return choice_map
+
+    __getitem__ = get
+
+    async def aget(self, name):
+        """Async get(); a map that still has to be loaded is built in a thread."""
+        choice_map = self._maps.get(name)
+        if choice_map is None:
+            choice_map = await sync_to_async(self.get)(name)
+        return choice_map
+
+    def invalidate(self, name):
+        """Drop a lazily loaded map so the next lookup reloads it."""
+        with self._lock:
+            if callable(self._sources.get(name)):
+                self._maps.pop(name, None)
+
+
+registry = ChoiceRegistry()
+registry.register('department', lambda: DepartmentMap(Department.objects.order_by('id')))
+registry.register('level', Textbook.LEVEL_CHOICES)
+registry.register('order_status', Order._meta.get_field('status').choices)
+
+
+def department_code(pk):
+    """
+    Return the code of a department primary key.
+
+    A key missing from the map belongs to a department created by another
+    process, so the map is reloaded once before giving up.
+    """
+    code = registry['department'].code(pk)
+    if code is None and pk is not None:
+        registry.invalidate('department')
+        code = registry['department'].code(pk)
+    return code
+
+
+_filter_options = (None, None)
+
+
+def filter_options():
+    """
+    Get the body of the textbook filters endpoint with its ETag.
+
+    The body is built once and reused for as long as the department and
+    level maps stay the same.
+    """
+    global _filter_options
+    maps = (registry['department'], registry['level'])
+    cached_maps, options = _filter_options
+    if cached_maps != maps:
+        data = {
+            'departments': [label for _, label in maps[0]],
+            'levels': [label for _, label in maps[1]],
+        }
+        digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+        options = FilterOptions(data, f'"{digest}"')
+        _filter_options = (maps, options)
+    return options
@@ -0,0 +1,68 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .choices import department_code
+
+ORDER_COLUMNS = (
+    'reference', 'status', 'created_at', 'student_name', 'student_email', 'matric_number',
+    'department', 'level', 'phone_number', 'total_amount',
+)
+ITEM_COLUMNS = ('textbook_id', 'book_title', 'course_code', 'quantity', 'price')
+
+
+class Echo:
+    """File-like object whose write() hands the value straight back to the caller."""
+    def write(self, value):
+        return value
+
+
+def order_value(order, column):
+    """Read an export column; departments are written as their code without loading the row."""
+    if column == 'department':
+        return department_code(order.department_id)
+    return getattr(order, column)
+
+
+def stream_csv(orders):
+    """
+    Yield CSV lines for orders, one line per order item.
+
+    Orders without items still produce one line with the item columns blank.
+
+    Args:
+        orders: Iterable of Order instances with ``items`` prefetched
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(ORDER_COLUMNS + ITEM_COLUMNS)
+    for order in orders:
+        order_values = [order_value(order, column) for column in ORDER_COLUMNS]
+        order_values[ORDER_COLUMNS.index('created_at')] = order.created_at.isoformat()
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(order_values + [''] * len(ITEM_COLUMNS))
+        for item in items:
+            yield writer.writerow(order_values + [getattr(item, column) for column in ITEM_COLUMNS])
+
+
+def stream_ndjson(orders):
+    """
+    Yield one JSON document per order, with its items nested, per line.
+
+    Args:
+        orders: Iterable of Order instances with ``items`` prefetched
+    """
+    for order in orders:
+        document = {column: order_value(order, column) for column in ORDER_COLUMNS}
+        document['items'] = [
+            {column: getattr(item, column) for column in ITEM_COLUMNS}
+            for item in order.items.all()
+        ]
+        yield json.dumps(document, cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+}
@@ -0,0 +1,307 @@
+"""
+Compiled serialization for read-only list responses.
+
+ModelSerializer resolves every field of every row through attribute
+lookups, ``get_attribute`` and ``to_representation``. For list endpoints
+that only read, CompiledSerializer inspects a serializer class once,
+fetches exactly the columns it renders with ``QuerySet.values()`` and
+builds the response dicts directly. Field types whose representation is
+the database value itself are copied as-is; the rest reuse the DRF field's
+own ``to_representation``, so the output matches the serializer exactly.
+
+Related fields that can render a primary key on their own take part by
+defining ``pk_representation(pk)``, and fields that need the request to
+render a column by defining ``context_representation(context)``.
+Serializers with fields the compiler does not understand (method fields,
+dotted sources, other custom field classes...) are not compiled and their
+views keep using the regular DRF path.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .profiling import timed_serialization
+
+# Representations that return a database value unchanged.
+IDENTITY_REPRESENTATIONS = {
+    serializers.BooleanField.to_representation,
+    serializers.CharField.to_representation,
+    serializers.ChoiceField.to_representation,
+    serializers.IntegerField.to_representation,
+}
+
+# Fields whose representation is computed from the value alone.
+CONVERTED_FIELDS = (
+    serializers.BigIntegerField,
+    serializers.DateField,
+    serializers.DateTimeField,
+    serializers.DecimalField,
+    serializers.FloatField,
+    serializers.TimeField,
+)
+
+
+class NotCompilable(Exception):
+    """Raised when a serializer cannot be compiled."""
+
+
+class CompiledSerializer:
+    """
+    Precomputed plan for rendering ``values()`` rows like a ModelSerializer.
+
+    Args:
+        serializer_class: A ModelSerializer subclass
+        fields: Field names to render, for serializers accepting a
+            ``fields`` argument (see SparseFieldsetMixin)
+
+    Raises:
+        NotCompilable: If any readable field is not supported
+    """
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class() if fields is None else serializer_class(fields=fields)
+        model = serializer.Meta.model
+        self.model = model
+        self.pk = model._meta.pk.attname
+        self.plan = []
+        self.nested = {}
+        columns = {self.pk}
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if isinstance(field, serializers.ListSerializer):
+                self.nested[name] = self.compile_nested(model, source, field.child)
+                self.plan.append((name, self.pk, None))
+                continue
+            model_field = self.model_field(model, source)
+            columns.add(source)
+            self.plan.append((name, source, self.converter(field, model_field)))
+
+        self.columns = tuple(sorted(columns))
+
+    @staticmethod
+    def model_field(model, source):
+        if '.' in source or source == '*':
+            raise NotCompilable(f"Unsupported source {source!r}")
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            raise NotCompilable(f"{source!r} is not a field of {model.__name__}")
+        if not model_field.concrete or model_field.many_to_many:
+            raise NotCompilable(f"{source!r} is not a column of {model.__name__}")
+        return model_field
+
+    @staticmethod
+    def converter(field, model_field):
+        """Return the callable turning a column value into its representation, or None for identity."""
+        representation = type(field).to_representation
+        if isinstance(field, serializers.RelatedField) and hasattr(field, 'pk_representation'):
+            return field.pk_representation
+        if hasattr(field, 'context_representation'):
+            return ContextConverter(field)
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            if field.pk_field is not None or representation is not serializers.PrimaryKeyRelatedField.to_representation:
+                raise NotCompilable(f"{field.field_name!r} customizes its primary key representation")
+            return None
+        if isinstance(field, serializers.FileField):
+            if representation is not serializers.FileField.to_representation:
+                raise NotCompilable(f"{field.field_name!r} customizes its file representation")
+            return FileConverter(field, model_field)
+        if type(field) is serializers.DateTimeField:
+            return DateTimeConverter(field)
+        if isinstance(field, serializers.BigIntegerField) and not getattr(
+            field, 'coerce_to_string', api_settings.COERCE_BIGINT_TO_STRING
+        ):
+            return None
+        if representation in IDENTITY_REPRESENTATIONS:
+            return None
+        if isinstance(field, CONVERTED_FIELDS):
+            return field.to_representation
+        raise NotCompilable(f"{type(field).__name__} {field.field_name!r} is not supported")
+
+    @staticmethod
+    def compile_nested(model, source, child):
+        """Compile a reverse foreign key rendered by a nested ``many=True`` serializer."""
+        try:
+            relation = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            raise NotCompilable(f"{source!r} is not a relation of {model.__name__}")
+        if not isinstance(relation, models.ManyToOneRel):
+            raise NotCompilable(f"{source!r} is not a reverse foreign key")
+        compiled = compile_serializer(type(child))
+        if compiled is None or compiled.model is not relation.related_model:
+            raise NotCompilable(f"Nested serializer for {source!r} is not compilable")
+        return compiled, relation.field.name
+
+    def values(self, queryset, *required):
+        """
+        Turn a queryset into a ``values()`` queryset holding the rendered columns.
+
+        ``required`` names further columns the caller needs, such as the
+        pagination keys. Annotations and extra selects are kept so orderings
+        that refer to them (such as search ranks) still apply.
+        """
+        columns = list(self.columns)
+        for name in (*required, *queryset.query.extra, *queryset.query.annotations):
+            if name not in columns:
+                columns.append(name)
+        return queryset.prefetch_related(None).values(*columns)
+
+    @timed_serialization
+    def serialize(self, rows, context=None):
+        """
+        Render ``values()`` rows the way the serializer would render the instances.
+
+        Nested lists are loaded with one query per relation.
+        """
+        rows = list(rows)
+        context = context or {}
+        children = {
+            name: self.load_children(compiled, foreign_key, rows, context)
+            for name, (compiled, foreign_key) in self.nested.items()
+        }
+        plan = [
+            (name, source, children[name].__getitem__ if name in children else bound(convert, context))
+            for name, source, convert in self.plan
+        ]
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, convert in plan:
+                value = row[source]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+    def load_children(self, compiled, foreign_key, rows, context):
+        pks = [row[self.pk] for row in rows]
+        grouped = {pk: [] for pk in pks}
+        if not pks:
+            return grouped
+        # Same filter and ordering as prefetch_related, so items come back
+        # in the order the DRF path renders them.
+        queryset = compiled.model._default_manager.filter(**{f'{foreign_key}__in': pks})
+        columns = compiled.columns if foreign_key in compiled.columns else (*compiled.columns, foreign_key)
+        children = list(queryset.values(*columns))
+        rendered = compiled.serialize(children, context)
+        for child, representation in zip(children, rendered):
+            grouped[child[foreign_key]].append(representation)
+        return grouped
+
+    def __repr__(self):
+        return f"<CompiledSerializer {self.model.__name__} columns={self.columns}>"
+
+
+class FileConverter:
+    """Render a stored file name as FileField does: its (absolute) URL, or the name."""
+    def __init__(self, field, model_field):
+        self.use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+        self.storage = model_field.storage
+
+    def bind(self, context):
+        request = context.get('request')
+        if not self.use_url:
+            return lambda name: name or None
+        if request is None:
+            return lambda name: self.storage.url(name) if name else None
+        return lambda name: request.build_absolute_uri(self.storage.url(name)) if name else None
+
+
+class DateTimeConverter:
+    """
+    Render aware datetimes in ISO 8601 as DateTimeField does.
+
+    DateTimeField looks the current timezone up for every value; here it
+    is resolved once per response. Other formats and naive values are left
+    to the field.
+    """
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self, context):
+        field = self.field
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if output_format is None or output_format.lower() != ISO_8601:
+            return field.to_representation
+        zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if zone is None:
+            return field.to_representation
+
+        def convert(value):
+            if isinstance(value, str) or value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(zone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+
+class ContextConverter:
+    """Render a column with the converter a field builds for each response's context."""
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self, context):
+        return self.field.context_representation(context)
+
+
+def bound(convert, context):
+    """Bind converters that depend on the serializer context (request, timezone) to it."""
+    bind = getattr(convert, 'bind', None)
+    return convert if bind is None else bind(context)
+
+
+class CompiledListMixin:
+    """
+    View mixin serving ``list`` through the compiled serializer.
+
+    Rows are read with ``values()`` and rendered by compile_serializer;
+    pagination and filtering are unchanged. Views whose serializer cannot
+    be compiled, or that set ``fast_serialization = False``, use DRF's
+    ListModelMixin as before.
+    """
+    fast_serialization = True
+
+    def get_compiled_serializer(self):
+        """Return the CompiledSerializer for this request, or None to use DRF."""
+        if not self.fast_serialization:
+            return None
+        return compile_serializer(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()), *ordering_columns(self.paginator))
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize(page, context))
+        return Response(compiled.serialize(queryset, context))
+
+
+def ordering_columns(paginator):
+    """Return the columns a paginator orders by, which the page rows must carry."""
+    ordering = getattr(paginator, 'ordering', None) or ()
+    if isinstance(ordering, str):
+        ordering = (ordering,)
+    return tuple(field.lstrip('-') for field in ordering)
+
+
+@lru_cache(maxsize=256)
+def compile_serializer(serializer_class, fields=None):
+    """
+    Return the CompiledSerializer for a serializer class, or None if it cannot be compiled.
+
+    Compilation happens once per class and tuple of ``fields``.
+    """
+    try:
+        return CompiledSerializer(serializer_class, fields)
+    except NotCompilable:
+        return None
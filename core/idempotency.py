@@ -0,0 +1,140 @@
+"""
+Idempotent request handling for order creation.
+
+A request is identified by its ``Idempotency-Key`` header or, when the
+header is absent, by the order ``reference`` in the body. The first
+successful response is stored with a fingerprint of the request body in
+the same transaction as the order, so a record exists exactly when its
+order was committed. Retries with the same key and body get the stored
+response back without touching stock; reusing a key for a different body
+is rejected.
+
+Stored responses hold the student's personal details, so records expire
+``IDEMPOTENCY_TTL`` seconds (default one day) after the first request.
+Expired keys are treated as new, and purge_expired() deletes the rows.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL = 24 * 60 * 60
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This idempotency key was already used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this idempotency key conflicted with another one. Please retry.'
+    default_code = 'idempotency_conflict'
+
+
+def idempotency_key(request):
+    """
+    Get the namespaced idempotency key of a request.
+
+    Returns:
+        str: ``key:<header>`` or ``reference:<reference>``, or None if the
+        request carries neither
+
+    Raises:
+        ValidationError: If the header is blank or too long
+    """
+    header = request.headers.get(HEADER)
+    if header is not None:
+        header = header.strip()
+        if not header or len(header) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: f'Must be between 1 and {MAX_KEY_LENGTH} characters.'})
+        return f'key:{header}'
+    reference = request.data.get('reference') if hasattr(request.data, 'get') else None
+    if isinstance(reference, str) and reference.strip():
+        return f'reference:{reference.strip()}'
+    return None
+
+
+def request_fingerprint(data):
+    """Hash a request body so retries can be told apart from key reuse."""
+    if isinstance(data, QueryDict):
+        data = dict(data.lists())
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def replay_response(key, fingerprint):
+    """
+    Build the stored response for a repeated request.
+
+    Returns:
+        Response: The original response, marked with an
+        ``Idempotent-Replayed`` header, or None if the key is new or expired
+
+    Raises:
+        IdempotencyKeyReused: If the key was stored for a different body
+    """
+    if key is None:
+        return None
+    record = IdempotencyRecord.objects.filter(key=key).only(
+        'fingerprint', 'status_code', 'response_body', 'expires_at'
+    ).first()
+    if record is None:
+        return None
+    if record.expires_at <= timezone.now():
+        # Free the key for the request about to be processed.
+        IdempotencyRecord.objects.filter(pk=record.pk, expires_at__lte=timezone.now()).delete()
+        return None
+    if record.fingerprint != fingerprint:
+        raise IdempotencyKeyReused()
+    return Response(record.response_body, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def remember_response(key, fingerprint, status_code, body, order=None):
+    """
+    Store a successful response.
+
+    Must be called inside the transaction that created ``order``; a
+    concurrent request with the same key then fails with IntegrityError
+    and rolls back its own work.
+    """
+    if key is None:
+        return None
+    return IdempotencyRecord.objects.create(
+        key=key, fingerprint=fingerprint, status_code=status_code, response_body=body, order=order,
+        expires_at=timezone.now() + timedelta(seconds=get_ttl()),
+    )
+
+
+def get_ttl():
+    """Seconds a stored response is replayed for, from the IDEMPOTENCY_TTL setting."""
+    return getattr(settings, 'IDEMPOTENCY_TTL', DEFAULT_TTL)
+
+
+def purge_expired(batch_size=1000):
+    """
+    Delete expired records, ``batch_size`` at a time so no long lock is held.
+
+    Returns:
+        int: Number of records deleted
+    """
+    deleted = 0
+    while True:
+        pks = list(
+            IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += IdempotencyRecord.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,220 @@
+"""
+Pre-generated renditions of textbook cover images.
+
+Catalogue cards only need a small cover, so every uploaded
+``Textbook.image`` is resized to a few fixed widths and saved as WebP and
+JPEG next to the original. Renditions are generated off the request: a
+save that changes the image queues a task once the transaction commits
+(see core.tasks), and ``python manage.py worker`` does the resizing.
+Until it has run, the textbook simply has no renditions and clients fall
+back to the original.
+
+Rendition names carry a hash of their content
+(``textbooks/renditions/cover-320w.1a2b3c4d5e6f.webp``), so a URL never
+changes meaning and may be cached forever. The names are recorded in
+``Textbook.image_renditions``::
+
+    {
+        'source': 'textbooks/cover.png',
+        'webp': {'160': 'textbooks/renditions/cover-160w.1a2b3c4d5e6f.webp', ...},
+        'jpeg': {'160': 'textbooks/renditions/cover-160w.0f9e8d7c6b5a.jpg', ...},
+    }
+
+keyed by pixel width. The pipeline is configured through the
+``IMAGE_RENDITIONS`` setting::
+
+    IMAGE_RENDITIONS = {
+        'WIDTHS': (160, 320, 640),
+        'FORMATS': ('webp', 'jpeg'),
+        'QUALITY': 80,
+    }
+"""
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import invalidate_catalogue
+from .models import Textbook
+from .tasks import task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'WIDTHS': (160, 320, 640),
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+}
+
+# Pillow format name and file extension of each output format.
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+RENDITION_DIR = 'renditions'
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'IMAGE_RENDITIONS', {})}
+
+
+def rendition_names(renditions):
+    """Return the stored file names listed in an ``image_renditions`` value."""
+    return [
+        name
+        for output_format in FORMATS
+        for name in (renditions or {}).get(output_format, {}).values()
+    ]
+
+
+def is_current(textbook):
+    """Check whether a textbook's renditions were made from its current image."""
+    return bool(textbook.image) and (textbook.image_renditions or {}).get('source') == textbook.image.name
+
+
+def render(image, width, output_format, quality):
+    """
+    Resize an opened image to ``width`` pixels wide and encode it.
+
+    Returns:
+        bytes: The encoded rendition
+    """
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+    pil_format, _ = FORMATS[output_format]
+    if pil_format == 'JPEG' and resized.mode != 'RGB':
+        # JPEG has no alpha channel; flatten transparent covers onto white.
+        rgba = resized.convert('RGBA')
+        resized = Image.new('RGB', rgba.size, (255, 255, 255))
+        resized.paste(rgba, mask=rgba.getchannel('A'))
+    elif resized.mode not in ('RGB', 'RGBA'):
+        transparent = 'A' in resized.getbands() or 'transparency' in resized.info
+        resized = resized.convert('RGBA' if transparent else 'RGB')
+    buffer = BytesIO()
+    resized.save(buffer, pil_format, quality=quality, optimize=pil_format == 'JPEG')
+    return buffer.getvalue()
+
+
+def build_renditions(field_file, options=None):
+    """
+    Generate and store every rendition of an image file.
+
+    Widths wider than the original are skipped rather than upscaled; an
+    original narrower than every width gets one rendition at its own
+    size. Files already stored under the same content-hashed name are
+    reused.
+
+    Returns:
+        dict: The ``image_renditions`` value describing the stored files
+
+    Raises:
+        OSError: If the image cannot be read or decoded
+    """
+    options = options or get_settings()
+    storage = field_file.storage
+    with field_file.open('rb') as source:
+        image = Image.open(source)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+
+    widths = [width for width in sorted(options['WIDTHS']) if width <= image.width] or [image.width]
+    stem = posixpath.splitext(posixpath.basename(field_file.name))[0]
+    directory = posixpath.join(posixpath.dirname(field_file.name), RENDITION_DIR)
+
+    renditions = {'source': field_file.name}
+    for output_format in options['FORMATS']:
+        _, extension = FORMATS[output_format]
+        files = renditions[output_format] = {}
+        for width in widths:
+            content = render(image, width, output_format, options['QUALITY'])
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            name = posixpath.join(directory, f"{stem}-{width}w.{digest}.{extension}")
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(content))
+            files[str(width)] = name
+    return renditions
+
+
+def source_prefix(name):
+    """
+    Return the prefix shared by the names of the images a rendition can be made from.
+
+    build_renditions() names a rendition after the directory and stem of
+    its source, so ``textbooks/renditions/cover-320w.1a2b3c4d5e6f.webp``
+    can only belong to a textbook whose source starts with
+    ``textbooks/cover``.
+    """
+    directory, filename = posixpath.split(name)
+    return posixpath.join(posixpath.dirname(directory), filename.rsplit('-', 1)[0])
+
+
+@task
+def delete_renditions(names, storage=None):
+    """
+    Delete rendition files that no textbook refers to any more.
+
+    Only textbooks whose source image could have produced one of the names
+    are checked, rather than every textbook with renditions.
+    """
+    storage = storage or Textbook._meta.get_field('image').storage
+    names = set(names)
+    still_used = set()
+    if names:
+        owners = Q()
+        for prefix in {source_prefix(name) for name in names}:
+            owners |= Q(image_renditions__source__startswith=prefix)
+        for renditions in Textbook.objects.filter(owners).values_list('image_renditions', flat=True):
+            still_used.update(rendition_names(renditions))
+    for name in names - still_used:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning("Could not delete image rendition", extra={'file': name}, exc_info=True)
+
+
+@task
+def generate_renditions(textbook_id, force=False):
+    """
+    Bring one textbook's renditions up to date with its image.
+
+    The result is only written if the image is still the one that was
+    resized, so a concurrent upload is never overwritten with renditions
+    of the previous cover.
+
+    Returns:
+        bool: Whether new renditions were stored
+    """
+    textbook = Textbook.objects.filter(pk=textbook_id).only('id', 'image', 'image_renditions').first()
+    if textbook is None or not textbook.image or (is_current(textbook) and not force):
+        return False
+    try:
+        renditions = build_renditions(textbook.image)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning(
+            "Could not generate image renditions", extra={'textbook': textbook_id}, exc_info=True
+        )
+        return False
+
+    previous = set(rendition_names(textbook.image_renditions))
+    with transaction.atomic():
+        updated = Textbook.objects.filter(pk=textbook_id, image=textbook.image.name).update(
+            image_renditions=renditions, updated_at=timezone.now()
+        )
+        if updated:
+            invalidate_catalogue()
+    current = set(rendition_names(renditions))
+    delete_renditions((previous - current) if updated else (current - previous), textbook.image.storage)
+    return bool(updated)
+
+
+def schedule_renditions(textbook):
+    """Queue rendition generation for a textbook whose image changed."""
+    generate_renditions.delay(textbook.pk)
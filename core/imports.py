@@ -0,0 +1,280 @@
+"""
+Bulk textbook import.
+
+Rows are streamed from CSV, a JSON array or NDJSON, validated one at a
+time and upserted in batches keyed by ``(course_code, title)`` with
+``bulk_create(update_conflicts=True)``. Memory stays bounded by the batch
+size, and a row that fails validation is reported and skipped without
+stopping the import.
+
+Columns:
+    title, course_code, department, level, price: required
+    description, stock, is_popular, is_new: optional
+
+Departments and levels accept the stored key or the display name, as the
+catalogue filters do. When a textbook already exists, the optional
+columns a row leaves out or blank keep their current values; new
+textbooks get the model defaults for them.
+
+An import bumps the catalogue cache generation, which reaches running
+web processes only through a shared backend such as RedisBackend. With
+the default process-local backend they still serve the imported rows,
+since cached responses are keyed on ETags computed from the database
+(see TextbookViewSet.conditional_response), and their superseded
+entries expire after ``CATALOGUE_CACHE['TIMEOUT']``.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+
+from .cache import invalidate_catalogue
+from .choices import registry as choice_registry
+from .models import Textbook
+
+REQUIRED_COLUMNS = ('title', 'course_code', 'department', 'level', 'price')
+OPTIONAL_COLUMNS = ('description', 'stock', 'is_popular', 'is_new')
+COLUMNS = REQUIRED_COLUMNS + OPTIONAL_COLUMNS
+UNIQUE_FIELDS = ('course_code', 'title')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+
+class RowError(ValueError):
+    """Raised for a row that cannot be imported, with the offending column."""
+    def __init__(self, column, message):
+        super().__init__(f"{column}: {message}")
+        self.column = column
+
+
+def read_csv(file):
+    """
+    Read a CSV file with a header line.
+
+    Raises:
+        ValueError: If a required column is missing from the header
+    """
+    reader = csv.DictReader(file)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(missing)}.")
+    return reader
+
+
+def read_ndjson(file):
+    """Yield the objects of a file holding one JSON object per line."""
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield RowError('row', f'Invalid JSON: {exc.msg}.')
+
+
+def read_json(file, chunk_size=65536):
+    """
+    Yield the objects of a JSON array without loading the whole file.
+
+    Raises:
+        ValueError: If the file is not a JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Expected a JSON array of textbooks.')
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError('Unterminated JSON array.')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        # A number at the end of the buffer may continue in the next chunk.
+        if end == len(buffer) and not eof:
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield value
+        buffer = buffer[end:]
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+def parse_bool(value, column):
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else '').strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(column, f'"{value}" is not a boolean.')
+
+
+def text(row, column, max_length, required=True):
+    value = row.get(column)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(column, 'This field is required.')
+    if len(value) > max_length:
+        raise RowError(column, f'Ensure this field has no more than {max_length} characters.')
+    return value
+
+
+def build_textbook(row):
+    """
+    Validate one input row and build the unsaved Textbook.
+
+    Returns:
+        tuple: The Textbook, and the optional columns the row provides
+
+    Raises:
+        RowError: If a value is missing or invalid, or the reader could
+            not parse the row (and yielded the error instead)
+    """
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError('row', 'Expected an object.')
+    columns = tuple(column for column in OPTIONAL_COLUMNS if row.get(column) not in (None, ''))
+    textbook = Textbook(
+        title=text(row, 'title', 200),
+        course_code=text(row, 'course_code', 20),
+    )
+
+    department = choice_registry['department'].department(row.get('department'))
+    if department is None:
+        raise RowError('department', f'Unknown department "{row.get("department")}".')
+    textbook.department_id = department.pk
+
+    textbook.level = choice_registry['level'].resolve(row.get('level'))
+    if textbook.level is None:
+        raise RowError('level', f'Unknown level "{row.get("level")}".')
+
+    try:
+        price = Decimal(text(row, 'price', 20))
+    except InvalidOperation:
+        raise RowError('price', f'"{row.get("price")}" is not a number.')
+    if not price.is_finite() or price < 0 or price.as_tuple().exponent < -2 or price >= 10 ** 8:
+        raise RowError('price', 'Must be a non-negative amount below 100,000,000 with at most 2 decimal places.')
+    textbook.price = price
+
+    if 'description' in columns:
+        textbook.description = text(row, 'description', 179, required=False)
+    if 'stock' in columns:
+        stock = row.get('stock')
+        try:
+            textbook.stock = stock if isinstance(stock, int) else int(str(stock).strip())
+        except ValueError:
+            raise RowError('stock', f'"{stock}" is not a whole number.')
+        if textbook.stock < 0:
+            raise RowError('stock', 'Must not be negative.')
+    for column in ('is_popular', 'is_new'):
+        if column in columns:
+            setattr(textbook, column, parse_bool(row.get(column), column))
+    return textbook, columns
+
+
+class TextbookImport:
+    """
+    Upsert textbooks from a stream of rows.
+
+    Args:
+        batch_size (int): Rows per ``bulk_create``
+        on_error: Called with ``(row number, message)`` for every skipped
+            row, counting records from 1
+        dry_run (bool): Validate without writing
+
+    Attributes:
+        imported (int): Rows written (or, in a dry run, that would be)
+        skipped (int): Rows rejected
+        duplicates (int): Rows superseded by a later row with the same key
+            before they were written
+    """
+    def __init__(self, batch_size=1000, on_error=None, dry_run=False):
+        self.batch_size = batch_size
+        self.on_error = on_error or (lambda number, message: None)
+        self.dry_run = dry_run
+        self.imported = self.skipped = self.duplicates = 0
+
+    def run(self, rows):
+        """
+        Import every row.
+
+        Rows are batched by the optional columns they provide, since one
+        upsert updates the same columns on every row. A key seen again
+        replaces the pending row, so the last one in the file wins.
+
+        Returns:
+            TextbookImport: self, with the counters filled in
+        """
+        batches = {}
+        for number, row in enumerate(rows, start=1):
+            try:
+                textbook, columns = build_textbook(row)
+            except RowError as exc:
+                self.reject(number, str(exc))
+                continue
+            key = (textbook.course_code, textbook.title)
+            for pending in batches.values():
+                if pending.pop(key, None) is not None:
+                    self.duplicates += 1
+            batch = batches.setdefault(columns, {})
+            batch[key] = (number, textbook)
+            if len(batch) >= self.batch_size:
+                self.flush(batch, columns)
+                batches[columns] = {}
+        for columns, batch in batches.items():
+            if batch:
+                self.flush(batch, columns)
+        if self.imported and not self.dry_run:
+            invalidate_catalogue()
+        return self
+
+    def reject(self, number, message):
+        self.skipped += 1
+        self.on_error(number, message)
+
+    def flush(self, batch, columns):
+        """Upsert one batch; if the database rejects it, retry row by row to find the culprits."""
+        rows = sorted(batch.values(), key=lambda pending: pending[0])
+        update_fields = ['department', 'level', 'price', *columns, 'updated_at']
+        if self.dry_run:
+            self.imported += len(rows)
+            return
+        try:
+            self.upsert([textbook for _, textbook in rows], update_fields)
+        except DatabaseError:
+            for number, textbook in rows:
+                try:
+                    self.upsert([textbook], update_fields)
+                except DatabaseError as exc:
+                    self.reject(number, f'database: {exc}')
+                else:
+                    self.imported += 1
+        else:
+            self.imported += len(rows)
+
+    @staticmethod
+    def upsert(textbooks, update_fields):
+        with transaction.atomic():
+            Textbook.objects.bulk_create(
+                textbooks, update_conflicts=True, unique_fields=UNIQUE_FIELDS, update_fields=update_fields,
+            )
+
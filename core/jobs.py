@@ -0,0 +1,86 @@
+"""
+Background jobs queued after an order is placed.
+
+OrderViewSet queues these once the order commits (see core.tasks), so the
+checkout response never waits on mail servers, stock checks or rollup
+updates.
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import mail_admins, send_mail
+from django.db import transaction
+
+from .models import Order, Textbook
+from . import rollups
+from .tasks import task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOW_STOCK_THRESHOLD = 5
+
+
+@task
+def send_order_confirmation(order_id):
+    """Email the student a summary of their order."""
+    order = Order.objects.filter(pk=order_id).prefetch_related('items').first()
+    if order is None:
+        return
+    lines = [f"{item.quantity} x {item.book_title} ({item.course_code}) @ {item.price}" for item in order.items.all()]
+    send_mail(
+        subject=f"EduText order {order.reference} received",
+        message='\n'.join([
+            f"Hello {order.student_name},",
+            '',
+            f"We have received your order {order.reference}:",
+            '',
+            *lines,
+            '',
+            f"Total: {order.total_amount}",
+            f"Status: {order.get_status_display()}",
+        ]),
+        from_email=None,
+        recipient_list=[order.student_email],
+    )
+
+
+@task
+def record_order_sales(deltas):
+    """
+    Add a new order's lines to the daily sales rollup.
+
+    Args:
+        deltas: The order's rollup deltas, as made by rollups.dump_deltas();
+            computed when the order was placed, so a status change or
+            deletion applied to the rollup before this task runs still
+            adds up
+    """
+    with transaction.atomic():
+        rollups.apply_deltas(rollups.load_deltas(deltas))
+
+
+@task
+def check_stock_levels(quantities):
+    """
+    Alert staff about textbooks an order took to or below the low-stock threshold.
+
+    Args:
+        quantities: ``[textbook_id, quantity]`` pairs ordered; only titles
+            whose stock crossed the threshold with this order are reported,
+            so each title is reported once rather than after every order
+    """
+    threshold = getattr(settings, 'LOW_STOCK_THRESHOLD', DEFAULT_LOW_STOCK_THRESHOLD)
+    ordered = dict(quantities)
+    crossed = [
+        textbook
+        for textbook in Textbook.objects.filter(pk__in=ordered, stock__lte=threshold).only('title', 'course_code', 'stock')
+        if textbook.stock + ordered[textbook.pk] > threshold
+    ]
+    if not crossed:
+        return
+    for textbook in crossed:
+        logger.warning('Low stock', extra={'textbook': textbook.pk, 'title': textbook.title, 'stock': textbook.stock})
+    mail_admins(
+        subject=f"Low stock: {len(crossed)} textbook(s)",
+        message='\n'.join(f"{textbook}: {textbook.stock} left" for textbook in crossed),
+    )
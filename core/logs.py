@@ -0,0 +1,223 @@
+"""
+Structured, non-blocking logging.
+
+Records are filtered and formatted as JSON on the calling thread, then
+handed to a bounded queue; a background listener thread does the I/O. A
+request thread therefore never waits on a slow stream or file, and when
+the queue is full records are dropped and counted rather than blocking.
+
+Building blocks, wired together by the ``LOGGING`` setting:
+
+- CorrelationIdMiddleware tags each request with an ``X-Request-ID``
+- CorrelationIdFilter copies that ID onto every record
+- SamplingFilter keeps a fraction of routine records and every warning or error
+- RedactingFilter masks personal fields such as ``student_email`` and ``matric_number``
+- JsonFormatter renders the message and its ``extra`` fields as one JSON line
+- QueueingHandler queues the rendered line for a target handler
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import uuid
+import zlib
+from collections.abc import Mapping
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+_correlation_id = ContextVar('correlation_id', default=None)
+
+# Incoming IDs are echoed back, so only accept short, header-safe values.
+CORRELATION_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Attributes every LogRecord has; anything else came in through ``extra``.
+RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'correlation_id'}
+
+REDACTED = '[REDACTED]'
+
+
+def get_correlation_id():
+    """Get the correlation ID of the request being handled, if any."""
+    return _correlation_id.get()
+
+
+class CorrelationIdMiddleware:
+    """
+    Middleware giving every request a correlation ID.
+
+    A well-formed ``X-Request-ID`` header from the client or a proxy is
+    reused, otherwise a new ID is generated. The ID is returned in the
+    response's ``X-Request-ID`` header.
+
+    Works in sync and async chains, so under ASGI requests to async views
+    are not moved to a thread on its account.
+    """
+    header = 'X-Request-ID'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _correlation_id.reset(token)
+        response.headers[self.header] = request.correlation_id
+        return response
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _correlation_id.reset(token)
+        response.headers[self.header] = request.correlation_id
+        return response
+
+    def start(self, request):
+        """Assign the request's correlation ID and make it current; returns the context token."""
+        incoming = request.headers.get(self.header, '')
+        request.correlation_id = incoming if CORRELATION_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        return _correlation_id.set(request.correlation_id)
+
+
+class CorrelationIdFilter(logging.Filter):
+    """Attach the current correlation ID to each record."""
+
+    def filter(self, record):
+        record.correlation_id = get_correlation_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of records below ``always_level``.
+
+    Sampling is keyed on the correlation ID, so a sampled request keeps all
+    of its routine records and an unsampled one drops all of them.
+
+    Args:
+        rate (float): Fraction of routine records to keep, 0 to 1
+        always_level: Records at or above this level are always kept
+    """
+    def __init__(self, rate=1.0, always_level=logging.WARNING, name=''):
+        super().__init__(name)
+        self.rate = rate
+        self.always_level = logging._checkLevel(always_level)
+
+    def filter(self, record):
+        if record.levelno >= self.always_level or self.rate >= 1:
+            return True
+        correlation_id = getattr(record, 'correlation_id', None) or get_correlation_id()
+        if correlation_id:
+            return zlib.crc32(correlation_id.encode()) % 10000 < self.rate * 10000
+        return random.random() < self.rate
+
+
+class RedactingFilter(logging.Filter):
+    """
+    Mask sensitive keys anywhere in a record's arguments and extra fields.
+
+    Values are replaced on copies, so the caller's data is never modified.
+
+    Args:
+        fields: Key names to mask, compared case-insensitively
+    """
+    def __init__(self, fields=('student_email', 'student_name', 'matric_number', 'phone_number'), name=''):
+        super().__init__(name)
+        self.fields = frozenset(field.lower() for field in fields)
+
+    def redact(self, value):
+        if isinstance(value, Mapping):
+            return {
+                key: REDACTED if str(key).lower() in self.fields else self.redact(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.redact(item) for item in value)
+        return value
+
+    def filter(self, record):
+        if isinstance(record.args, (Mapping, tuple)):
+            record.args = self.redact(record.args)
+        for key in record.__dict__.keys() - RECORD_ATTRIBUTES:
+            value = record.__dict__[key]
+            record.__dict__[key] = REDACTED if key.lower() in self.fields else self.redact(value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Render a record as a single JSON object.
+
+    The object holds the timestamp, level, logger, message and correlation
+    ID, plus every field passed through ``extra``.
+    """
+    def format(self, record):
+        document = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'correlation_id': getattr(record, 'correlation_id', None),
+        }
+        for key in sorted(record.__dict__.keys() - RECORD_ATTRIBUTES):
+            document[key] = record.__dict__[key]
+        if record.exc_info:
+            document['exception'] = self.formatException(record.exc_info)
+        return json.dumps(document, cls=JSONEncoder, default=str)
+
+
+class QueueingHandler(QueueHandler):
+    """
+    Handler that formats on the caller's thread and writes on a background one.
+
+    Args:
+        target (str): Dotted path of the handler doing the actual I/O
+        target_options (dict): Keyword arguments for the target handler
+        queue_size (int): Records buffered before new ones are dropped
+
+    Attributes:
+        dropped (int): Records discarded because the queue was full
+    """
+    def __init__(self, target='logging.StreamHandler', target_options=None, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.target = import_string(target)(**(target_options or {}))
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        if self.listener._thread is not None:
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,179 @@
+import json
+import platform
+import random
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from core.benchmarks import benchmark_database, compare, run_scenario, seed_orders, seed_textbooks
+from core.cache import get_catalogue_cache
+from core.models import Textbook
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the catalogue and checkout hot paths end to end.
+
+    Seeds a throwaway SQLite database with a reproducible dataset, drives
+    the API through DRF's test client and records p50/p99 latency and
+    throughput per scenario. Results can be written as JSON and compared
+    against a previous run with ``--baseline``.
+    """
+    help = 'Benchmark textbook listing, checkout and staff order listing'
+
+    scenarios = ('textbooks_filtered', 'textbooks_cached', 'textbooks_search', 'checkout', 'staff_orders')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--textbooks', type=int, default=5000, help='Textbooks to seed')
+        parser.add_argument('--orders', type=int, default=20000, help='Historical orders to seed')
+        parser.add_argument('--items-per-order', type=int, default=4, help='Maximum items per seeded order and cart')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset and request mix')
+        parser.add_argument('--scenarios', nargs='+', choices=self.scenarios, default=list(self.scenarios),
+                            help='Scenarios to run')
+        parser.add_argument('--output', help='Write results as JSON to this path')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {exc}")
+
+        results = {
+            'meta': {
+                'started_at': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'dataset': {
+                    'textbooks': options['textbooks'],
+                    'orders': options['orders'],
+                    'items_per_order': options['items_per_order'],
+                    'seed': options['seed'],
+                },
+                'requests': options['requests'],
+            },
+            'scenarios': {},
+        }
+
+        with benchmark_database():
+            self.stdout.write('Seeding dataset...')
+            seed_textbooks(options['textbooks'], seed=options['seed'])
+            seed_orders(options['orders'], items_per_order=options['items_per_order'], seed=options['seed'])
+
+            rng = random.Random(options['seed'])
+            for name in options['scenarios']:
+                request = getattr(self, f'scenario_{name}')(rng, options)
+                summary = run_scenario(request, options['requests'])
+                results['scenarios'][name] = summary
+                self.stdout.write(
+                    f"{name:<20} p50={summary['p50_ms']:>8.2f}ms p99={summary['p99_ms']:>8.2f}ms "
+                    f"{summary['throughput_rps']:>8.1f} req/s errors={summary['errors']}"
+                )
+
+        if baseline is not None:
+            results['baseline'] = compare(results, baseline)
+            for name, changes in results['baseline'].items():
+                formatted = ' '.join(
+                    f"{metric}={change:+.1%}" for metric, change in changes.items() if change is not None
+                )
+                self.stdout.write(f"{name:<20} vs baseline: {formatted}")
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    @staticmethod
+    def client(user=None):
+        # SERVER_NAME must pass ALLOWED_HOSTS outside the test runner.
+        client = APIClient(SERVER_NAME='localhost')
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    @staticmethod
+    def filter_mix(rng):
+        departments = [choice[0] for choice in Textbook.DEPARTMENT_CHOICES]
+        levels = [choice[0] for choice in Textbook.LEVEL_CHOICES]
+        return [
+            {'department': rng.choice(departments), 'level': rng.choice(levels)}
+            for _ in range(50)
+        ] + [{'department': rng.choice(departments)} for _ in range(25)] + [{} for _ in range(25)]
+
+    def scenario_textbooks_filtered(self, rng, options):
+        """Filtered catalogue pages with the response cache cleared before each request."""
+        client, mix, cache = self.client(), self.filter_mix(rng), get_catalogue_cache()
+
+        def request(iteration):
+            cache.invalidate()
+            return client.get('/api/v1/textbooks/', mix[iteration % len(mix)])
+        return request
+
+    def scenario_textbooks_cached(self, rng, options):
+        """The same filter mix served from a warm response cache."""
+        client, mix = self.client(), self.filter_mix(rng)
+        get_catalogue_cache().invalidate()
+        return lambda iteration: client.get('/api/v1/textbooks/', mix[iteration % len(mix)])
+
+    def scenario_textbooks_search(self, rng, options):
+        """Uncached searches, optionally combined with a department filter."""
+        client, cache = self.client(), get_catalogue_cache()
+        terms = ['intro', 'data struct', 'thermo', 'com 2', 'accounting', 'calculus', 'applied micro']
+        departments = [choice[0] for choice in Textbook.DEPARTMENT_CHOICES]
+        mix = [{'search': term} for term in terms] + [
+            {'search': term, 'department': rng.choice(departments)} for term in terms
+        ]
+
+        def request(iteration):
+            cache.invalidate()
+            return client.get('/api/v1/textbooks/', mix[iteration % len(mix)])
+        return request
+
+    def scenario_checkout(self, rng, options):
+        """Anonymous checkouts of multi-item carts."""
+        client = self.client()
+        textbooks = list(Textbook.objects.values_list('id', 'price', 'department__code', 'level'))
+
+        def request(iteration):
+            cart = rng.sample(textbooks, rng.randint(2, max(options['items_per_order'], 2)))
+            items = [
+                {'textbook': pk, 'quantity': rng.randint(1, 2), 'price': str(price)}
+                for pk, price, _, _ in cart
+            ]
+            return client.post('/api/v1/orders/', {
+                'reference': f'CHECKOUT-{iteration}',
+                'status': 'pending',
+                'total_amount': str(sum(item['quantity'] * price for item, (_, price, _, _) in zip(items, cart))),
+                'student_name': 'Benchmark Student',
+                'student_email': 'bench@example.com',
+                'matric_number': f'F/ND/B/{iteration}',
+                'department': cart[0][2],
+                'level': cart[0][3],
+                'phone_number': '08000000000',
+                'items': items,
+            }, format='json')
+        return request
+
+    def scenario_staff_orders(self, rng, options):
+        """Staff order listing, alternating first pages and deep cursor walks."""
+        staff = get_user_model().objects.create_user(
+            username='benchmark-staff', password='benchmark', is_staff=True
+        )
+        client = self.client(staff)
+        state = {'next': None}
+
+        def request(iteration):
+            if iteration % 10 == 0 or not state['next']:
+                response = client.get('/api/v1/orders/')
+            else:
+                response = client.get(state['next'])
+            state['next'] = response.data.get('next') if response.status_code == 200 else None
+            return response
+        return request
@@ -0,0 +1,73 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.benchmarks import benchmark_database, measure, seed_textbooks, summarize
+from core.models import Textbook
+from core.search import InvertedIndexBackend, SQLiteFTSBackend, fts5_available
+
+
+class Command(BaseCommand):
+    """
+    Compare textbook search latency across the available strategies.
+
+    Seeds a throwaway database up to each requested size and times the
+    legacy icontains scan, the FTS5 backend and the in-process inverted index
+    on the same queries.
+    """
+    help = 'Benchmark textbook search: icontains vs FTS5 vs inverted index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                            help='Catalogue sizes to benchmark')
+        parser.add_argument('--queries', nargs='+',
+                            default=['intro', 'data struct', 'com 2', 'thermodynamics', 'acc', 'calculus 9987'],
+                            help='Search terms to time')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Results fetched per query, like one storefront page (0 for all)')
+        parser.add_argument('--output', help='Write results as JSON to this path')
+
+    def handle(self, *args, **options):
+        results = []
+        with benchmark_database():
+            limit = options['limit'] or None
+            strategies = {'icontains': self.icontains(limit)}
+            if fts5_available():
+                strategies['fts5'] = self.backend_search(SQLiteFTSBackend(), limit)
+            inverted = InvertedIndexBackend(max_age=float('inf'))
+            strategies['inverted_index'] = self.backend_search(inverted, limit)
+
+            for size in sorted(options['sizes']):
+                seed_textbooks(size - Textbook.objects.count())
+                inverted.rebuild()
+                for query in options['queries']:
+                    for name, strategy in strategies.items():
+                        matches = len(strategy(query))
+                        summary = summarize(measure(lambda: strategy(query), options['repeat']))
+                        results.append({'size': size, 'query': query, 'strategy': name,
+                                        'matches': matches, **summary})
+                        self.stdout.write(
+                            f"{size:>7} {query!r:<18} {name:<15} matches={matches:<6} "
+                            f"p50={summary['p50_ms']:.2f}ms p95={summary['p95_ms']:.2f}ms"
+                        )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    @staticmethod
+    def icontains(limit):
+        def search(query):
+            queryset = Textbook.objects.filter(Q(title__icontains=query) | Q(course_code__icontains=query))
+            return list(queryset.values_list('id', flat=True)[:limit])
+        return search
+
+    @staticmethod
+    def backend_search(backend, limit):
+        def search(query):
+            queryset = backend.filter_queryset(Textbook.objects.all(), query)
+            return list(queryset.values_list('id', flat=True)[:limit])
+        return search
@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmarks import benchmark_database, measure, seed_orders, seed_textbooks, summarize
+from core.fastpath import compile_serializer
+from core.models import Order, Textbook
+from core.renderers import FastJSONRenderer
+from core.serializers import OrderSerializer, TextbookSerializer
+
+PAGES = {
+    'textbooks': (TextbookSerializer, lambda: Textbook.objects.order_by('-created_at', '-id')),
+    'orders': (OrderSerializer, lambda: Order.objects.prefetch_related('items').order_by('-created_at', '-id')),
+}
+
+
+class Command(BaseCommand):
+    """
+    Compare DRF serialization with the compiled fast path.
+
+    Each run reads ``--rows`` rows, serializes them and renders the JSON
+    body, once through the ModelSerializer and JSONRenderer and once through
+    compile_serializer and FastJSONRenderer, and reports rows per second.
+    Both bodies are checked to be byte-identical.
+    """
+    help = 'Benchmark rows/sec of DRF versus compiled list serialization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--textbooks', type=int, default=2000, help='Textbooks to seed')
+        parser.add_argument('--orders', type=int, default=2000, help='Orders to seed')
+        parser.add_argument('--rows', type=int, default=1000, help='Rows serialized per run')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per path')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset')
+        parser.add_argument('--output', help='Write results as JSON to this path')
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/v1/textbooks/'))
+        context = {'request': request}
+        results = []
+        with benchmark_database():
+            seed_textbooks(options['textbooks'], seed=options['seed'])
+            seed_orders(options['orders'], seed=options['seed'])
+            for name, (serializer_class, queryset) in PAGES.items():
+                rows = options['rows']
+                compiled = compile_serializer(serializer_class)
+
+                def drf():
+                    data = serializer_class(queryset()[:rows], many=True, context=context).data
+                    return JSONRenderer().render(data)
+
+                def fast():
+                    data = compiled.serialize(compiled.values(queryset())[:rows], context)
+                    return FastJSONRenderer().render(data)
+
+                identical = drf() == fast()
+                for path, func in (('drf', drf), ('compiled', fast)):
+                    samples = measure(func, options['repeat'])
+                    summary = summarize(samples)
+                    rows_per_sec = round(rows * len(samples) / (sum(samples) / 1000), 1) if samples else 0.0
+                    results.append({
+                        'page': name, 'path': path, 'rows': rows, **summary,
+                        'rows_per_sec': rows_per_sec, 'identical': identical,
+                    })
+                    self.stdout.write(
+                        f"{name:<10} {path:<9} p50={summary['p50_ms']:>8.2f}ms "
+                        f"{rows_per_sec:>10.1f} rows/s identical={identical}"
+                    )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
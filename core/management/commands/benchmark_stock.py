@@ -0,0 +1,122 @@
+import json
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.test.utils import override_settings
+from rest_framework import serializers
+
+from core.benchmarks import benchmark_database, seed_textbooks, summarize
+from core.models import Textbook
+from core.stock import reserve_stock
+
+ENGINES = {
+    'locking': 'core.stock.LockingStockEngine',
+    'optimistic': 'core.stock.OptimisticStockEngine',
+}
+
+
+class Command(BaseCommand):
+    """
+    Compare stock engines under concurrent checkouts of the same titles.
+
+    Worker threads repeatedly reserve random carts drawn from a small set of
+    hot textbooks, the way the first week of term looks. Each engine runs
+    against a freshly seeded catalogue and is checked for overselling.
+    A reservation hitting a database lock is retried after a short backoff,
+    as clients retry the 409 the checkout view returns; retries counts
+    those.
+    """
+    help = 'Benchmark the locking and optimistic stock engines under contention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES),
+                            help='Stock engines to compare')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent checkout threads')
+        parser.add_argument('--checkouts', type=int, default=50, help='Checkouts per worker')
+        parser.add_argument('--hot-titles', type=int, default=5, help='Textbooks every cart draws from')
+        parser.add_argument('--cart-size', type=int, default=2, help='Distinct titles per cart')
+        parser.add_argument('--stock', type=int, default=1000, help='Initial stock of every hot title')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the carts')
+        parser.add_argument('--output', help='Write results as JSON to this path')
+
+    def handle(self, *args, **options):
+        results = []
+        with benchmark_database():
+            for name in options['engines']:
+                with override_settings(STOCK_ENGINE={'BACKEND': ENGINES[name]}):
+                    result = self.run_engine(name, options)
+                results.append(result)
+                self.stdout.write(
+                    f"{name:<11} p50={result['p50_ms']:>7.2f}ms p99={result['p99_ms']:>7.2f}ms "
+                    f"{result['throughput_rps']:>8.1f} checkouts/s reserved={result['reserved']} "
+                    f"rejected={result['rejected']} retries={result['retries']} oversold={result['oversold']}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run_engine(self, name, options):
+        Textbook.objects.all().delete()
+        seed_textbooks(options['hot_titles'], seed=options['seed'], stock=options['stock'])
+        hot = list(Textbook.objects.values_list('id', flat=True))
+        cart_size = min(options['cart_size'], len(hot))
+
+        barrier = threading.Barrier(options['workers'])
+        lock = threading.Lock()
+        samples, counts = [], {'reserved': 0, 'rejected': 0, 'retries': 0, 'units': 0}
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            local_samples, local = [], dict.fromkeys(counts, 0)
+            barrier.wait()
+            try:
+                for _ in range(options['checkouts']):
+                    cart = {pk: rng.randint(1, 2) for pk in rng.sample(hot, cart_size)}
+                    started = time.perf_counter()
+                    while True:
+                        try:
+                            with transaction.atomic():
+                                reserve_stock(cart)
+                            local['reserved'] += 1
+                            local['units'] += sum(cart.values())
+                            break
+                        except serializers.ValidationError:
+                            local['rejected'] += 1
+                            break
+                        except OperationalError:
+                            # The checkout view answers a lock or serialization conflict
+                            # with 409 (StockContention) and the client retries; back
+                            # off briefly and retry the same way.
+                            local['retries'] += 1
+                            time.sleep(rng.random() * 0.002)
+                    local_samples.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+                with lock:
+                    samples.extend(local_samples)
+                    for key, value in local.items():
+                        counts[key] += value
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['workers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        remaining = sum(Textbook.objects.values_list('stock', flat=True))
+        initial = options['stock'] * len(hot)
+        return {
+            'engine': name,
+            'workers': options['workers'],
+            **summarize(samples),
+            'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            **{key: value for key, value in counts.items() if key != 'units'},
+            'oversold': initial - remaining != counts['units'] or remaining < 0,
+        }
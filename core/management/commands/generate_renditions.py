@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.models import Textbook
+
+
+class Command(BaseCommand):
+    """
+    Generate missing cover image renditions.
+
+    Renditions are normally made in the background when a cover is
+    uploaded. Use this after changing IMAGE_RENDITIONS, or for covers
+    uploaded before renditions existed.
+    """
+    help = 'Generate resized renditions of textbook cover images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that are already current')
+
+    def handle(self, *args, **options):
+        generated = 0
+        textbooks = Textbook.objects.exclude(image='').exclude(image__isnull=True)
+        for textbook_id in textbooks.values_list('id', flat=True).iterator():
+            generated += images.generate_renditions(textbook_id, force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'Generated renditions for {generated} textbooks'))
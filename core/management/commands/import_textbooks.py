@@ -0,0 +1,47 @@
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import READERS, TextbookImport
+
+
+class Command(BaseCommand):
+    """
+    Create or update textbooks from a CSV, JSON or NDJSON file.
+
+    Textbooks are matched on (course_code, title). Invalid rows are
+    reported on stderr with their record number and skipped; the rest of
+    the file is still imported.
+    """
+    help = 'Bulk create or update textbooks from a CSV, JSON or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for stdin')
+        parser.add_argument('--format', choices=sorted(READERS), help='File format (default: from the extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk upsert')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without writing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rpartition('.')[2].lower()
+        if file_format not in READERS:
+            raise CommandError(f'Cannot tell the format of {path}; pass --format {"|".join(sorted(READERS))}.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        def report(number, message):
+            self.stderr.write(f'Row {number}: {message}')
+
+        importer = TextbookImport(batch_size=options['batch_size'], on_error=report, dry_run=options['dry_run'])
+        try:
+            with (open(path, newline='', encoding='utf-8-sig') if path != '-' else nullcontext(sys.stdin)) as file:
+                importer.run(READERS[file_format](file))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'{exc} ({importer.imported} rows were imported before the error)')
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        summary = f'{verb} {importer.imported} textbooks, skipped {importer.skipped} invalid rows'
+        if importer.duplicates:
+            summary += f', {importer.duplicates} rows were repeated later in the file'
+        self.stdout.write((self.style.WARNING if importer.skipped else self.style.SUCCESS)(summary))
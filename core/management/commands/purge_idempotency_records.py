@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import idempotency
+
+
+class Command(BaseCommand):
+    """
+    Delete idempotency records whose replay window has passed.
+
+    They hold copies of order responses, personal details included, so
+    run this regularly (from cron, for example).
+    """
+    help = 'Delete expired idempotency records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per delete')
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency records'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    """
+    Recompute the DailySales rollup from every order item.
+
+    Use after bulk status changes made with QuerySet.update(), which bypass
+    the signals that keep the rollup current.
+    """
+    help = 'Rebuild the daily sales rollup from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        written = rollups.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt daily sales rollup with {written} rows'))
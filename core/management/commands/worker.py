@@ -0,0 +1,31 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core.tasks import Worker
+
+
+class Command(BaseCommand):
+    """
+    Run queued background tasks until interrupted.
+
+    SIGINT or SIGTERM stops the worker from claiming new tasks; the ones
+    already running are allowed to finish.
+    """
+    help = 'Run background tasks from the task table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='Tasks run at once (default: TASKS["CONCURRENCY"])')
+        parser.add_argument('--pool', choices=['thread', 'process', 'inline'], help='Where tasks run (default: TASKS["POOL"])')
+        parser.add_argument('--poll-interval', type=float, help='Seconds between polls when idle')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options['concurrency'], pool=options['pool'], poll_interval=options['poll_interval'],
+        )
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+        self.stdout.write(f'Worker {worker.name} running {worker.concurrency} {worker.pool} task(s) at a time')
+        started = worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker.name} stopped after {started} task(s)'))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_order_options_alter_order_matric_number_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed')], max_length=20)),
+                ('department', models.CharField(choices=[('computer_science', 'Computer Science'), ('computer_engineering', 'Computer Engineering'), ('civil_engineering', 'Civil Engineering'), ('electrical_engineering', 'Electrical Engineering'), ('mechanical_engineering', 'Mechanical Engineering'), ('chemical_engineering', 'Chemical Engineering'), ('science_laboratory', 'Science Laboratory Technology'), ('food_technology', 'Food Technology'), ('accountancy', 'Accountancy'), ('business_admin', 'Business Administration'), ('marketing', 'Marketing'), ('mass_comm', 'Mass Communication')], max_length=50)),
+                ('level', models.CharField(choices=[('nd1', 'ND 1'), ('nd2', 'ND 2'), ('hnd1', 'HND 1'), ('hnd2', 'HND 2')], max_length=10)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_count', models.IntegerField(default=0)),
+                ('textbook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='core.textbook')),
+            ],
+            options={
+                'verbose_name_plural': 'daily sales',
+                'indexes': [models.Index(fields=['status', 'date'], name='core_dailysales_status_date')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'textbook', 'status'), name='core_dailysales_unique_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='textbook',
+            index=models.Index(fields=['department', 'level', 'created_at'], name='core_textbook_dept_level'),
+        ),
+        migrations.AddIndex(
+            model_name='textbook',
+            index=models.Index(fields=['department', 'created_at'], name='core_textbook_department'),
+        ),
+        migrations.AddIndex(
+            model_name='textbook',
+            index=models.Index(fields=['level', 'created_at'], name='core_textbook_level'),
+        ),
+        migrations.AddIndex(
+            model_name='textbook',
+            index=models.Index(fields=['created_at'], name='core_textbook_created'),
+        ),
+        migrations.AddIndex(
+            model_name='textbook',
+            index=models.Index(condition=models.Q(('is_popular', True)), fields=['created_at'], name='core_textbook_popular'),
+        ),
+        migrations.AddIndex(
+            model_name='textbook',
+            index=models.Index(condition=models.Q(('is_new', True)), fields=['created_at'], name='core_textbook_new'),
+        ),
+    ]
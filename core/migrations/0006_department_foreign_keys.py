@@ -0,0 +1,177 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+DEPARTMENTS = (
+    ('computer_science', 'Computer Science'),
+    ('computer_engineering', 'Computer Engineering'),
+    ('civil_engineering', 'Civil Engineering'),
+    ('electrical_engineering', 'Electrical Engineering'),
+    ('mechanical_engineering', 'Mechanical Engineering'),
+    ('chemical_engineering', 'Chemical Engineering'),
+    ('science_laboratory', 'Science Laboratory Technology'),
+    ('food_technology', 'Food Technology'),
+    ('accountancy', 'Accountancy'),
+    ('business_admin', 'Business Administration'),
+    ('marketing', 'Marketing'),
+    ('mass_comm', 'Mass Communication'),
+)
+
+LINKED_MODELS = ('textbook', 'order', 'dailysales')
+
+# The department string fields being replaced.
+STRING_FIELDS = {
+    'textbook': {'max_length': 50, 'choices': DEPARTMENTS},
+    'order': {'max_length': 100},
+    'dailysales': {'max_length': 50, 'choices': DEPARTMENTS},
+}
+
+UNKNOWN_CODE = 'unknown'
+UNKNOWN_NAME = 'Unknown'
+
+
+def create_departments(apps, schema_editor):
+    Department = apps.get_model('core', 'Department')
+    existing = set(Department.objects.values_list('code', flat=True))
+    Department.objects.bulk_create([
+        Department(code=code, name=name) for code, name in DEPARTMENTS if code not in existing
+    ])
+
+
+def department_lookup(departments):
+    """
+    Map each code and name, casefolded, to its code.
+
+    A frozen copy of how core.choices.ChoiceMap resolves values as of this
+    migration: codes win over names that collide with them.
+    """
+    lookup = {department.name.casefold(): department.code for department in departments}
+    lookup.update((department.code.casefold(), department.code) for department in departments)
+    return lookup
+
+
+def link_departments(apps, schema_editor):
+    """
+    Point every row at the Department matching its stored string.
+
+    Strings are resolved as the API resolves them (a code or name,
+    ignoring case and surrounding whitespace). Free-text values that match
+    nothing, possible on orders, all go to the single non-catalogue
+    "unknown" department instead of creating catalogue departments; orders
+    keep the original text in legacy_department.
+    """
+    Department = apps.get_model('core', 'Department')
+    departments = {department.code: department.pk for department in Department.objects.all()}
+    lookup = department_lookup(Department.objects.all())
+
+    for model_name in LINKED_MODELS:
+        model = apps.get_model('core', model_name)
+        for value in model.objects.values_list('department', flat=True).distinct():
+            code = lookup.get((value or '').strip().casefold())
+            changes = {}
+            if code is None:
+                code = UNKNOWN_CODE
+                if code not in departments:
+                    departments[code] = Department.objects.create(code=code, name=UNKNOWN_NAME).pk
+                if model_name == 'order':
+                    changes['legacy_department'] = value
+            model.objects.filter(department=value).update(department_ref=departments[code], **changes)
+
+
+def unlink_departments(apps, schema_editor):
+    Department = apps.get_model('core', 'Department')
+    codes = dict(Department.objects.values_list('pk', 'code'))
+    for model_name in LINKED_MODELS:
+        model = apps.get_model('core', model_name)
+        for pk in model.objects.values_list('department_ref', flat=True).distinct():
+            model.objects.filter(department_ref=pk).update(department=codes[pk])
+    Order = apps.get_model('core', 'Order')
+    Order.objects.exclude(legacy_department='').update(department=models.F('legacy_department'))
+
+
+class Migration(migrations.Migration):
+    """
+    Replace the department strings on textbooks, orders and the sales
+    rollup with foreign keys to Department.
+    """
+
+    dependencies = [
+        ('core', '0005_textbook_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='department',
+            name='code',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.RunPython(create_departments, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='department',
+            name='code',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+        migrations.RemoveIndex(model_name='textbook', name='core_textbook_dept_level'),
+        migrations.RemoveIndex(model_name='textbook', name='core_textbook_department'),
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='department_ref',
+                field=models.ForeignKey(
+                    null=True, db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                    related_name='+', to='core.department',
+                ),
+            )
+            for model_name in LINKED_MODELS
+        ],
+        migrations.AddField(
+            model_name='order',
+            name='legacy_department',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(link_departments, unlink_departments),
+        *[
+            operation
+            for model_name in LINKED_MODELS
+            for operation in (
+                # The default lets the reverse re-add the column to existing
+                # rows before unlink_departments fills it in.
+                migrations.AlterField(
+                    model_name=model_name,
+                    name='department',
+                    field=models.CharField(default='', **STRING_FIELDS[model_name]),
+                ),
+                migrations.RemoveField(model_name=model_name, name='department'),
+                migrations.RenameField(model_name=model_name, old_name='department_ref', new_name='department'),
+            )
+        ],
+        migrations.AlterField(
+            model_name='textbook',
+            name='department',
+            field=models.ForeignKey(
+                db_index=False, on_delete=django.db.models.deletion.PROTECT,
+                related_name='textbooks', to='core.department',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='department',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='core.department',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='dailysales',
+            name='department',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT, related_name='daily_sales', to='core.department',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='textbook',
+            index=models.Index(fields=['department', 'level', 'created_at'], name='core_textbook_dept_level'),
+        ),
+        migrations.AddIndex(
+            model_name='textbook',
+            index=models.Index(fields=['department', 'created_at'], name='core_textbook_department'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_department_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textbook',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
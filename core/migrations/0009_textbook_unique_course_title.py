@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicates(apps, schema_editor):
+    """
+    Refuse to add the constraint while textbooks share a course code and title.
+
+    Titles are shown to students and orders refer to the textbooks, so the
+    copies are not renamed or merged here. The error lists them so they
+    can be resolved in the admin before migrating again.
+    """
+    Textbook = apps.get_model('core', 'Textbook')
+    duplicates = list(
+        Textbook.objects.values('course_code', 'title')
+        .annotate(copies=Count('id')).filter(copies__gt=1).order_by('course_code', 'title')
+    )
+    if not duplicates:
+        return
+    lines = []
+    for key in duplicates:
+        ids = Textbook.objects.filter(course_code=key['course_code'], title=key['title']).order_by('id')
+        ids = ', '.join(str(pk) for pk in ids.values_list('id', flat=True))
+        lines.append(f"  {key['course_code']} / {key['title']}: textbooks {ids}")
+    raise RuntimeError(
+        "Cannot add core_textbook_unique_course_title: these textbooks share a course code and title. "
+        "Rename, merge or delete the copies, then migrate again.\n" + '\n'.join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_task_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='textbook',
+            constraint=models.UniqueConstraint(fields=('course_code', 'title'), name='core_textbook_unique_course_title'),
+        ),
+    ]
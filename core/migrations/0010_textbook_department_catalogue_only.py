@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_textbook_unique_course_title'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='textbook',
+            name='department',
+            field=models.ForeignKey(db_index=False, limit_choices_to=models.Q(('code', 'unknown'), _negated=True), on_delete=django.db.models.deletion.PROTECT, related_name='textbooks', to='core.department'),
+        ),
+    ]
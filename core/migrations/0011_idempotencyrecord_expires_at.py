@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+DEFAULT_TTL = timedelta(days=1)
+
+
+def set_expiry(apps, schema_editor):
+    """Give existing records the default lifetime, counted from their first request."""
+    IdempotencyRecord = apps.get_model('core', 'IdempotencyRecord')
+    IdempotencyRecord.objects.update(expires_at=F('created_at') + DEFAULT_TTL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_textbook_department_catalogue_only'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='expires_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(set_expiry, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='idempotencyrecord',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:58
+
+import core.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fts5_available(connection):
+    """Frozen copy of core.search.fts5_available as of this migration."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        cursor.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'")
+        return cursor.fetchone() is not None
+
+
+class FTS5RunSQL(migrations.RunSQL):
+    """RunSQL that is skipped on databases without SQLite FTS5."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if fts5_available(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if fts5_available(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+# Frozen copy of core.search.FTS_SCHEMA as of this migration.
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS core_textbook_fts USING fts5(
+        title, course_code, description,
+        content='core_textbook', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS core_textbook_fts_ai AFTER INSERT ON core_textbook BEGIN
+        INSERT INTO core_textbook_fts(rowid, title, course_code, description)
+        VALUES (new.id, new.title, new.course_code, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS core_textbook_fts_ad AFTER DELETE ON core_textbook BEGIN
+        INSERT INTO core_textbook_fts(core_textbook_fts, rowid, title, course_code, description)
+        VALUES ('delete', old.id, old.title, old.course_code, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS core_textbook_fts_au
+        AFTER UPDATE OF title, course_code, description ON core_textbook BEGIN
+        INSERT INTO core_textbook_fts(core_textbook_fts, rowid, title, course_code, description)
+        VALUES ('delete', old.id, old.title, old.course_code, old.description);
+        INSERT INTO core_textbook_fts(rowid, title, course_code, description)
+        VALUES (new.id, new.title, new.course_code, new.description);
+    END""",
+    """INSERT INTO core_textbook_fts(core_textbook_fts, rank)
+        VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')""",
+    "INSERT INTO core_textbook_fts(core_textbook_fts) VALUES ('rebuild')",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_idempotencyrecord_expires_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextbookSearchEntry',
+            fields=[
+                ('textbook', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='core.textbook')),
+                ('document', core.models.SearchDocumentField(db_column='core_textbook_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'core_textbook_fts',
+                'managed': False,
+            },
+        ),
+        FTS5RunSQL(
+            sql=FTS_SCHEMA,
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS core_textbook_fts_au",
+                "DROP TRIGGER IF EXISTS core_textbook_fts_ad",
+                "DROP TRIGGER IF EXISTS core_textbook_fts_ai",
+                "DROP TABLE IF EXISTS core_textbook_fts",
+            ],
+        ),
+    ]
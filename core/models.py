@@ -1,16 +1,29 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 class Department(models.Model):
     """
     Model representing academic departments in the institution.
     
+    Textbooks, orders and the sales rollup reference departments by key.
+    The API identifies a department by its code (or its name), resolved
+    through the in-process map in core.choices.
+    
+    Orders whose department matched none of the catalogue departments
+    (free text from before departments were a table) point at the
+    department coded ``UNKNOWN_CODE``, which is never offered as a
+    catalogue department, and keep the text in Order.legacy_department.
+    
     Attributes:
         name (str): Full name of the department
-        code (str): Short code/abbreviation for the department
+        code (str): Unique identifier of the department, e.g. computer_science
     """
+    UNKNOWN_CODE = 'unknown'
+    UNKNOWN_NAME = 'Unknown'
+
     name = models.CharField(max_length=100)
-    code = models.CharField(max_length=10)
+    code = models.CharField(max_length=50, unique=True)
 
     def __str__(self):
         return self.name
@@ -22,12 +35,13 @@ class Textbook(models.Model):
     Attributes:
         title (str): Title of the textbook
         course_code (str): Course code the textbook is used for
-        department (str): Department the textbook belongs to
+        department (Department): Department the textbook belongs to
         level (str): Academic level the textbook is intended for
         price (decimal): Price of the textbook
         description (str): Brief description of the textbook
         stock (int): Current available quantity
         image (ImageField): Cover image of the textbook
+        image_renditions (dict): Resized copies of the image, see core.images
         is_popular (bool): Whether the textbook is marked as popular
         is_new (bool): Whether the textbook is marked as new
         created_at (datetime): When the textbook was added
@@ -35,6 +49,8 @@ class Textbook(models.Model):
     """
     title = models.CharField(max_length=200)
     course_code = models.CharField(max_length=20)
+    # Departments created by the initial data migration; the Department
+    # table is authoritative.
     DEPARTMENT_CHOICES = (
         ('computer_science', 'Computer Science'),
         ('computer_engineering', 'Computer Engineering'),
@@ -49,7 +65,11 @@ class Textbook(models.Model):
         ('marketing', 'Marketing'),
         ('mass_comm', 'Mass Communication'),
     )
-    department = models.CharField(max_length=50, choices=DEPARTMENT_CHOICES)
+    # The composite indexes below lead with department.
+    department = models.ForeignKey(
+        Department, related_name='textbooks', on_delete=models.PROTECT, db_index=False,
+        limit_choices_to=~models.Q(code=Department.UNKNOWN_CODE),
+    )
     LEVEL_CHOICES = (
         ('nd1', 'ND 1'),
         ('nd2', 'ND 2'),
@@ -61,11 +81,29 @@ class Textbook(models.Model):
     description = models.TextField(max_length=179)
     stock = models.IntegerField(default=0)
     image = models.ImageField(upload_to='textbooks/', null=True, blank=True)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     is_popular = models.BooleanField(default=False)
     is_new = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # Bulk imports upsert on this key (see core.imports).
+            models.UniqueConstraint(fields=['course_code', 'title'], name='core_textbook_unique_course_title'),
+        ]
+        indexes = [
+            # Catalogue filters, ending in the pagination key so a filtered
+            # page can be read in order.
+            models.Index(fields=['department', 'level', 'created_at'], name='core_textbook_dept_level'),
+            models.Index(fields=['department', 'created_at'], name='core_textbook_department'),
+            models.Index(fields=['level', 'created_at'], name='core_textbook_level'),
+            models.Index(fields=['created_at'], name='core_textbook_created'),
+            # Homepage shelves only ever read the flagged rows.
+            models.Index(fields=['created_at'], condition=models.Q(is_popular=True), name='core_textbook_popular'),
+            models.Index(fields=['created_at'], condition=models.Q(is_new=True), name='core_textbook_new'),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.course_code})"
 
@@ -81,7 +119,9 @@ class Order(models.Model):
         student_name (str): Name of the student placing the order
         student_email (str): Email of the student
         matric_number (str): Student's matriculation number
-        department (str): Student's department
+        department (Department): Student's department
+        legacy_department (str): Department text of an order placed before
+            departments were a table that matched no department, else empty
         level (str): Student's academic level
         phone_number (str): Student's contact number
     """
@@ -95,13 +135,21 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     # Student information fields
-    student_name = models.CharField(max_length=200)
+    student_name = models.CharField(max_length=200, db_index=True)
     student_email = models.EmailField()
-    matric_number = models.CharField(max_length=20)
-    department = models.CharField(max_length=100)
+    matric_number = models.CharField(max_length=20, db_index=True)
+    department = models.ForeignKey(Department, related_name='orders', on_delete=models.PROTECT)
+    legacy_department = models.CharField(max_length=100, blank=True)
     level = models.CharField(max_length=10)
     phone_number = models.CharField(max_length=15)
 
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['matric_number', 'student_name'], name='core_order_matric__d10614_idx'),
+            models.Index(fields=['created_at'], name='core_order_created_912d27_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.reference} by {self.student_name}"
 
@@ -123,9 +171,15 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     
     # Cache book details for order history
-    book_title = models.CharField(max_length=200)
+    book_title = models.CharField(max_length=200, db_index=True)
     course_code = models.CharField(max_length=20)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['book_title'], name='core_orderi_book_ti_8916cf_idx'),
+            models.Index(fields=['order', 'book_title'], name='core_orderi_order_i_2f42f8_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.quantity}x {self.book_title}"
     
@@ -135,4 +189,186 @@ class OrderItem(models.Model):
             self.book_title = self.textbook.title
         if not self.course_code:
             self.course_code = self.textbook.course_code
-        super().save(*args, **kwargs) 
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class DailySales(models.Model):
+    """
+    Model holding precomputed daily sales per textbook and order status.
+    
+    Rows are maintained incrementally as orders are created (by a
+    background task), change status or are deleted (see core.rollups), and
+    can be rebuilt from scratch with the rebuild_sales_rollup management
+    command.
+    
+    Attributes:
+        date (date): Day the orders were placed
+        textbook (Textbook): The textbook sold
+        status (str): Status of the contributing orders
+        department (Department): Department of the textbook
+        level (str): Academic level of the textbook
+        quantity (int): Copies sold
+        revenue (decimal): Sum of quantity x unit price
+        order_count (int): Number of order lines contributing to the row
+    """
+    date = models.DateField()
+    textbook = models.ForeignKey(Textbook, related_name='daily_sales', on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=Order._meta.get_field('status').choices)
+    department = models.ForeignKey(Department, related_name='daily_sales', on_delete=models.PROTECT)
+    level = models.CharField(max_length=10, choices=Textbook.LEVEL_CHOICES)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'textbook', 'status'], name='core_dailysales_unique_day'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'date'], name='core_dailysales_status_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.textbook_id} ({self.status}): {self.quantity}"
+
+class IdempotencyRecord(models.Model):
+    """
+    Model storing the first successful response to an idempotent request.
+
+    Retries carrying the same key are answered from the stored response
+    instead of being processed again (see core.idempotency).
+
+    Attributes:
+        key (str): Namespaced idempotency key (``key:...`` from the
+            Idempotency-Key header or ``reference:...`` from the order)
+        fingerprint (str): SHA-256 of the canonical request body
+        status_code (int): HTTP status of the stored response
+        response_body (dict): Body of the stored response
+        order (Order): The order the request created, if still present
+        created_at (datetime): When the first request was processed
+        expires_at (datetime): When the key stops being replayed; expired
+            records are deleted by ``manage.py purge_idempotency_records``
+    """
+    key = models.CharField(max_length=300, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+    order = models.ForeignKey(Order, related_name='idempotency_records', null=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code})"
+
+class Task(models.Model):
+    """
+    Model holding a queued background job (see core.tasks).
+
+    Workers claim due tasks with a conditional update, so several worker
+    processes can share the table without a broker.
+
+    Attributes:
+        name (str): Dotted path of the task function
+        args (list): Positional arguments, as JSON
+        kwargs (dict): Keyword arguments, as JSON
+        status (str): queued, running, succeeded or failed
+        attempts (int): Times the task has been started
+        max_attempts (int): Attempts allowed before the task fails for good
+        run_at (datetime): Earliest time the task may (re)start
+        locked_by (str): Worker running the task
+        locked_at (datetime): When that worker claimed it
+        last_error (str): Traceback of the latest failure
+        created_at (datetime): When the task was queued
+        finished_at (datetime): When the task succeeded or finally failed
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers poll for due tasks of one status, oldest first.
+            models.Index(fields=['status', 'run_at'], name='core_task_status_run_at'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+@models.CharField.register_lookup
+class Prefix(models.Lookup):
+    """
+    Case-sensitive prefix match that a plain b-tree index can serve.
+
+    ``startswith`` compiles to ``LIKE 'abc%' ESCAPE '\\'`` on SQLite, which is
+    case-insensitive and so cannot use an index in the default (binary)
+    collation. ``field__prefix='abc'`` is written as the range
+    ``field >= 'abc' AND field < 'abd'`` instead, which an index on the
+    column answers directly.
+    """
+    lookup_name = 'prefix'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        prefix = str(self.rhs)
+        if not prefix or prefix[-1] == chr(0x10FFFF):
+            return f"{lhs} >= %s", [*lhs_params, prefix]
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return f"({lhs} >= %s AND {lhs} < %s)", [*lhs_params, prefix, *lhs_params, upper]
+
+class SearchDocumentField(models.TextField):
+    """
+    The hidden FTS5 column named after its table, which ``MATCH`` queries target.
+
+    Supports the ``match`` lookup, taking an FTS5 query expression.
+    """
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+class TextbookSearchEntry(models.Model):
+    """
+    Row of the FTS5 index over textbook titles, course codes and descriptions.
+    
+    Lets the ORM join textbooks to their search matches
+    (``Textbook.objects.filter(search_entry__document__match=...)``). The
+    table and the triggers keeping it in sync with core_textbook are
+    created by a migration on SQLite builds with FTS5; Django never writes
+    to it (see core.search.SQLiteFTSBackend).
+    
+    Attributes:
+        textbook (Textbook): The indexed textbook (the FTS rowid)
+        document (str): Target of ``match`` lookups
+        rank (float): bm25 relevance of the current match, lower is better
+    """
+    textbook = models.OneToOneField(
+        Textbook, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_entry', on_delete=models.DO_NOTHING,
+    )
+    document = SearchDocumentField(db_column='core_textbook_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'core_textbook_fts'
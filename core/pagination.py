@@ -0,0 +1,234 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination keyed on ``(created_at, id)``.
+
+    DRF's CursorPagination filters on the first ordering field only and
+    falls back to offsets for ties. Here the cursor position holds every
+    ordering field, so each page is a pure keyset seek
+    (``created_at < c OR (created_at = c AND id < i)``) that the
+    ``created_at`` index can answer no matter how deep the client pages.
+    Cursors stay opaque base64 tokens.
+
+    Querysets already ordered by ``search_rank`` keep their relevance order
+    and are paged by offset instead, bounded by ``offset_cutoff``.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    position_separator = '|'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        window = self.page_window(queryset, request, view)
+        if window is None:
+            return None
+        return self.paginate_rows(list(window))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async counterpart of paginate_queryset for async views."""
+        window = self.page_window(queryset, request, view)
+        if window is None:
+            return None
+        return self.paginate_rows([row async for row in window])
+
+    def page_window(self, queryset, request, view=None):
+        """
+        Decode the cursor and return the unevaluated slice holding the page.
+
+        The slice has one row more than the page, which tells whether a
+        following page exists. Returns None when pagination is disabled.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+
+        order_by = queryset.query.order_by
+        self.ranked = bool(order_by) and order_by[0] == 'search_rank'
+        if self.ranked:
+            offset = self.cursor.offset if self.cursor else 0
+            return queryset[offset:offset + self.page_size + 1]
+
+        self.ordering = self.get_ordering(request, queryset, view)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*[
+                field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering
+            ])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self.seek_filter(queryset, current_position, reverse))
+
+        return queryset[offset:offset + self.page_size + 1]
+
+    def paginate_rows(self, results):
+        """Keep the page from the fetched window and work out the neighbouring cursors."""
+        if self.ranked:
+            return self.paginate_ranked(results)
+
+        self.page = list(results[:self.page_size])
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def seek_filter(self, queryset, position, reverse):
+        """
+        Build the keyset condition selecting rows after ``position``.
+
+        Args:
+            queryset: The queryset being paginated, used to parse field values
+            position (str): Encoded position from the cursor
+            reverse (bool): Whether the cursor walks backwards
+
+        Raises:
+            NotFound: If the position does not decode against the ordering
+        """
+        values = position.split(self.position_separator)
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        fields = []
+        for field, raw in zip(self.ordering, values):
+            name = field.lstrip('-')
+            try:
+                value = queryset.model._meta.get_field(name).to_python(raw)
+            except (DjangoValidationError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            descending = field.startswith('-') != reverse
+            fields.append((name, 'lt' if descending else 'gt', value))
+
+        condition = Q()
+        for index, (name, lookup, value) in enumerate(fields):
+            clause = Q(**{f'{name}__{lookup}': value})
+            for previous_name, _, previous_value in fields[:index]:
+                clause &= Q(**{previous_name: previous_value})
+            condition |= clause
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return self.position_separator.join(values)
+
+    def paginate_ranked(self, results):
+        offset = self.cursor.offset if self.cursor else 0
+        self.page = results[:self.page_size]
+        self.has_next = len(results) > self.page_size and offset + self.page_size <= self.offset_cutoff
+        self.has_previous = offset > 0
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.ranked:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        offset = (self.cursor.offset if self.cursor else 0) + self.page_size
+        return self.encode_cursor(Cursor(offset=offset, reverse=False, position=None))
+
+    def get_previous_link(self):
+        if not self.ranked:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        offset = max(self.cursor.offset - self.page_size, 0)
+        return self.encode_cursor(Cursor(offset=offset, reverse=False, position=None))
+
+
+def estimated_row_count(model, using='default'):
+    """
+    Estimate the rows in a model's table without counting them.
+
+    PostgreSQL answers from the planner statistics kept by ANALYZE; other
+    databases from the largest primary key, which overestimates by the
+    number of deleted rows.
+
+    Returns:
+        int: The estimate, or None if the database has none
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        # reltuples is -1 (or 0 on older servers) before the first ANALYZE.
+        return row[0] if row and row[0] > 0 else None
+    if model._meta.pk.get_internal_type() not in ('AutoField', 'BigAutoField', 'SmallAutoField'):
+        return None
+    return model._default_manager.using(using).aggregate(last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that never runs COUNT(*) over a whole large table.
+
+    An unfiltered changelist takes its total from estimated_row_count once
+    the table holds more than ``exact_threshold`` rows. A filtered or
+    searched one counts at most ``max_count`` matches, so only the first
+    ``max_count`` results can be paged to; narrow the search to reach the
+    rest.
+    """
+    exact_threshold = 10000
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        if queryset.query.has_filters():
+            return queryset.order_by()[:self.max_count].count()
+        estimate = estimated_row_count(queryset.model, queryset.db)
+        if estimate is None or estimate <= self.exact_threshold:
+            return super().count
+        return estimate
@@ -0,0 +1,300 @@
+"""
+Opt-in per-request profiling.
+
+ProfilingMiddleware measures, for every request, the wall time, the number
+of SQL queries and the time spent in them, and the time spent in DRF
+serializers. Each request's figures are sent back in a ``Server-Timing``
+header and added to an in-process histogram per view, which staff can read
+from the stats endpoint.
+
+Profiling is configured through the ``PROFILING`` setting::
+
+    PROFILING = {
+        'ENABLED': False,
+        'SERVER_TIMING': True,
+        'BUCKETS': (5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+    }
+
+When ``ENABLED`` is false the middleware removes itself from the chain at
+startup, so it costs nothing.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from rest_framework import serializers
+
+DEFAULT_SETTINGS = {
+    'ENABLED': False,
+    'SERVER_TIMING': True,
+    'BUCKETS': (5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+}
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+def get_profiling_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'PROFILING', {})}
+
+
+class RequestProfile:
+    """
+    Measurements collected while one request is handled.
+
+    Attributes:
+        queries (int): SQL statements executed
+        sql_time (float): Seconds spent executing them
+        serializer_time (float): Seconds spent in serializer validation and
+            representation, outermost serializer only
+    """
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper().
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def timed_serialization(method):
+    """
+    Wrap a serializer method so its duration counts as serializer time.
+
+    Nested serializers run inside their parent's timing and are not counted
+    twice. Outside a profiled request the method runs untouched.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return method(self, *args, **kwargs)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_time += time.perf_counter() - started
+    return wrapper
+
+
+class ProfiledSerializerMixin:
+    """
+    Serializer mixin that reports validation and representation time.
+
+    For ``many=True`` serializers set ``list_serializer_class`` to
+    ProfiledListSerializer (or a subclass) as well, since DRF builds the
+    list wrapper from Meta rather than from the child class.
+    """
+    @timed_serialization
+    def is_valid(self, *args, **kwargs):
+        return super().is_valid(*args, **kwargs)
+
+    @property
+    @timed_serialization
+    def data(self):
+        return super().data
+
+
+class ProfiledListSerializer(ProfiledSerializerMixin, serializers.ListSerializer):
+    """ListSerializer counterpart of ProfiledSerializerMixin."""
+
+
+class ProfileStats:
+    """
+    Thread-safe histogram of request timings, one series per view.
+
+    Args:
+        buckets: Upper bounds of the latency buckets in milliseconds; an
+            overflow bucket is added for slower requests
+    """
+    def __init__(self, buckets=DEFAULT_SETTINGS['BUCKETS']):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def record(self, view, wall_ms, profile):
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = {
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'queries': 0,
+                    'sql_ms': 0.0,
+                    'serializer_ms': 0.0,
+                    'histogram': [0] * (len(self.buckets) + 1),
+                }
+            series['count'] += 1
+            series['total_ms'] += wall_ms
+            series['max_ms'] = max(series['max_ms'], wall_ms)
+            series['queries'] += profile.queries
+            series['sql_ms'] += profile.sql_time * 1000
+            series['serializer_ms'] += profile.serializer_time * 1000
+            series['histogram'][bisect_left(self.buckets, wall_ms)] += 1
+
+    def estimate_percentile(self, histogram, count, pct):
+        """Upper bound of the bucket holding the ``pct`` percentile, None if it overflowed."""
+        threshold = pct / 100 * count
+        seen = 0
+        for bound, hits in zip(self.buckets, histogram):
+            seen += hits
+            if seen >= threshold:
+                return bound
+        return None
+
+    def snapshot(self):
+        """
+        Summarize every view, slowest total time first.
+
+        Returns:
+            list: One dict per view with counts, means, estimated p50/p99
+            and the raw bucket counts
+        """
+        with self._lock:
+            series = {view: {**data, 'histogram': list(data['histogram'])} for view, data in self._series.items()}
+
+        views = []
+        for view, data in series.items():
+            count = data['count']
+            views.append({
+                'view': view,
+                'count': count,
+                'total_ms': round(data['total_ms'], 3),
+                'mean_ms': round(data['total_ms'] / count, 3),
+                'max_ms': round(data['max_ms'], 3),
+                'p50_ms': self.estimate_percentile(data['histogram'], count, 50),
+                'p99_ms': self.estimate_percentile(data['histogram'], count, 99),
+                'mean_queries': round(data['queries'] / count, 2),
+                'mean_sql_ms': round(data['sql_ms'] / count, 3),
+                'mean_serializer_ms': round(data['serializer_ms'] / count, 3),
+                'histogram': dict(zip([*map(str, self.buckets), 'inf'], data['histogram'])),
+            })
+        return sorted(views, key=lambda entry: entry['total_ms'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+_profile_stats = None
+_profile_stats_lock = threading.Lock()
+
+
+def get_profile_stats():
+    """
+    Get the process-wide profile histogram, building it from settings on first use.
+    """
+    global _profile_stats
+    if _profile_stats is None:
+        with _profile_stats_lock:
+            if _profile_stats is None:
+                _profile_stats = ProfileStats(get_profiling_settings()['BUCKETS'])
+    return _profile_stats
+
+
+@receiver(setting_changed)
+def reset_profile_stats(setting, **kwargs):
+    global _profile_stats
+    if setting == 'PROFILING':
+        _profile_stats = None
+
+
+class ProfilingMiddleware:
+    """
+    Middleware recording wall, SQL and serializer time for each request.
+
+    Works in sync and async chains. In an async chain the query timer is
+    installed on the connections of the thread that runs the request's
+    async ORM calls (asgiref's thread-sensitive executor), so queries are
+    counted for async views too.
+
+    Raises:
+        MiddlewareNotUsed: If profiling is disabled in settings
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = get_profiling_settings()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = config['SERVER_TIMING']
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with self.time_queries(profile):
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.finish(request, response, profile, started)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            timer = await sync_to_async(self.time_queries)(profile)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(timer.close)()
+        finally:
+            _current_profile.reset(token)
+        return self.finish(request, response, profile, started)
+
+    @staticmethod
+    def time_queries(profile):
+        """Install the profile on this thread's connections until the returned stack is closed."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profile))
+        return stack
+
+    def finish(self, request, response, profile, started):
+        """Record the request's figures and add the Server-Timing header."""
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        get_profile_stats().record(self.view_name(request), wall_ms, profile)
+        if self.server_timing:
+            sql_ms = profile.sql_time * 1000
+            serializer_ms = profile.serializer_time * 1000
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={sql_ms:.2f};desc="{profile.queries} queries"',
+                f'serialize;dur={serializer_ms:.2f}',
+                f'app;dur={max(wall_ms - sql_ms - serializer_ms, 0):.2f}',
+                f'total;dur={wall_ms:.2f}',
+            ])
+        return response
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        name = (match.view_name or match._func_path) if match else 'unresolved'
+        return f'{request.method} {name}'
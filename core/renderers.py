@@ -0,0 +1,44 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Floats Python's json module writes without an exponent; orjson spells
+# exponents differently (1e16 vs 1e+16), so encoded values outside fall back.
+PLAIN_FLOAT_RANGE = (1e-4, 1e16)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+
+    Output is byte-for-byte what JSONRenderer produces for the default
+    compact, unicode settings: types orjson does not know natively
+    (Decimal, datetimes, lazy strings...) go through DRF's JSONEncoder, and
+    payloads orjson cannot encode, or whose Decimals would need exponent
+    notation, fall back to the standard renderer. The API has no float
+    fields; native floats outside 1e-4..1e16 would be spelled orjson's way.
+    Without orjson, or with indentation, ``ensure_ascii`` or non-compact
+    settings, it behaves exactly like JSONRenderer.
+    """
+    options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            rendered = orjson.dumps(data, default=self.default, option=self.options)
+        except (orjson.JSONEncodeError, OverflowError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Match JSONRenderer, which escapes these for JavaScript embedding.
+        return rendered.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+    def default(self, obj):
+        value = self.encoder_class().default(obj)
+        if isinstance(value, float) and value and not PLAIN_FLOAT_RANGE[0] <= abs(value) < PLAIN_FLOAT_RANGE[1]:
+            raise OverflowError(value)
+        return value
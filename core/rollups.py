@@ -0,0 +1,186 @@
+import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySales, OrderItem
+
+INCREMENT_FIELDS = {
+    'quantity': IntegerField(),
+    'revenue': DecimalField(max_digits=14, decimal_places=2),
+    'order_count': IntegerField(),
+}
+
+
+def order_deltas(order, items, status, sign=1):
+    """
+    Compute the rollup changes contributed by an order's items.
+
+    Args:
+        order (Order): The order, used for its creation date
+        items: OrderItem instances with their textbook loaded
+        status (str): Status bucket the items count towards
+        sign (int): 1 to add the order, -1 to remove it
+
+    Returns:
+        dict: ``(date, textbook_id, status)`` mapped to a delta dict
+    """
+    day = timezone.localdate(order.created_at)
+    deltas = {}
+    for item in items:
+        key = (day, item.textbook_id, status)
+        delta = deltas.setdefault(key, {
+            'department_id': item.textbook.department_id,
+            'level': item.textbook.level,
+            'quantity': 0,
+            'revenue': Decimal('0'),
+            'order_count': 0,
+        })
+        delta['quantity'] += sign * item.quantity
+        delta['revenue'] += sign * item.quantity * item.price
+        delta['order_count'] += sign
+    return deltas
+
+
+def dump_deltas(deltas):
+    """Convert deltas to JSON-compatible rows, for passing to a background task."""
+    return [
+        [day.isoformat(), textbook_id, status, {**delta, 'revenue': str(delta['revenue'])}]
+        for (day, textbook_id, status), delta in deltas.items()
+    ]
+
+
+def load_deltas(rows):
+    """Convert rows made by dump_deltas() back to deltas."""
+    return {
+        (datetime.date.fromisoformat(day), textbook_id, status): {**delta, 'revenue': Decimal(delta['revenue'])}
+        for day, textbook_id, status, delta in rows
+    }
+
+
+def apply_deltas(deltas):
+    """
+    Add deltas to the rollup with atomic F() increments.
+
+    Deltas sharing a day and status (every line of one order) cost one
+    lookup, one CASE-based UPDATE for existing rows and one bulk insert for
+    new rows, whatever the number of textbooks. If a concurrent insert wins
+    the race, that group falls back to row-by-row increments.
+    """
+    groups = {}
+    for (day, textbook_id, status), delta in deltas.items():
+        groups.setdefault((day, status), {})[textbook_id] = delta
+
+    for (day, status), group in groups.items():
+        rows = DailySales.objects.filter(date=day, status=status)
+        existing = set(rows.filter(textbook_id__in=group).values_list('textbook_id', flat=True))
+        if existing:
+            rows.filter(textbook_id__in=existing).update(**{
+                field: F(field) + Case(
+                    *(When(textbook_id=textbook_id, then=Value(group[textbook_id][field]))
+                      for textbook_id in existing),
+                    output_field=output_field,
+                )
+                for field, output_field in INCREMENT_FIELDS.items()
+            })
+        missing = [textbook_id for textbook_id in group if textbook_id not in existing]
+        if not missing:
+            continue
+        try:
+            with transaction.atomic():
+                DailySales.objects.bulk_create([
+                    DailySales(date=day, textbook_id=textbook_id, status=status, **group[textbook_id])
+                    for textbook_id in missing
+                ])
+        except IntegrityError:
+            for textbook_id in missing:
+                apply_delta(day, textbook_id, status, group[textbook_id])
+
+
+def apply_delta(day, textbook_id, status, delta):
+    """Increment a single rollup row, inserting it if needed."""
+    rows = DailySales.objects.filter(date=day, textbook_id=textbook_id, status=status)
+    increments = {field: F(field) + delta[field] for field in INCREMENT_FIELDS}
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            DailySales.objects.create(date=day, textbook_id=textbook_id, status=status, **delta)
+    except IntegrityError:
+        rows.update(**increments)
+
+
+def order_items(order):
+    """Load an order's items with just the textbook columns the rollup needs."""
+    return order.items.select_related('textbook').only(
+        'textbook', 'quantity', 'price', 'textbook__department', 'textbook__level'
+    )
+
+
+def record_order(order, items=None, sign=1):
+    """
+    Add (or with ``sign=-1`` remove) an order under its current status.
+
+    Args:
+        order (Order): The order to record
+        items: The order's items with textbooks loaded; queried when omitted
+        sign (int): 1 to add, -1 to remove
+    """
+    items = order_items(order) if items is None else items
+    apply_deltas(order_deltas(order, items, order.status, sign))
+
+
+def move_order(order, old_status, new_status):
+    """
+    Move an order's contribution from one status bucket to another.
+    """
+    items = list(order_items(order))
+    deltas = order_deltas(order, items, old_status, sign=-1)
+    deltas.update(order_deltas(order, items, new_status))
+    apply_deltas(deltas)
+
+
+def rebuild(batch_size=1000):
+    """
+    Recompute the whole rollup from OrderItem rows.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    rows = OrderItem.objects.values(
+        'textbook_id',
+        day=TruncDate('order__created_at'),
+        status=F('order__status'),
+        department=F('textbook__department'),
+        level=F('textbook__level'),
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(F('quantity') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        lines=Count('id'),
+    ).order_by()
+
+    written = 0
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(DailySales(
+                date=row['day'],
+                textbook_id=row['textbook_id'],
+                status=row['status'],
+                department_id=row['department'],
+                level=row['level'],
+                quantity=row['total_quantity'],
+                revenue=row['total_revenue'],
+                order_count=row['lines'],
+            ))
+            if len(batch) >= batch_size:
+                DailySales.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailySales.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -0,0 +1,365 @@
+"""
+Ranked, prefix-matching textbook search.
+
+Two backends are available and selected through the ``TEXTBOOK_SEARCH``
+setting:
+
+- SQLiteFTSBackend keeps an FTS5 virtual table in sync with
+  ``core_textbook`` through triggers and ranks matches with bm25.
+- InvertedIndexBackend keeps a portable in-process inverted index over
+  title, course_code and description, maintained by model signals.
+
+``'BACKEND': 'auto'`` picks FTS5 on SQLite builds that support it and the
+inverted index everywhere else.
+"""
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Textbook
+
+DEFAULT_SETTINGS = {
+    'BACKEND': 'auto',
+    'OPTIONS': {},
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+FTS_TABLE = 'core_textbook_fts'
+
+# bm25 column weights for title, course_code and description.
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, course_code, description,
+        content='core_textbook', content_rowid='id'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_textbook BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, course_code, description)
+        VALUES (new.id, new.title, new.course_code, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_textbook BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, course_code, description)
+        VALUES ('delete', old.id, old.title, old.course_code, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF title, course_code, description ON core_textbook BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, course_code, description)
+        VALUES ('delete', old.id, old.title, old.course_code, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, course_code, description)
+        VALUES (new.id, new.title, new.course_code, new.description);
+    END""",
+    # The rank column of MATCH queries then orders by the weighted bm25.
+    f"""INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank)
+        VALUES ('rank', 'bm25({', '.join(str(weight) for weight in FTS_WEIGHTS)})')""",
+]
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def fts5_available(using_connection=None):
+    """Check whether a connection is SQLite with the FTS5 extension compiled in."""
+    using_connection = using_connection or connection
+    if using_connection.vendor != 'sqlite':
+        return False
+    with using_connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        cursor.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'")
+        return cursor.fetchone() is not None
+
+
+def install_fts_schema(using_connection=None, repair_only=False):
+    """
+    Create the FTS5 table and its sync triggers if they are missing.
+
+    Migration 0012 installs them. SQLite drops the triggers whenever a later
+    migration rebuilds ``core_textbook``, so this also runs after every
+    ``migrate`` (see core.signals) to put them back, rebuilding the index
+    whenever any schema object had to be recreated.
+
+    Args:
+        repair_only (bool): Leave a database without the FTS table alone,
+            as one migrated to before 0012 is
+
+    Returns:
+        bool: True if the schema was (re)installed and the index rebuilt
+    """
+    using_connection = using_connection or connection
+    if not fts5_available(using_connection):
+        return False
+    expected = {FTS_TABLE, f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'}
+    with using_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s)" % ', '.join(['%s'] * len(expected)),
+            sorted(expected),
+        )
+        installed = {row[0] for row in cursor.fetchall()}
+        if installed == expected or (repair_only and FTS_TABLE not in installed):
+            return False
+        for statement in FTS_SCHEMA:
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+class SQLiteFTSBackend:
+    """
+    Search backend using an SQLite FTS5 external-content table.
+
+    Every query token is matched as a prefix and results are ordered by bm25,
+    weighting title above course code above description.
+    """
+    def match_expression(self, query):
+        tokens = tokenize(query)
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def filter_queryset(self, queryset, query):
+        """
+        Restrict a textbook queryset to matches, ordered best first.
+        """
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset
+        # Joining the FTS table (rather than a correlated subquery) lets FTS5
+        # compute bm25 once per match while it walks the index.
+        return queryset.filter(search_entry__document__match=expression).annotate(
+            search_rank=F('search_entry__rank'),
+        ).order_by('search_rank', 'id')
+
+    def search(self, query, limit=50):
+        """
+        Return the ids of the best matching textbooks.
+        """
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+                [expression, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def rebuild(self):
+        install_fts_schema()
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    def update(self, textbook):
+        """Triggers keep the FTS table current."""
+
+    def remove(self, textbook_id):
+        """Triggers keep the FTS table current."""
+
+
+class InvertedIndexBackend:
+    """
+    Portable in-process inverted index over title, course_code and description.
+
+    Postings are compact integer arrays: title and course code terms go to a
+    strong list, description terms to a weak one. Each query token matches
+    every indexed term it prefixes, documents must match all tokens, and
+    scores are tf-idf weighted with strong matches counting triple.
+
+    The index is built lazily and kept current in this process by model
+    signals. Other processes pick up changes when ``max_age`` expires.
+
+    Args:
+        max_results (int): Cap on ranked ids returned to the database filter
+        max_age (int): Seconds before the index is rebuilt from the database
+    """
+    STRONG_WEIGHT = 3.0
+    WEAK_WEIGHT = 1.0
+
+    def __init__(self, max_results=1000, max_age=300):
+        self.max_results = max_results
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._reset()
+
+    def _reset(self):
+        self._strong = {}
+        self._weak = {}
+        self._terms = []
+        self._documents = {}
+
+    def _ensure_built(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            self.rebuild()
+
+    def rebuild(self):
+        """Rebuild the whole index from the textbook table."""
+        with self._lock:
+            self._reset()
+            rows = Textbook.objects.values_list('id', 'title', 'course_code', 'description')
+            for textbook_id, title, course_code, description in rows.iterator(chunk_size=2000):
+                self._add(textbook_id, title, course_code, description)
+            self._terms.sort()
+            self._built_at = time.monotonic()
+
+    def _add(self, textbook_id, title, course_code, description, keep_sorted=False):
+        strong = {*tokenize(title), *tokenize(course_code)}
+        weak = set(tokenize(description)) - strong
+        for terms, postings in ((strong, self._strong), (weak, self._weak)):
+            for term in terms:
+                if term not in self._strong and term not in self._weak:
+                    if keep_sorted:
+                        insort(self._terms, term)
+                    else:
+                        self._terms.append(term)
+                postings.setdefault(term, array('q')).append(textbook_id)
+        self._documents[textbook_id] = (tuple(strong), tuple(weak))
+
+    def update(self, textbook):
+        """Index or re-index a single textbook."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._discard(textbook.pk)
+            self._add(textbook.pk, textbook.title, textbook.course_code, textbook.description, keep_sorted=True)
+
+    def remove(self, textbook_id):
+        """Drop a textbook from the index."""
+        with self._lock:
+            if self._built_at is not None:
+                self._discard(textbook_id)
+
+    def _discard(self, textbook_id):
+        document = self._documents.pop(textbook_id, None)
+        if document is None:
+            return
+        for terms, postings in zip(document, (self._strong, self._weak)):
+            for term in terms:
+                postings[term].remove(textbook_id)
+                if not postings[term]:
+                    del postings[term]
+
+    def _prefixed(self, token):
+        start = bisect_left(self._terms, token)
+        for term in self._terms[start:]:
+            if not term.startswith(token):
+                break
+            yield term
+
+    def search(self, query, limit=None):
+        """
+        Return textbook ids matching every query token, best first.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        limit = limit or self.max_results
+        with self._lock:
+            self._ensure_built()
+            total = max(len(self._documents), 1)
+            scores = None
+            for token in dict.fromkeys(tokens):
+                token_scores = {}
+                for term in self._prefixed(token):
+                    for postings, weight in ((self._strong, self.STRONG_WEIGHT), (self._weak, self.WEAK_WEIGHT)):
+                        ids = postings.get(term)
+                        if not ids:
+                            continue
+                        score = weight * math.log(1 + total / len(ids))
+                        for textbook_id in ids:
+                            token_scores[textbook_id] = token_scores.get(textbook_id, 0.0) + score
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        textbook_id: score + token_scores[textbook_id]
+                        for textbook_id, score in scores.items()
+                        if textbook_id in token_scores
+                    }
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [textbook_id for textbook_id, _ in ranked[:limit]]
+
+    def filter_queryset(self, queryset, query):
+        """
+        Restrict a textbook queryset to the top ranked matches, best first.
+        """
+        if not tokenize(query):
+            return queryset
+        ids = self.search(query)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(id__in=ids).annotate(
+            search_rank=rank_expression(ids)
+        ).order_by('search_rank')
+
+
+def rank_expression(ids):
+    """
+    Build an expression giving each textbook's position in ``ids``.
+
+    A CASE with one branch per id gets expensive to compile and evaluate
+    for long result lists, so cheaper vendor-specific forms are used where
+    available.
+    """
+    vendor = connection.vendor
+    if vendor in ('sqlite', 'mysql'):
+        return RawSQL(
+            "INSTR(%s, CONCAT(',', core_textbook.id, ','))" if vendor == 'mysql'
+            else "instr(%s, ',' || core_textbook.id || ',')",
+            [',' + ','.join(str(textbook_id) for textbook_id in ids) + ','],
+            output_field=IntegerField(),
+        )
+    if vendor == 'postgresql':
+        return RawSQL(
+            "array_position(%s::bigint[], core_textbook.id)", [list(ids)], output_field=IntegerField()
+        )
+    return Case(
+        *(When(id=textbook_id, then=Value(position)) for position, textbook_id in enumerate(ids)),
+        output_field=IntegerField(),
+    )
+
+
+_search_backend = None
+_search_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """
+    Get the process-wide textbook search backend, building it from settings on first use.
+    """
+    global _search_backend
+    if _search_backend is None:
+        with _search_backend_lock:
+            if _search_backend is None:
+                config = {**DEFAULT_SETTINGS, **getattr(settings, 'TEXTBOOK_SEARCH', {})}
+                backend = config['BACKEND']
+                if backend == 'auto':
+                    backend_class = SQLiteFTSBackend if fts5_available() else InvertedIndexBackend
+                else:
+                    backend_class = import_string(backend)
+                _search_backend = backend_class(**config['OPTIONS'])
+    return _search_backend
+
+
+@receiver(setting_changed)
+def reset_search_backend(setting, **kwargs):
+    global _search_backend
+    if setting == 'TEXTBOOK_SEARCH':
+        _search_backend = None
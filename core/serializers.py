@@ -1,19 +1,205 @@
+from functools import cache
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from .models import Textbook, Order, OrderItem
+from .models import Department, Textbook, Order, OrderItem
+from .choices import department_code, registry as choice_registry
+from .images import FORMATS as IMAGE_FORMATS
+from .profiling import ProfiledListSerializer, ProfiledSerializerMixin
+
+class DepartmentField(serializers.RelatedField):
+    """
+    Department reference written and read as the department code.
+
+    Accepts a code or a display name, in any case, as the string fields
+    it replaced did. Both directions are answered from the cached
+    department map (core.choices), so no query or join is needed.
+    """
+    default_error_messages = {
+        'does_not_exist': 'Unknown department "{value}".',
+        'incorrect_type': 'Incorrect type. Expected a department code or name, received {data_type}.',
+    }
+
+    def __init__(self, **kwargs):
+        if not kwargs.get('read_only'):
+            kwargs.setdefault('queryset', Department.objects.all())
+        super().__init__(**kwargs)
+
+    def use_pk_only_optimization(self):
+        return True
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        department = choice_registry['department'].department(data)
+        if department is None:
+            self.fail('does_not_exist', value=data)
+        return department
 
-class TextbookSerializer(serializers.ModelSerializer):
+    def to_representation(self, value):
+        return self.pk_representation(value.pk)
+
+    def pk_representation(self, pk):
+        """Render a department primary key; used by the compiled serializers too."""
+        return department_code(pk)
+
+    def display_value(self, instance):
+        return instance.name
+
+class ImageRenditionsField(serializers.Field):
+    """
+    URLs of a textbook's resized cover images (see core.images).
+
+    Renders ``{format: {width: url}}``, such as
+    ``{"webp": {"160": "http://.../cover-160w.1a2b3c4d5e6f.webp"}}``; the
+    object is empty until the renditions have been generated.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', 'image_renditions')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.context_representation(self.context)(value)
+
+    def context_representation(self, context):
+        """Return the converter for one response; used by the compiled serializers too."""
+        storage = Textbook._meta.get_field('image').storage
+        request = context.get('request')
+        url = storage.url if request is None else (lambda name: request.build_absolute_uri(storage.url(name)))
+
+        def convert(renditions):
+            return {
+                output_format: {width: url(name) for width, name in renditions[output_format].items()}
+                for output_format in IMAGE_FORMATS if output_format in renditions
+            }
+        return convert
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin rendering only a requested subset of fields.
+
+    Pass ``fields`` (an iterable of field names) to keep just those fields.
+    Named fieldsets declared in ``Meta.fieldsets`` expand to their fields
+    when parsing a ``?fields=`` parameter with requested_fields().
+    """
+    fields_param = 'fields'
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, params):
+        """
+        Parse the comma-separated ``?fields=`` parameter.
+        
+        Returns:
+            tuple: The requested field names in declaration order, or None
+            when the full representation is wanted
+        
+        Raises:
+            ValidationError: If a name is neither a field nor a fieldset
+        """
+        value = params.get(cls.fields_param)
+        if not value:
+            return None
+        fieldsets = getattr(cls.Meta, 'fieldsets', {})
+        available = list(cls().fields)
+        requested, unknown = set(), []
+        for name in filter(None, (part.strip() for part in value.split(','))):
+            if name in fieldsets:
+                requested.update(fieldsets[name])
+            elif name in available:
+                requested.add(name)
+            else:
+                unknown.append(name)
+        if unknown:
+            raise serializers.ValidationError({cls.fields_param: [
+                f"Unknown fields: {', '.join(unknown)}. Available: {', '.join([*fieldsets, *available])}."
+            ]})
+        return tuple(name for name in available if name in requested) or None
+
+    @classmethod
+    @cache
+    def field_sources(cls):
+        """Map each field name to the attribute it is read from."""
+        return {name: field.source for name, field in cls().fields.items()}
+
+class TextbookSerializer(SparseFieldsetMixin, ProfiledSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Textbook model.
     Handles conversion between Textbook instances and JSON representations.
     
     Note:
-        price is configured to return as a number rather than string
+        price is configured to return as a number rather than string.
+        renditions holds the resized cover URLs by format and width.
+        ``?fields=card`` selects the compact representation used by
+        catalogue grids.
     """
     price = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+    department = DepartmentField()
+    renditions = ImageRenditionsField()
     
     class Meta:
         model = Textbook
-        fields = '__all__'
+        fields = [
+            'id', 'price', 'title', 'course_code', 'department', 'level', 'description',
+            'stock', 'image', 'renditions', 'is_popular', 'is_new', 'created_at', 'updated_at',
+        ]
+        list_serializer_class = ProfiledListSerializer
+        fieldsets = {
+            'card': ('id', 'title', 'course_code', 'price', 'image', 'renditions', 'stock'),
+        }
+
+class BulkTextbookField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field for textbooks that can resolve against a preloaded map.
+
+    When ``prefetched`` holds a dict of textbooks keyed by id (populated by
+    OrderItemListSerializer), lookups are served from it instead of issuing
+    one query per line item.
+    """
+    prefetched = None
+
+    def to_internal_value(self, data):
+        if self.prefetched is None:
+            return super().to_internal_value(data)
+        try:
+            pk = Textbook._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        textbook = self.prefetched.get(pk)
+        if textbook is None:
+            self.fail('does_not_exist', pk_value=data)
+        return textbook
+
+class OrderItemListSerializer(serializers.ListSerializer):
+    """
+    List serializer for order items.
+
+    Loads every referenced textbook with one query before the individual
+    items are validated.
+    """
+    def to_internal_value(self, data):
+        field = self.child.fields['textbook']
+        if isinstance(data, list):
+            ids = set()
+            for item in data:
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    ids.add(Textbook._meta.pk.to_python(item.get('textbook')))
+                except (TypeError, ValueError, DjangoValidationError):
+                    continue
+            ids.discard(None)
+            field.prefetched = Textbook.objects.in_bulk(ids)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            field.prefetched = None
 
 class OrderItemSerializer(serializers.ModelSerializer):
     """
@@ -23,12 +209,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
     Note:
         book_title and course_code are read-only fields populated from the textbook
     """
+    textbook = BulkTextbookField(queryset=Textbook.objects.all())
     book_title = serializers.CharField(read_only=True)
     course_code = serializers.CharField(read_only=True)
     
     class Meta:
         model = OrderItem
         fields = ['textbook', 'quantity', 'price', 'book_title', 'course_code']
+        list_serializer_class = OrderItemListSerializer
 
     def create(self, validated_data):
         """
@@ -39,7 +227,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         validated_data['course_code'] = textbook.course_code
         return super().create(validated_data)
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Order model.
     Handles conversion between Order instances and JSON representations.
@@ -47,6 +235,7 @@ class OrderSerializer(serializers.ModelSerializer):
     Includes nested serialization of order items.
     """
     items = OrderItemSerializer(many=True)
+    department = DepartmentField()
 
     class Meta:
         model = Order
@@ -55,15 +244,77 @@ class OrderSerializer(serializers.ModelSerializer):
             'student_name', 'student_email', 'matric_number', 'department', 
             'level', 'phone_number'
         ]
+        list_serializer_class = ProfiledListSerializer
 
     def create(self, validated_data):
         """
         Override create to handle nested creation of order items.
+        
+        All items are written with a single bulk insert. Book details are
+        cached from the textbooks already loaded during validation, so no
+        per-item lookups are needed.
         """
         items_data = validated_data.pop('items')
         order = Order.objects.create(**validated_data)
         
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                book_title=item_data['textbook'].title,
+                course_code=item_data['textbook'].course_code,
+                **item_data
+            )
+            for item_data in items_data
+        ])
             
-        return order 
\ No newline at end of file
+        return order 
+
+class OrderExportSerializer(serializers.Serializer):
+    """
+    Serializer validating the query parameters of the order export.
+    
+    Note:
+        date_from and date_to are inclusive calendar dates
+    """
+    output = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    status = serializers.ChoiceField(choices=Order._meta.get_field('status').choices, required=False)
+    department = DepartmentField(required=False)
+    level = serializers.CharField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        """
+        Ensure the date range is not inverted.
+        """
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({'date_to': 'Must not be earlier than date_from.'})
+        return attrs
+
+
+class OrderLookupSerializer(serializers.Serializer):
+    """
+    Serializer validating the query parameters of the student order lookup.
+
+    Note:
+        email must match the one given at checkout, ignoring case
+    """
+    matric_number = serializers.CharField(max_length=Order._meta.get_field('matric_number').max_length)
+    email = serializers.EmailField()
+
+
+class SalesReportSerializer(serializers.Serializer):
+    """
+    Serializer validating the query parameters of the sales report.
+    
+    Note:
+        status defaults to completed sales; pass "all" to include every status
+    """
+    group_by = serializers.ChoiceField(choices=['day', 'department', 'level', 'textbook'], default='day')
+    status = serializers.ChoiceField(
+        choices=[('all', 'All')] + list(Order._meta.get_field('status').choices), default='completed'
+    )
+    department = DepartmentField(required=False)
+    level = serializers.ChoiceField(choices=Textbook.LEVEL_CHOICES, required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
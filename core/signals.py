@@ -0,0 +1,106 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_catalogue
+from .choices import registry as choice_registry
+from . import images, rollups
+from .models import Department, Order, Textbook
+from .search import get_search_backend, install_fts_schema
+
+# Textbooks loaded without these columns leave their renditions alone.
+RENDITION_FIELDS = {'image', 'image_renditions'}
+
+
+@receiver(post_save, sender=Textbook)
+@receiver(post_delete, sender=Textbook)
+def textbook_changed(sender, instance, **kwargs):
+    """Invalidate cached catalogue responses whenever a textbook changes."""
+    invalidate_catalogue()
+
+
+@receiver(post_save, sender=Textbook)
+def index_textbook(sender, instance, **kwargs):
+    """Keep the in-process search index current after a textbook is saved."""
+    transaction.on_commit(lambda: get_search_backend().update(instance))
+
+
+@receiver(post_delete, sender=Textbook)
+def unindex_textbook(sender, instance, **kwargs):
+    """Drop a deleted textbook from the in-process search index."""
+    textbook_id = instance.pk
+    transaction.on_commit(lambda: get_search_backend().remove(textbook_id))
+
+
+@receiver(pre_save, sender=Textbook)
+def drop_stale_renditions(sender, instance, raw=False, **kwargs):
+    """Forget the renditions of a replaced or removed cover before the textbook is written."""
+    if raw or RENDITION_FIELDS & instance.get_deferred_fields() or not instance.image_renditions:
+        return
+    if not images.is_current(instance):
+        instance._stale_renditions = images.rendition_names(instance.image_renditions)
+        instance.image_renditions = {}
+
+
+@receiver(post_save, sender=Textbook)
+def schedule_renditions(sender, instance, raw=False, **kwargs):
+    """Generate renditions of a new cover in the background once the save commits."""
+    if raw or RENDITION_FIELDS & instance.get_deferred_fields():
+        return
+    stale = getattr(instance, '_stale_renditions', None)
+    if stale:
+        del instance._stale_renditions
+        images.delete_renditions.delay(stale)
+    if instance.image and not images.is_current(instance):
+        images.schedule_renditions(instance)
+
+
+@receiver(post_delete, sender=Textbook)
+def delete_textbook_renditions(sender, instance, **kwargs):
+    """Remove a deleted textbook's rendition files."""
+    if RENDITION_FIELDS & instance.get_deferred_fields():
+        return
+    names = images.rendition_names(instance.image_renditions)
+    if names:
+        images.delete_renditions.delay(names)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, raw=False, **kwargs):
+    """Remember the stored status of an existing order before it is overwritten."""
+    if instance.pk and not raw and not instance._state.adding:
+        instance._rollup_previous_status = (
+            Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def roll_up_status_change(sender, instance, created, raw=False, **kwargs):
+    """
+    Move an order's sales to its new status bucket in the daily rollup.
+
+    New orders are recorded by OrderSerializer.create once their items exist.
+    """
+    previous = getattr(instance, '_rollup_previous_status', None)
+    instance._rollup_previous_status = instance.status
+    if created or raw or previous is None or previous == instance.status:
+        return
+    rollups.move_order(instance, previous, instance.status)
+
+
+@receiver(pre_delete, sender=Order)
+def roll_up_deleted_order(sender, instance, **kwargs):
+    """Remove a deleted order's items from the daily rollup."""
+    rollups.record_order(instance, sign=-1)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def department_changed(sender, instance, **kwargs):
+    """Reload the department lookup map once the change is committed."""
+    transaction.on_commit(lambda: choice_registry.invalidate('department'))
+
+
+def repair_search_schema(sender, using, **kwargs):
+    """Reinstall FTS5 sync triggers that a migration rebuilding core_textbook dropped."""
+    install_fts_schema(connections[using], repair_only=True)
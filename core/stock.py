@@ -0,0 +1,231 @@
+"""
+Stock reservation for checkout.
+
+The strategy is configured through the ``STOCK_ENGINE`` setting::
+
+    STOCK_ENGINE = {
+        'BACKEND': 'core.stock.LockingStockEngine',
+        'OPTIONS': {},
+    }
+
+LockingStockEngine serializes checkouts of a title on its row lock.
+OptimisticStockEngine takes no locks and relies on conditional UPDATEs,
+so checkouts of popular titles do not queue behind each other. On SQLite,
+which has no row locks, it also saves the SELECT the locking mode issues.
+"""
+import threading
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from .cache import invalidate_catalogue
+from .models import Textbook
+
+
+def aggregate_quantities(items):
+    """
+    Collapse order line items into a single quantity per textbook.
+
+    Args:
+        items: Iterable of validated order item dicts holding a
+            ``textbook`` instance and a ``quantity``
+
+    Returns:
+        dict: Requested quantity keyed by textbook id, sorted by id
+    """
+    quantities = {}
+    for item in items:
+        textbook_id = item['textbook'].pk
+        quantities[textbook_id] = quantities.get(textbook_id, 0) + item['quantity']
+    return dict(sorted(quantities.items()))
+
+
+class LockingStockEngine:
+    """
+    Reserve stock by locking the textbook rows first.
+
+    All requested textbooks are locked with a single ``id__in`` query in
+    primary key order, so concurrent checkouts always acquire row locks in
+    the same sequence and cannot deadlock. Availability is checked in
+    memory and the decrement is issued as one conditional UPDATE that only
+    touches rows still holding enough stock.
+
+    Checkouts of the same title queue behind each other for the whole
+    transaction, which is what OptimisticStockEngine avoids.
+    """
+    def reserve(self, quantities):
+        """
+        Returns:
+            dict: The locked Textbook instances keyed by id, with ``stock``
+            reflecting the reservation
+        """
+        textbooks = {
+            textbook.pk: textbook
+            for textbook in Textbook.objects.select_for_update().filter(id__in=quantities).order_by('id')
+        }
+        for textbook_id, quantity in quantities.items():
+            textbook = textbooks.get(textbook_id)
+            if textbook is None or textbook.stock < quantity:
+                raise shortfall_error(quantities, textbooks)
+
+        # The stock__gte guard keeps the UPDATE safe on backends without row
+        # locks (SQLite ignores select_for_update).
+        if conditional_decrement(quantities) != len(quantities):
+            raise serializers.ValidationError({
+                'detail': "Stock changed while placing your order. Please try again."
+            })
+
+        for textbook_id, quantity in quantities.items():
+            textbooks[textbook_id].stock -= quantity
+        return textbooks
+
+
+class OptimisticStockEngine:
+    """
+    Reserve stock without row locks.
+
+    Every item is decremented by one conditional UPDATE
+    (``SET stock = stock - q WHERE id = ? AND stock >= q``) inside a
+    savepoint. If any row fails its guard, the savepoint is rolled back so
+    no item keeps its decrement, and the order is rejected.
+
+    Lock timeouts, deadlocks and serialization failures are not retried
+    here: they abort the caller's whole transaction (or, on SQLite, keep
+    failing while it holds the write lock), so only a new transaction can
+    succeed. OrderViewSet answers them with StockContention.
+    """
+    def reserve(self, quantities):
+        """
+        Returns:
+            None: Nothing is read back when every guard holds
+        """
+        try:
+            with transaction.atomic():
+                if conditional_decrement(quantities) == len(quantities):
+                    return None
+                # Roll back the rows that did pass their guard.
+                raise StockShortfall()
+        except StockShortfall:
+            textbooks = Textbook.objects.filter(id__in=quantities).only('title', 'stock').in_bulk()
+            raise shortfall_error(quantities, textbooks)
+
+
+class StockShortfall(Exception):
+    """Raised inside a savepoint to undo a partially applied decrement."""
+
+
+class StockContention(APIException):
+    """The checkout transaction lost a lock or serialization conflict and was rolled back."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Checkout is busy with other orders for these textbooks. Please retry.'
+    default_code = 'stock_contention'
+
+
+def conditional_decrement(quantities):
+    """
+    Decrement every textbook that still holds enough stock, in one UPDATE.
+
+    Returns:
+        int: Number of textbooks decremented
+    """
+    condition = reduce(or_, (Q(id=pk, stock__gte=quantity) for pk, quantity in quantities.items()))
+    return Textbook.objects.filter(condition).update(
+        stock=Case(
+            *(When(id=pk, then=F('stock') - quantity) for pk, quantity in quantities.items()),
+            output_field=IntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def shortfall_error(quantities, textbooks):
+    """
+    Describe the first item that cannot be reserved.
+
+    Args:
+        quantities (dict): Requested quantity keyed by textbook id
+        textbooks (dict): Current Textbook instances keyed by id
+    """
+    for textbook_id, quantity in quantities.items():
+        textbook = textbooks.get(textbook_id)
+        if textbook is None:
+            return serializers.ValidationError({
+                'detail': f"Textbook {textbook_id} is no longer available."
+            })
+        if textbook.stock < quantity:
+            return serializers.ValidationError({
+                'detail': f"Insufficient stock for {textbook.title}. Only {textbook.stock} available."
+            })
+    return serializers.ValidationError({
+        'detail': "Stock changed while placing your order. Please try again."
+    })
+
+
+DEFAULT_SETTINGS = {
+    'BACKEND': 'core.stock.LockingStockEngine',
+    'OPTIONS': {},
+}
+
+_stock_engine = None
+_stock_engine_lock = threading.Lock()
+
+
+def get_stock_engine():
+    """
+    Get the process-wide stock engine, building it from the ``STOCK_ENGINE`` setting on first use.
+    """
+    global _stock_engine
+    if _stock_engine is None:
+        with _stock_engine_lock:
+            if _stock_engine is None:
+                config = {**DEFAULT_SETTINGS, **getattr(settings, 'STOCK_ENGINE', {})}
+                _stock_engine = import_string(config['BACKEND'])(**config['OPTIONS'])
+    return _stock_engine
+
+
+@receiver(setting_changed)
+def reset_stock_engine(setting, **kwargs):
+    global _stock_engine
+    if setting == 'STOCK_ENGINE':
+        _stock_engine = None
+
+
+def reserve_stock(quantities):
+    """
+    Reserve stock for every textbook in an order in one pass.
+
+    The reservation is all or nothing: either every quantity is deducted
+    or no row changes. How rows are protected from concurrent checkouts
+    depends on the configured engine (LockingStockEngine or
+    OptimisticStockEngine).
+
+    Must be called inside ``transaction.atomic()``.
+
+    Args:
+        quantities (dict): Requested quantity keyed by textbook id
+
+    Returns:
+        The engine's result; LockingStockEngine returns the locked
+        Textbook instances keyed by id
+
+    Raises:
+        ValidationError: If a textbook is missing or has insufficient stock
+    """
+    quantities = dict(sorted(quantities.items()))
+    if not quantities:
+        return {}
+
+    reserved = get_stock_engine().reserve(quantities)
+
+    # Bulk updates bypass post_save, so invalidate the catalogue explicitly.
+    invalidate_catalogue()
+    return reserved
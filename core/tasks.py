@@ -0,0 +1,341 @@
+"""
+Database-backed background tasks.
+
+Side effects that must not slow a request down (emails, stock alerts...)
+are queued as rows of the ``core_task`` table and run by
+``python manage.py worker``, so no broker is needed. Functions become tasks
+with the ``task`` decorator::
+
+    @task(max_attempts=3)
+    def send_receipt(order_id):
+        ...
+
+    send_receipt.delay(order.pk)    # queued when the transaction commits
+
+Arguments are stored as JSON, so pass primary keys rather than instances.
+Workers claim due tasks with a conditional UPDATE, which lets any number of
+worker processes share the table on SQLite and PostgreSQL alike. A task
+that raises is retried with exponential backoff until it runs out of
+attempts; one whose worker died is requeued once its lock times out.
+
+Workers are configured through the ``TASKS`` setting::
+
+    TASKS = {
+        'CONCURRENCY': 4,       # tasks run at once per worker
+        'POOL': 'thread',       # 'thread', 'process' or 'inline'
+        'POLL_INTERVAL': 1.0,   # seconds between polls when idle
+        'MAX_ATTEMPTS': 5,
+        'BACKOFF': 2.0,         # seconds before the first retry, doubled each time
+        'MAX_BACKOFF': 600,
+        'LOCK_TIMEOUT': 600,    # seconds before a running task is presumed lost
+        'EAGER': False,         # run tasks in-process on commit instead of queueing
+    }
+"""
+import functools
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'CONCURRENCY': 4,
+    'POOL': 'thread',
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF': 2.0,
+    'MAX_BACKOFF': 600,
+    'LOCK_TIMEOUT': 600,
+    'EAGER': False,
+}
+
+_registry = {}
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'TASKS', {})}
+
+
+class TaskFunction:
+    """
+    A function that can be queued as a background task.
+
+    Calling it runs the function directly; ``delay`` and ``enqueue`` queue
+    it for a worker.
+
+    Args:
+        func: The function to run
+        max_attempts (int): Attempts before giving up; defaults to
+            ``TASKS['MAX_ATTEMPTS']``
+    """
+    def __init__(self, func, max_attempts=None):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, **kwargs):
+        """Queue the task now, even inside an uncommitted transaction."""
+        return Task.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=self.max_attempts or get_settings()['MAX_ATTEMPTS'],
+            run_at=timezone.now(),
+        )
+
+    def delay(self, *args, **kwargs):
+        """
+        Queue the task once the current transaction commits.
+
+        Nothing is queued if the transaction rolls back. With
+        ``TASKS['EAGER']`` the task runs in-process at that point instead,
+        without retries.
+        """
+        if get_settings()['EAGER']:
+            transaction.on_commit(lambda: run_eagerly(self, args, kwargs))
+        else:
+            transaction.on_commit(lambda: self.enqueue(*args, **kwargs))
+
+    def __repr__(self):
+        return f"<TaskFunction {self.name}>"
+
+
+def task(func=None, *, max_attempts=None):
+    """Register a function as a background task; usable with or without arguments."""
+    if func is None:
+        return functools.partial(task, max_attempts=max_attempts)
+    task_function = TaskFunction(func, max_attempts)
+    _registry[task_function.name] = task_function
+    return task_function
+
+
+def get_task(name):
+    """
+    Look up a task by name, importing its module if needed.
+
+    Raises:
+        ImportError: If no task of that name exists
+    """
+    if name not in _registry:
+        import_string(name)
+    if name not in _registry:
+        raise ImportError(f"{name} is not a registered task")
+    return _registry[name]
+
+
+def run_eagerly(task_function, args, kwargs):
+    try:
+        task_function(*args, **kwargs)
+    except Exception:
+        logger.exception("Task failed", extra={'task': task_function.name})
+
+
+def backoff(attempts, options=None):
+    """
+    Return the delay before retrying a task that failed ``attempts`` times.
+
+    The delay doubles with every attempt up to ``MAX_BACKOFF``, and is
+    jittered so tasks that failed together do not retry together.
+    """
+    options = options or get_settings()
+    delay = min(options['MAX_BACKOFF'], options['BACKOFF'] * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def requeue_lost(options=None):
+    """
+    Requeue running tasks whose lock has timed out, or fail those out of attempts.
+
+    Returns:
+        int: Number of tasks released
+    """
+    options = options or get_settings()
+    now = timezone.now()
+    lost = Task.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=options['LOCK_TIMEOUT']))
+    failed = lost.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', locked_at=None, finished_at=now, last_error='Worker lost while running task.'
+    )
+    return failed + lost.update(status='queued', locked_by='', locked_at=None, run_at=now)
+
+
+def claim(worker, limit):
+    """
+    Claim up to ``limit`` due tasks for a worker.
+
+    Each task is taken with an UPDATE conditional on it still being
+    queued, so two workers can never claim the same task.
+
+    Returns:
+        list: Primary keys of the claimed tasks, oldest first
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    candidates = Task.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'pk')
+    claimed = []
+    for pk in candidates.values_list('pk', flat=True)[:limit * 2]:
+        taken = Task.objects.filter(pk=pk, status='queued').update(
+            status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1
+        )
+        if taken:
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def execute(task_id, worker):
+    """
+    Run a claimed task and record the outcome.
+
+    Returns:
+        str: The task's new status, or None if it is no longer held by
+        this worker
+    """
+    record = Task.objects.filter(pk=task_id, status='running', locked_by=worker).first()
+    if record is None:
+        return None
+    try:
+        get_task(record.name).func(*record.args, **record.kwargs)
+    except Exception:
+        now = timezone.now()
+        extra = {'task': record.name, 'task_id': task_id, 'attempts': record.attempts}
+        if record.attempts >= record.max_attempts:
+            changes = {'status': 'failed', 'finished_at': now}
+            logger.error("Task failed", extra=extra, exc_info=True)
+        else:
+            changes = {'status': 'queued', 'run_at': now + backoff(record.attempts)}
+            logger.warning("Task will be retried", extra=extra, exc_info=True)
+        changes['last_error'] = traceback.format_exc()
+    else:
+        changes = {'status': 'succeeded', 'finished_at': timezone.now(), 'last_error': ''}
+    held = Task.objects.filter(pk=task_id, status='running', locked_by=worker).update(
+        locked_by='', locked_at=None, **changes
+    )
+    return changes['status'] if held else None
+
+
+def execute_in_pool(task_id, worker):
+    """Run execute() in a pool thread or process, which manages its own connections."""
+    close_old_connections()
+    try:
+        return execute(task_id, worker)
+    finally:
+        close_old_connections()
+
+
+def init_process():
+    """Set Django up in a pool process, which opens its own database connections."""
+    import django
+    django.setup()
+
+
+class InlineExecutor:
+    """Executor running each task in the worker's own thread, one at a time."""
+    def submit(self, func, *args):
+        future = Future()
+        if func is execute_in_pool:
+            # The worker's thread keeps its connection between tasks.
+            func = execute
+        try:
+            future.set_result(func(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class Worker:
+    """
+    Poll the task table and run due tasks in a pool.
+
+    Args:
+        concurrency (int): Tasks run at once
+        pool (str): 'thread', 'process' or 'inline'
+        poll_interval (float): Seconds to wait when no task is due
+        name (str): Identifies the worker in claimed tasks
+    """
+    def __init__(self, concurrency=None, pool=None, poll_interval=None, name=None):
+        options = get_settings()
+        self.options = options
+        self.pool = pool or options['POOL']
+        self.concurrency = 1 if self.pool == 'inline' else (concurrency or options['CONCURRENCY'])
+        self.poll_interval = options['POLL_INTERVAL'] if poll_interval is None else poll_interval
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.stopping = threading.Event()
+
+    def executor(self):
+        if self.pool == 'inline':
+            return InlineExecutor()
+        if self.pool == 'process':
+            # Forked children must not share the parent's connections.
+            connections.close_all()
+            return ProcessPoolExecutor(max_workers=self.concurrency, initializer=init_process)
+        if self.pool == 'thread':
+            return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='tasks')
+        raise ValueError(f"Unknown task pool {self.pool!r}")
+
+    def run(self, once=False):
+        """
+        Run tasks until stop() is called, or with ``once`` until none is due.
+
+        Returns:
+            int: Number of tasks started
+        """
+        executor = self.executor()
+        in_flight = set()
+        started = 0
+        try:
+            while not self.stopping.is_set():
+                finished = {future for future in in_flight if future.done()}
+                in_flight -= finished
+                for future in finished:
+                    if future.exception() is not None:
+                        logger.error("Task runner crashed", exc_info=future.exception())
+
+                requeue_lost(self.options)
+                claimed = claim(self.name, self.concurrency - len(in_flight))
+                for pk in claimed:
+                    in_flight.add(executor.submit(execute_in_pool, pk, self.name))
+                started += len(claimed)
+
+                if claimed:
+                    continue
+                if once and not in_flight:
+                    break
+                if in_flight:
+                    wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            executor.shutdown(wait=True)
+        return started
+
+    def stop(self):
+        """Stop claiming tasks; the ones running are allowed to finish."""
+        self.stopping.set()
+
+
+def run_pending():
+    """Run every due task in the current thread; for tests and scripts."""
+    return Worker(pool='inline', poll_interval=0).run(once=True)
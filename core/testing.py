@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    TestCase with an upper-bound variant of ``assertNumQueries``.
+
+    ``assertNumQueries`` fails whenever a count changes, even when a change
+    removes queries. Budgets only fail when an endpoint gets more expensive,
+    which is what catches N+1 regressions.
+    """
+    @contextmanager
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                f"{index}. {query['sql']}" for index, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(f"{executed} queries executed, budget is {budget}\nCaptured queries were:\n{queries}")
+
+
+def route_names(urlconf_modules):
+    """
+    Collect the names of every route included from the given urlconf modules.
+
+    Used to check that each endpoint an app exposes has a query budget.
+
+    Args:
+        urlconf_modules: Dotted module paths such as ``'core.urls'``
+
+    Returns:
+        set: Route names defined inside those modules
+    """
+    def walk(patterns, inside):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                module = getattr(pattern.urlconf_name, '__name__', pattern.urlconf_name)
+                nested = inside or (isinstance(module, str) and module in urlconf_modules)
+                yield from walk(pattern.url_patterns, nested)
+            elif isinstance(pattern, URLPattern) and inside and pattern.name:
+                yield pattern.name
+
+    return set(walk(get_resolver().url_patterns, False))
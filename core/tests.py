@@ -1,3 +1,1711 @@
-from django.test import TestCase
+import csv
+import functools
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework.throttling import ScopedRateThrottle
+
+from .logs import (
+    CorrelationIdMiddleware, JsonFormatter, QueueingHandler, RedactingFilter, SamplingFilter, get_correlation_id,
+)
+from .cache import CatalogueCache, RedisBackend, get_catalogue_cache
+from .fastpath import compile_serializer
+from . import choices, idempotency, images, imports, signals, tasks
+from .models import DailySales, Department, IdempotencyRecord, Order, OrderItem, Task, Textbook
+from .views import OrderViewSet, ReportViewSet, TextbookViewSet, textbook_queryset
+from .pagination import EstimatedCountPaginator, KeysetCursorPagination
+from .profiling import ProfilingMiddleware, get_profile_stats
+from .renderers import FastJSONRenderer
+from .testing import QueryBudgetTestCase, route_names
+from .serializers import TextbookSerializer
+from .search import InvertedIndexBackend, SQLiteFTSBackend, fts5_available, get_search_backend
+from .stock import OptimisticStockEngine, StockContention, reserve_stock
+
+
+core_handlers = []
+
+
+def setUpModule():
+    """Keep test runs quiet; tests that check log records capture them with assertLogs."""
+    logger = logging.getLogger('core')
+    core_handlers[:] = logger.handlers
+    logger.handlers = [logging.NullHandler()]
+
+
+def tearDownModule():
+    logging.getLogger('core').handlers = list(core_handlers)
+
+def get_department(value):
+    """
+    Return the Department for a code or display name.
+
+    TransactionTestCase flushes the rows the migration seeded, so they are
+    recreated on demand.
+    """
+    codes = {name: code for code, name in Textbook.DEPARTMENT_CHOICES}
+    code = codes.get(value, value)
+    names = dict(Textbook.DEPARTMENT_CHOICES)
+    return Department.objects.get_or_create(code=code, defaults={'name': names.get(code, code)})[0]
+
+
+def make_textbook(**kwargs):
+    """Create a textbook with sensible defaults for tests."""
+    defaults = {
+        'title': 'Introduction to Programming',
+        'course_code': 'COM 111',
+        'department': 'computer_science',
+        'level': 'nd1',
+        'price': Decimal('2500.00'),
+        'description': 'Programming fundamentals',
+        'stock': 10,
+    }
+    defaults.update(kwargs)
+    defaults['department'] = get_department(defaults['department'])
+    return Textbook.objects.create(**defaults)
+
+
+def order_payload(items, **kwargs):
+    """Build a valid order request body for the given (textbook, quantity) pairs."""
+    payload = {
+        'reference': 'REF-0001',
+        'status': 'pending',
+        'total_amount': '0.00',
+        'student_name': 'Ada Obi',
+        'student_email': 'ada@example.com',
+        'matric_number': 'F/ND/23/0001',
+        'department': 'computer_science',
+        'level': 'nd1',
+        'phone_number': '08010000000',
+        'items': [
+            {'textbook': textbook.pk, 'quantity': quantity, 'price': str(textbook.price)}
+            for textbook, quantity in items
+        ],
+    }
+    payload.update(kwargs)
+    return payload
+
+
+class ReserveStockTests(TestCase):
+    def test_reserves_all_items_with_one_update(self):
+        first = make_textbook(stock=5)
+        second = make_textbook(title='Data Structures', course_code='COM 212', stock=3)
+
+        with transaction.atomic():
+            with self.assertNumQueries(2):
+                reserved = reserve_stock({second.pk: 3, first.pk: 2})
+
+        self.assertEqual(reserved[first.pk].stock, 3)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, second.stock), (3, 0))
+
+    def test_insufficient_stock_leaves_every_row_untouched(self):
+        first = make_textbook(stock=5)
+        second = make_textbook(title='Data Structures', course_code='COM 212', stock=1)
+
+        with self.assertRaises(serializers.ValidationError):
+            with transaction.atomic():
+                reserve_stock({first.pk: 2, second.pk: 2})
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, second.stock), (5, 1))
+
+    def test_order_endpoint_decrements_stock(self):
+        textbook = make_textbook(stock=4)
+
+        response = APIClient().post('/api/v1/orders/', order_payload([(textbook, 3)]), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        textbook.refresh_from_db()
+        self.assertEqual(textbook.stock, 1)
+
+    def test_order_endpoint_rejects_oversell(self):
+        textbook = make_textbook(stock=2)
+
+        response = APIClient().post('/api/v1/orders/', order_payload([(textbook, 3)]), format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        textbook.refresh_from_db()
+        self.assertEqual(textbook.stock, 2)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_oversell(self):
+        textbook = make_textbook(stock=5)
+        workers = 12
+        barrier = threading.Barrier(workers)
+        outcomes = []
+
+        def checkout():
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        with transaction.atomic():
+                            reserve_stock({textbook.pk: 1})
+                        outcomes.append('reserved')
+                        return
+                    except serializers.ValidationError:
+                        outcomes.append('rejected')
+                        return
+                    except OperationalError:
+                        # Another writer holds the database lock; retry.
+                        continue
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        textbook.refresh_from_db()
+        self.assertEqual(outcomes.count('reserved'), 5)
+        self.assertEqual(outcomes.count('rejected'), workers - 5)
+        self.assertEqual(textbook.stock, 0)
+
+
+@override_settings(STOCK_ENGINE={'BACKEND': 'core.stock.OptimisticStockEngine'})
+class OptimisticConcurrentCheckoutTests(ConcurrentCheckoutTests):
+    pass
+
+
+@override_settings(STOCK_ENGINE={'BACKEND': 'core.stock.OptimisticStockEngine'})
+class OptimisticStockEngineTests(TestCase):
+    def setUp(self):
+        self.first = make_textbook(stock=5)
+        self.second = make_textbook(title='Data Structures', course_code='COM 212', stock=1)
+
+    def stock(self):
+        return tuple(Textbook.objects.order_by('id').values_list('stock', flat=True))
+
+    def test_reserves_without_reading_rows(self):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                reserve_stock({self.first.pk: 2, self.second.pk: 1})
+
+        statements = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('UPDATE'))
+        self.assertEqual(self.stock(), (3, 0))
+
+    def test_shortfall_rolls_back_every_item(self):
+        with self.assertRaisesMessage(serializers.ValidationError, 'Insufficient stock for Data Structures'):
+            with transaction.atomic():
+                reserve_stock({self.first.pk: 2, self.second.pk: 2})
+
+        self.assertEqual(self.stock(), (5, 1))
+
+    def test_database_errors_abort_the_checkout_with_409(self):
+        with mock.patch('core.stock.conditional_decrement', side_effect=OperationalError('locked')) as decrement:
+            with self.assertRaises(OperationalError):
+                OptimisticStockEngine().reserve({self.first.pk: 1})
+            self.assertEqual(decrement.call_count, 1)
+
+            response = APIClient().post('/api/v1/orders/', order_payload([(self.first, 3)]), format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['detail'], StockContention.default_detail)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(), (5, 1))
+
+    def test_order_endpoint_uses_configured_engine(self):
+        response = APIClient().post('/api/v1/orders/', order_payload([(self.first, 3)]), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(), (2, 1))
+
+
+class OrderCreationQueryTests(TestCase):
+    def post_order(self, textbooks, reference):
+        payload = order_payload([(textbook, 1) for textbook in textbooks], reference=reference)
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post('/api/v1/orders/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_items(self):
+        textbooks = [
+            make_textbook(title=f'Book {index}', course_code=f'GNS {100 + index}')
+            for index in range(25)
+        ]
+
+        single = self.post_order(textbooks[:1], 'REF-SINGLE')
+        desk = self.post_order(textbooks[1:], 'REF-DESK')
+
+        self.assertEqual(single, desk)
+        order = Order.objects.get(reference='REF-DESK')
+        self.assertEqual(order.items.count(), 24)
+        item = order.items.get(textbook=textbooks[7])
+        self.assertEqual((item.book_title, item.course_code), ('Book 7', 'GNS 107'))
+
+    def test_unknown_textbook_is_rejected(self):
+        textbook = make_textbook()
+        payload = order_payload([(textbook, 1)])
+        payload['items'][0]['textbook'] = textbook.pk + 100
+
+        response = APIClient().post('/api/v1/orders/', payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+
+
+class FakeRedis:
+    """Minimal stand-in for a redis-py client storing values as bytes."""
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.store:
+            return None
+        self.store[key] = str(value).encode('utf-8')
+        return True
+
+    def incr(self, key):
+        value = int(self.store.get(key, b'0')) + 1
+        self.store[key] = str(value).encode('utf-8')
+        return value
+
+    def delete(self, key):
+        return int(self.store.pop(key, None) is not None)
+
+
+@override_settings(CATALOGUE_CACHE={'BACKEND': 'core.cache.LocalMemoryBackend'})
+class CatalogueCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cache = get_catalogue_cache()
+        self.cache.invalidate()
+        self.cache.reset_stats()
+
+    def test_list_is_served_from_cache_until_a_textbook_changes(self):
+        textbook = make_textbook()
+
+        first = self.client.get('/api/v1/textbooks/', {'level': 'ND 1'})
+        # Only the cheap validator aggregate reaches the database.
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/v1/textbooks/', {'level': ' ND 1', 'search': ''})
+
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            textbook.title = 'Programming in C'
+            textbook.save()
+
+        third = self.client.get('/api/v1/textbooks/', {'level': 'ND 1'})
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(third.json()['results'][0]['title'], 'Programming in C')
+
+    def test_checkout_invalidates_cached_stock(self):
+        textbook = make_textbook(stock=3)
+        self.client.get(f'/api/v1/textbooks/{textbook.pk}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/orders/', order_payload([(textbook, 2)]), format='json')
+
+        response = self.client.get(f'/api/v1/textbooks/{textbook.pk}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['stock'], 1)
+
+    def test_missing_textbook_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/v1/textbooks/999/').status_code, 404)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+        self.assertEqual(self.client.get('/api/v1/textbooks/999/').status_code, 404)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+
+class RedisBackendTests(TestCase):
+    def test_generation_bump_orphans_entries(self):
+        cache = CatalogueCache(RedisBackend(client=FakeRedis()))
+        calls = []
+
+        def produce():
+            calls.append(1)
+            return {'count': len(calls)}
+
+        self.assertEqual(cache.get_or_set('list', {'level': 'ND 1'}, produce), ({'count': 1}, False))
+        self.assertEqual(cache.get_or_set('list', {'level': 'ND 1'}, produce), ({'count': 1}, True))
+        cache.invalidate()
+        self.assertEqual(cache.get_or_set('list', {'level': 'ND 1'}, produce), ({'count': 2}, False))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        get_catalogue_cache().invalidate()
+
+    def test_unchanged_list_returns_304(self):
+        make_textbook()
+        first = self.client.get('/api/v1/textbooks/', {'level': 'ND 1'})
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('"'))
+
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/v1/textbooks/', {'level': 'ND 1'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        by_date = self.client.get('/api/v1/textbooks/', {'level': 'ND 1'}, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(by_date.status_code, 304)
+
+    def test_etag_changes_with_rows_and_parameters(self):
+        textbook = make_textbook()
+        etag = self.client.get('/api/v1/textbooks/')['ETag']
+
+        self.assertNotEqual(self.client.get('/api/v1/textbooks/', {'level': 'ND 2'})['ETag'], etag)
+
+        make_textbook(title='Data Structures', course_code='COM 212')
+        self.assertEqual(self.client.get('/api/v1/textbooks/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        detail = self.client.get(f'/api/v1/textbooks/{textbook.pk}/')
+        Textbook.objects.filter(pk=textbook.pk).update(updated_at=textbook.updated_at.replace(year=2030))
+        refreshed = self.client.get(f'/api/v1/textbooks/{textbook.pk}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed['ETag'], detail['ETag'])
+
+    def test_rows_updated_behind_the_cache_are_not_served_stale(self):
+        textbook = make_textbook(title='A')
+        for url in (f'/api/v1/textbooks/{textbook.pk}/', f'/api/v1/async/textbooks/{textbook.pk}/'):
+            with self.subTest(url=url):
+                Textbook.objects.filter(pk=textbook.pk).update(title='A', updated_at=timezone.now())
+                self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+                self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+                # A queryset update skips the signals that bump the cache generation.
+                Textbook.objects.filter(pk=textbook.pk).update(
+                    title='B', updated_at=timezone.now() + timedelta(seconds=1)
+                )
+                changed = self.client.get(url)
+                self.assertEqual(changed['X-Cache'], 'MISS')
+                self.assertEqual(changed.json()['title'], 'B')
+                revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=changed['ETag'])
+                self.assertEqual(revalidated.status_code, 304)
+
+
+    def test_malformed_detail_id_is_not_found(self):
+        self.assertEqual(self.client.get('/api/v1/textbooks/abc/').status_code, 404)
+
+class SearchBackendTests(TestCase):
+    def setUp(self):
+        get_catalogue_cache().invalidate()
+        self.programming = make_textbook(title='Introduction to Programming', course_code='COM 111')
+        self.structures = make_textbook(
+            title='Data Structures', course_code='COM 212',
+            description='Covers programming with lists, trees and graphs',
+        )
+        self.accounting = make_textbook(title='Financial Accounting', course_code='ACC 101',
+                                        description='Ledgers and trial balance')
+
+    def assertRanked(self, backend):
+        ids = list(backend.filter_queryset(Textbook.objects.all(), 'progr').values_list('id', flat=True))
+        # Title matches outrank description matches.
+        self.assertEqual(ids, [self.programming.pk, self.structures.pk])
+        codes = backend.filter_queryset(Textbook.objects.all(), 'com 2').values_list('id', flat=True)
+        self.assertEqual(list(codes), [self.structures.pk])
+        self.assertFalse(backend.filter_queryset(Textbook.objects.all(), 'chemistry').exists())
+
+    def test_fts_backend_ranks_prefix_matches(self):
+        if not fts5_available():
+            self.skipTest('SQLite FTS5 is not available')
+        self.assertRanked(SQLiteFTSBackend())
+
+    def test_fts_index_follows_updates_and_deletes(self):
+        if not fts5_available():
+            self.skipTest('SQLite FTS5 is not available')
+        backend = SQLiteFTSBackend()
+        self.accounting.title = 'Cost Accounting'
+        self.accounting.save()
+        self.assertEqual(backend.search('cost'), [self.accounting.pk])
+        self.assertEqual(backend.search('financial'), [])
+        self.accounting.delete()
+        self.assertEqual(backend.search('cost'), [])
+
+    def test_triggers_dropped_by_a_table_rebuild_are_reinstalled_after_migrate(self):
+        if not fts5_available():
+            self.skipTest('SQLite FTS5 is not available')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER core_textbook_fts_au')
+        signals.repair_search_schema(sender=None, using=connection.alias)
+        self.accounting.title = 'Cost Accounting'
+        self.accounting.save()
+        self.assertEqual(SQLiteFTSBackend().search('cost'), [self.accounting.pk])
+
+    def test_inverted_index_ranks_prefix_matches(self):
+        self.assertRanked(InvertedIndexBackend())
+
+    def test_inverted_index_follows_updates_and_deletes(self):
+        backend = InvertedIndexBackend()
+        backend.rebuild()
+        self.accounting.title = 'Cost Accounting'
+        backend.update(self.accounting)
+        self.assertEqual(backend.search('cost'), [self.accounting.pk])
+        self.assertEqual(backend.search('financial'), [])
+        backend.remove(self.accounting.pk)
+        self.assertEqual(backend.search('accounting'), [])
+
+    def test_search_parameter_uses_ranked_backend(self):
+        response = APIClient().get('/api/v1/textbooks/', {'search': 'programming'})
+        self.assertEqual(
+            [textbook['id'] for textbook in response.json()['results']],
+            [self.programming.pk, self.structures.pk],
+        )
+
+
+def make_order(reference, items=(), **kwargs):
+    """Create an order directly, bypassing stock reservation."""
+    defaults = {
+        'status': 'pending',
+        'total_amount': Decimal('0.00'),
+        'student_name': 'Ada Obi',
+        'student_email': 'ada@example.com',
+        'matric_number': 'F/ND/23/0001',
+        'department': 'computer_science',
+        'level': 'nd1',
+        'phone_number': '08010000000',
+    }
+    defaults.update(kwargs)
+    defaults['department'] = get_department(defaults['department'])
+    order = Order.objects.create(reference=reference, **defaults)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, textbook=textbook, quantity=quantity, price=textbook.price,
+                  book_title=textbook.title, course_code=textbook.course_code)
+        for textbook, quantity in items
+    ])
+    return order
+
+
+def make_staff_client():
+    """Return an API client authenticated as a staff user."""
+    user = get_user_model().objects.create_user(username='bursar', password='secret', is_staff=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class KeysetPaginationTests(TestCase):
+    def collect(self, client, url, params):
+        seen, pages = [], 0
+        response = client.get(url, params)
+        while True:
+            pages += 1
+            body = response.json()
+            seen.extend(body['results'])
+            if not body['next']:
+                return seen, pages, body
+            response = client.get(body['next'])
+
+    def test_orders_page_through_ties_without_gaps(self):
+        client = make_staff_client()
+        moment = timezone.now()
+        for index in range(7):
+            order = make_order(f'REF-{index}')
+            # Three orders share a timestamp to exercise the id tie-breaker.
+            Order.objects.filter(pk=order.pk).update(created_at=moment - timedelta(minutes=max(index - 2, 0)))
+
+        seen, pages, last = self.collect(client, '/api/v1/orders/', {'page_size': 2})
+
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('reference', flat=True))
+        self.assertEqual([order['reference'] for order in seen], expected)
+        self.assertEqual(pages, 4)
+
+        previous = client.get(last['previous']).json()
+        self.assertEqual([order['reference'] for order in previous['results']], expected[4:6])
+
+    def test_page_size_is_capped(self):
+        client = make_staff_client()
+        for index in range(3):
+            make_order(f'REF-{index}')
+        with mock.patch.object(KeysetCursorPagination, 'max_page_size', 2):
+            response = client.get('/api/v1/orders/', {'page_size': 10_000})
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_tampered_cursor_is_rejected(self):
+        client = make_staff_client()
+        self.assertEqual(client.get('/api/v1/orders/', {'cursor': 'cD1nYXJiYWdl'}).status_code, 404)
+
+    def test_ranked_search_pages_by_relevance(self):
+        get_catalogue_cache().invalidate()
+        for index in range(5):
+            make_textbook(title=f'Thermodynamics {index}', course_code=f'MEE {200 + index}')
+        client = APIClient()
+
+        seen, pages, _ = self.collect(client, '/api/v1/textbooks/', {'search': 'thermo', 'page_size': 2})
+
+        ranked = list(
+            get_search_backend().filter_queryset(Textbook.objects.all(), 'thermo').values_list('id', flat=True)
+        )
+        self.assertEqual([textbook['id'] for textbook in seen], ranked)
+        self.assertEqual(pages, 3)
+
+
+class EndpointQueryBudgetTests(QueryBudgetTestCase):
+    """
+    Query budgets for every core and authentication endpoint.
+
+    Budgets are checked against enough rows that a per-row query would blow
+    through them. New endpoints fail test_every_endpoint_has_a_budget until
+    a budget is added to budgets().
+    """
+    ROWS = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.textbooks = [
+            make_textbook(title=f'Book {index}', course_code=f'GNS {100 + index}', stock=100)
+            for index in range(cls.ROWS)
+        ]
+        for index in range(cls.ROWS):
+            make_order(f'REF-{index}', items=[(textbook, 1) for textbook in cls.textbooks[:3]])
+        cls.staff = get_user_model().objects.create_user(username='bursar', password='secret', is_staff=True)
+
+    def setUp(self):
+        get_catalogue_cache().invalidate()
+        self.anonymous = APIClient()
+        self.staff_client = APIClient()
+        self.staff_client.force_authenticate(self.staff)
+        # Backend selection probes the database once per process.
+        get_search_backend()
+
+    def budgets(self):
+        """Return (route, method, kwargs, payload, client, budget) cases."""
+        textbook = self.textbooks[0]
+        refresh = self.anonymous.post('/api/v1/token/', {'username': 'bursar', 'password': 'secret'}).json()['refresh']
+        return [
+            ('api-root', 'get', {}, None, self.staff_client, 0),
+            ('textbook-list', 'get', {}, {'department': 'Computer Science', 'level': 'ND 1'}, self.anonymous, 2),
+            ('textbook-list', 'get', {}, {'search': 'book'}, self.anonymous, 2),
+            ('textbook-detail', 'get', {'pk': textbook.pk}, None, self.anonymous, 2),
+            ('textbook-filters', 'get', {}, None, self.anonymous, 0),
+            ('async-textbook-list', 'get', {}, {'department': 'Computer Science', 'level': 'ND 1'}, self.anonymous, 2),
+            ('async-textbook-list', 'get', {}, {'search': 'book'}, self.anonymous, 2),
+            ('async-textbook-detail', 'get', {'pk': textbook.pk}, None, self.anonymous, 2),
+            ('async-textbook-filters', 'get', {}, None, self.anonymous, 0),
+            ('order-list', 'get', {}, None, self.staff_client, 2),
+            ('order-detail', 'get', {'reference': 'REF-3'}, None, self.anonymous, 2),
+            ('order-export', 'get', {}, {'output': 'ndjson'}, self.staff_client, 2),
+            ('order-lookup', 'get', {}, {'matric_number': 'F/ND/23/0001', 'email': 'ada@example.com'},
+             self.anonymous, 2),
+            ('order-list', 'post', {}, order_payload([(book, 1) for book in self.textbooks], reference='REF-NEW'),
+             self.anonymous, 15),
+            ('report-sales', 'get', {}, {'group_by': 'textbook', 'status': 'all'}, self.staff_client, 2),
+            ('stats-profiling', 'get', {}, None, self.staff_client, 0),
+            ('auth-register', 'post', {}, {'username': 'newstaff', 'password': 'secret-pass-123',
+                                           'email': 'staff@example.com'}, self.anonymous, 2),
+            ('auth-me', 'get', {}, None, self.staff_client, 0),
+            ('token_obtain_pair', 'post', {}, {'username': 'bursar', 'password': 'secret'}, self.anonymous, 1),
+            ('token_refresh', 'post', {}, {'refresh': refresh}, self.anonymous, 1),
+        ]
+
+    def test_every_endpoint_has_a_budget(self):
+        budgeted = {case[0] for case in self.budgets()}
+        self.assertEqual(route_names({'core.urls', 'authentication.urls'}) - budgeted, set())
+
+    def test_endpoints_stay_within_budget(self):
+        for route, method, kwargs, payload, client, budget in self.budgets():
+            url = reverse(route, kwargs=kwargs)
+            with self.subTest(route=route, method=method, payload=payload):
+                with self.assertMaxQueries(budget):
+                    response = getattr(client, method)(url, payload, format='json' if method == 'post' else None)
+                    # Streaming responses query while they are consumed.
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                self.assertLess(response.status_code, 400, body)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.client = make_staff_client()
+        self.textbook = make_textbook()
+        self.other = make_textbook(title='Data Structures', course_code='COM 212')
+        self.first = make_order('REF-1', items=[(self.textbook, 2), (self.other, 1)], status='completed')
+        self.second = make_order('REF-2', items=[(self.textbook, 1)], department='Accountancy', level='ND 2')
+        self.third = make_order('REF-3', status='failed')
+        Order.objects.filter(pk=self.first.pk).update(created_at=timezone.now() - timedelta(days=3))
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_has_one_row_per_item(self):
+        response = self.client.get('/api/v1/orders/export/')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(self.content(response))))
+        self.assertEqual([row['reference'] for row in rows], ['REF-1', 'REF-1', 'REF-2', 'REF-3'])
+        self.assertEqual(rows[1]['course_code'], 'COM 212')
+        self.assertEqual(rows[3]['book_title'], '')
+
+    def test_ndjson_nests_items_and_applies_filters(self):
+        response = self.client.get('/api/v1/orders/export/', {
+            'output': 'ndjson', 'department': 'accountancy', 'level': 'nd2',
+            'date_from': timezone.localdate().isoformat(),
+        })
+
+        lines = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([line['reference'] for line in lines], ['REF-2'])
+        self.assertEqual(lines[0]['items'][0]['quantity'], 1)
+
+    def test_streams_in_constant_queries(self):
+        for index in range(10):
+            make_order(f'REF-BULK-{index}', items=[(self.textbook, 1)])
+        with mock.patch.object(OrderViewSet, 'export_chunk_size', 4):
+            response = self.client.get('/api/v1/orders/export/', {'status': 'pending'})
+            with self.assertNumQueries(4):
+                lines = self.content(response).splitlines()
+        self.assertEqual(len(lines), 12)
+
+    def test_requires_staff_and_valid_filters(self):
+        self.assertEqual(APIClient().get('/api/v1/orders/export/').status_code, 401)
+        response = self.client.get('/api/v1/orders/export/', {'date_from': '2025-02-01', 'date_to': '2025-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderLookupTests(TestCase):
+    url = '/api/v1/orders/lookup/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.textbook = make_textbook()
+        self.first = make_order('REF-1', items=[(self.textbook, 1)])
+        self.second = make_order('REF-2', items=[(self.textbook, 2)])
+        make_order('REF-3', matric_number='F/ND/23/0002', student_email='bola@example.com')
+
+    def lookup(self, **params):
+        return self.client.get(self.url, {'matric_number': 'F/ND/23/0001', 'email': 'ada@example.com', **params})
+
+    def test_lists_the_students_orders_newest_first(self):
+        response = self.lookup(email='ADA@Example.com')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([order['reference'] for order in results], ['REF-2', 'REF-1'])
+        self.assertEqual(results[0]['items'][0]['quantity'], 2)
+
+    def test_wrong_email_looks_like_no_orders(self):
+        mismatched = self.lookup(email='bola@example.com').json()
+        unknown = self.lookup(matric_number='F/ND/23/9999').json()
+        self.assertEqual(mismatched, unknown)
+        self.assertEqual(mismatched['results'], [])
+
+    def test_requires_matric_number_and_email(self):
+        response = self.client.get(self.url, {'matric_number': 'F/ND/23/0001'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+        self.assertEqual(self.lookup(email='not-an-email').status_code, 400)
+
+    def test_pages_with_cursor(self):
+        with mock.patch.object(KeysetCursorPagination, 'page_size', 1):
+            page = self.lookup().json()
+            self.assertEqual([order['reference'] for order in page['results']], ['REF-2'])
+            page = self.client.get(page['next']).json()
+        self.assertEqual([order['reference'] for order in page['results']], ['REF-1'])
+        self.assertIsNone(page['next'])
+
+    def test_filter_uses_matric_index(self):
+        queryset = Order.objects.filter(matric_number='F/ND/23/0001', student_email__iexact='ada@example.com')
+        plan = queryset.order_by(*KeysetCursorPagination.ordering)[:21].explain()
+        self.assertIn('USING INDEX core_order_matric', plan)
+
+    def test_is_rate_limited(self):
+        with mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', {'order-lookup': '2/minute'}):
+            self.assertEqual(self.lookup().status_code, 200)
+            self.assertEqual(self.lookup(email='bola@example.com').status_code, 200)
+            response = self.lookup()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_other_order_routes_are_not_throttled(self):
+        with mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', {'order-lookup': '1/minute'}):
+            self.lookup()
+            for _ in range(3):
+                self.assertEqual(self.client.get('/api/v1/orders/REF-1/').status_code, 200)
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.client = make_staff_client()
+        self.programming = make_textbook(price=Decimal('2000.00'))
+        self.accounting = make_textbook(title='Financial Accounting', course_code='ACC 101',
+                                        department='accountancy', level='nd2', price=Decimal('3000.00'))
+
+    def place_order(self, reference, items, run_tasks=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post('/api/v1/orders/', order_payload(items, reference=reference), format='json')
+        self.assertEqual(response.status_code, 201)
+        if run_tasks:
+            tasks.run_pending()
+        return Order.objects.get(reference=reference)
+
+    def snapshot(self):
+        return sorted(DailySales.objects.values_list(
+            'date', 'textbook_id', 'status', 'department', 'level', 'quantity', 'revenue', 'order_count'
+        ))
+
+    def test_orders_are_rolled_up_incrementally(self):
+        first = self.place_order('REF-1', [(self.programming, 2), (self.accounting, 1)])
+        self.place_order('REF-2', [(self.programming, 1)])
+
+        row = DailySales.objects.get(textbook=self.programming, status='pending')
+        self.assertEqual((row.quantity, row.revenue, row.order_count), (3, Decimal('6000.00'), 2))
+
+        response = self.client.patch(f'/api/v1/orders/{first.reference}/', {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        completed = DailySales.objects.get(textbook=self.accounting, status='completed')
+        self.assertEqual((completed.quantity, completed.department.code), (1, 'accountancy'))
+        self.assertEqual(DailySales.objects.get(textbook=self.programming, status='pending').quantity, 1)
+
+        incremental = self.snapshot()
+        call_command('rebuild_sales_rollup', stdout=io.StringIO())
+        self.assertEqual(
+            [row for row in self.snapshot() if row[5]],
+            [row for row in incremental if row[5]],
+        )
+
+    def test_deleted_orders_leave_the_rollup(self):
+        order = self.place_order('REF-1', [(self.programming, 2)])
+        order.delete()
+        self.assertEqual(DailySales.objects.get(textbook=self.programming).quantity, 0)
+
+    def test_rollup_is_updated_off_the_request(self):
+        first = self.place_order('REF-1', [(self.programming, 2)], run_tasks=False)
+        self.assertFalse(DailySales.objects.exists())
+        self.assertTrue(Task.objects.filter(name='core.jobs.record_order_sales').exists())
+
+        # Changes reaching the rollup before the queued task still add up.
+        first.status = 'completed'
+        first.save()
+        second = self.place_order('REF-2', [(self.programming, 1)], run_tasks=False)
+        second.delete()
+        self.assertEqual(tasks.run_pending(), 6)
+        self.assertEqual(
+            set(DailySales.objects.values_list('status', 'quantity', 'order_count')),
+            {('pending', 0, 0), ('completed', 2, 1)},
+        )
+
+    def test_sales_report_groups_from_rollup(self):
+        first = self.place_order('REF-1', [(self.programming, 2), (self.accounting, 1)])
+        self.place_order('REF-2', [(self.accounting, 4)])
+        first.status = 'completed'
+        first.save()
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/reports/sales/', {'group_by': 'department'})
+        body = response.json()
+        self.assertEqual(
+            [(row['department'], row['quantity']) for row in body['results']],
+            [('accountancy', 1), ('computer_science', 2)],
+        )
+        self.assertEqual(body['totals']['revenue'], 7000.0)
+
+        everything = self.client.get('/api/v1/reports/sales/', {'group_by': 'textbook', 'status': 'all'}).json()
+        self.assertEqual(everything['totals']['quantity'], 7)
+        self.assertEqual(APIClient().get('/api/v1/reports/sales/').status_code, 401)
+
+
+@override_settings(PROFILING={'ENABLED': True})
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        get_catalogue_cache().invalidate()
+        get_profile_stats().reset()
+        self.textbooks = [make_textbook(title=f'Book {index}') for index in range(3)]
+
+    def timings(self, response):
+        return {
+            entry.split(';')[0]: entry for entry in (part.strip() for part in response['Server-Timing'].split(','))
+        }
+
+    def test_server_timing_reports_queries_and_serializer_time(self):
+        response = self.client.get('/api/v1/textbooks/')
+
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'serialize', 'app', 'total'})
+        self.assertIn('desc="2 queries"', timings['db'])
+        serialize = float(timings['serialize'].split('dur=')[1])
+        self.assertGreater(serialize, 0)
+
+    def test_stats_endpoint_aggregates_per_view(self):
+        for _ in range(3):
+            self.client.get('/api/v1/textbooks/')
+        self.client.get(f'/api/v1/textbooks/{self.textbooks[0].pk}/')
+
+        staff = make_staff_client()
+        body = staff.get('/api/v1/stats/profiling/').json()
+        views = {entry['view']: entry for entry in body['views']}
+        self.assertTrue(body['enabled'])
+        self.assertEqual(views['GET textbook-list']['count'], 3)
+        self.assertEqual(sum(views['GET textbook-list']['histogram'].values()), 3)
+        self.assertEqual(views['GET textbook-detail']['count'], 1)
+        self.assertIn('hits', body['catalogue_cache'])
+
+        self.assertEqual(staff.delete('/api/v1/stats/profiling/').status_code, 204)
+        # The DELETE itself is recorded after the reset.
+        self.assertEqual([entry['view'] for entry in get_profile_stats().snapshot()], ['DELETE stats-profiling'])
+        self.assertEqual(APIClient().get('/api/v1/stats/profiling/').status_code, 401)
+
+    def test_async_chain_stays_async_and_counts_queries(self):
+        async def view(request):
+            return HttpResponse(str(await Textbook.objects.acount()))
+
+        middleware = ProfilingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+
+        self.assertEqual(response.content, b'3')
+        self.assertIn('desc="1 queries"', self.timings(response)['db'])
+
+    @override_settings(PROFILING={'ENABLED': False})
+    def test_disabled_middleware_is_skipped(self):
+        response = self.client.get('/api/v1/textbooks/')
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(get_profile_stats().snapshot(), [])
+
+
+class StructuredLoggingTests(TestCase):
+    def record(self, level=logging.INFO, **extra):
+        record = logging.makeLogRecord({
+            'name': 'core.views', 'levelno': level, 'levelname': logging.getLevelName(level), 'msg': 'Order created',
+        })
+        record.__dict__.update(extra)
+        return record
+
+    def test_requests_carry_a_correlation_id(self):
+        textbook = make_textbook()
+        with self.assertLogs('core.views', 'INFO') as logs:
+            response = self.client.post(
+                '/api/v1/orders/', order_payload([(textbook, 1)]),
+                content_type='application/json', headers={'X-Request-ID': 'checkout-42'},
+            )
+
+        self.assertEqual(response['X-Request-ID'], 'checkout-42')
+        self.assertEqual(logs.records[0].reference, 'REF-0001')
+        generated = self.client.get('/api/v1/textbooks/', headers={'X-Request-ID': 'bad id\r\n'})
+        self.assertRegex(generated['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_rejected_orders_are_logged_with_payload(self):
+        with self.assertLogs('core.views', 'WARNING') as logs:
+            response = self.client.post('/api/v1/orders/', order_payload([]) | {'items': [{'textbook': 999}]},
+                                        content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(logs.records[0].payload['reference'], 'REF-0001')
+
+    def test_redaction_masks_nested_fields_without_mutating_input(self):
+        payload = {'student_email': 'ada@example.com', 'items': [{'phone_number': '080', 'quantity': 1}]}
+        record = self.record(payload=payload, student_email='ada@example.com')
+
+        RedactingFilter().filter(record)
+
+        self.assertEqual(record.payload, {
+            'student_email': '[REDACTED]',
+            'items': [{'phone_number': '[REDACTED]', 'quantity': 1}],
+        })
+        self.assertEqual(record.student_email, '[REDACTED]')
+        self.assertEqual(payload['student_email'], 'ada@example.com')
+
+    def test_redaction_covers_student_identity(self):
+        record = self.record(payload={'student_name': 'Ada Obi', 'matric_number': 'F/ND/23/0001', 'level': 'nd1'})
+
+        RedactingFilter().filter(record)
+
+        self.assertEqual(record.payload, {'student_name': '[REDACTED]', 'matric_number': '[REDACTED]', 'level': 'nd1'})
+
+    def test_correlation_middleware_stays_async(self):
+        async def view(request):
+            return HttpResponse(get_correlation_id())
+
+        middleware = CorrelationIdMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/', headers={'X-Request-ID': 'async-1'}))
+
+        self.assertEqual(response.content, b'async-1')
+        self.assertEqual(response['X-Request-ID'], 'async-1')
+        self.assertIsNone(get_correlation_id())
+
+    def test_sampling_keeps_failures(self):
+        sampler = SamplingFilter(rate=0)
+
+        self.assertFalse(sampler.filter(self.record(correlation_id='abc')))
+        self.assertTrue(sampler.filter(self.record(level=logging.WARNING, correlation_id='abc')))
+        half = SamplingFilter(rate=0.5)
+        kept = [half.filter(self.record(correlation_id=f'request-{index}')) for index in range(1000)]
+        self.assertTrue(300 < sum(kept) < 700)
+        # Decisions are stable per request.
+        self.assertEqual(kept, [half.filter(self.record(correlation_id=f'request-{index}')) for index in range(1000)])
+
+    def test_queueing_handler_writes_json_in_background(self):
+        stream = io.StringIO()
+        handler = QueueingHandler(target_options={'stream': stream})
+        handler.setFormatter(JsonFormatter())
+        self.addCleanup(handler.close)
+
+        handler.handle(self.record(reference='REF-1'))
+        handler.flush()
+
+        line = json.loads(stream.getvalue())
+        self.assertEqual((line['message'], line['reference'], line['level']), ('Order created', 'REF-1', 'INFO'))
+
+    def test_queueing_handler_drops_when_full(self):
+        handler = QueueingHandler(target_options={'stream': io.StringIO()}, queue_size=1)
+        handler.listener.stop()
+        self.addCleanup(handler.close)
+
+        for _ in range(3):
+            handler.handle(self.record())
+
+        self.assertEqual(handler.dropped, 2)
+
+
+class IdempotentOrderTests(TestCase):
+    def setUp(self):
+        self.textbook = make_textbook(stock=5)
+        self.payload = order_payload([(self.textbook, 2)])
+
+    def post(self, payload, key=None):
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.client.post('/api/v1/orders/', payload, content_type='application/json', headers=headers)
+
+    def stock(self):
+        self.textbook.refresh_from_db()
+        return self.textbook.stock
+
+    def test_retry_with_key_replays_without_touching_stock(self):
+        first = self.post(self.payload, key='cart-1')
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.post(self.payload, key='cart-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('core_textbook', queries[0]['sql'])
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_retry_without_key_replays_by_reference(self):
+        first = self.post(self.payload)
+        retry = self.post(self.payload)
+
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.stock(), 3)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.post(self.payload, key='cart-1')
+        response = self.post(order_payload([(self.textbook, 1)], reference='REF-0002'), key='cart-1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.stock(), 3)
+
+    def test_failed_requests_are_not_stored(self):
+        payload = order_payload([(self.textbook, 9)])
+        self.assertEqual(self.post(payload, key='cart-1').status_code, 400)
+
+        Textbook.objects.filter(pk=self.textbook.pk).update(stock=10)
+        self.assertEqual(self.post(payload, key='cart-1').status_code, 201)
+        self.assertEqual(self.stock(), 1)
+
+    def test_concurrent_duplicate_rolls_back_and_replays(self):
+        # Another request with the same key committed between our lookup and insert.
+        IdempotencyRecord.objects.create(
+            key='key:cart-1', fingerprint=idempotency.request_fingerprint(self.payload),
+            status_code=201, response_body={'reference': 'REF-0001', 'items': [], 'total_amount': '0.00'},
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        lookups = [None]
+
+        def replay(key, fingerprint):
+            return lookups.pop() if lookups else idempotency.replay_response(key, fingerprint)
+
+        with mock.patch('core.views.replay_response', side_effect=replay):
+            response = self.post(self.payload, key='cart-1')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.stock(), 5)
+        self.assertFalse(Order.objects.exists())
+
+    def test_expired_key_is_processed_again(self):
+        first = self.post(self.payload, key='cart-1')
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        retry = self.post(order_payload([(self.textbook, 2)], reference='REF-0002'), key='cart-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertFalse(retry.has_header('Idempotent-Replayed'))
+        self.assertEqual(self.stock(), 1)
+        record = IdempotencyRecord.objects.get()
+        self.assertEqual(record.response_body['reference'], 'REF-0002')
+        self.assertGreater(record.expires_at, timezone.now())
+
+    def test_purge_deletes_only_expired_records(self):
+        self.post(self.payload, key='cart-1')
+        self.post(order_payload([(self.textbook, 1)], reference='REF-0002'), key='cart-2')
+        IdempotencyRecord.objects.filter(key='key:cart-1').update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        stdout = io.StringIO()
+        call_command('purge_idempotency_records', '--batch-size', '1', stdout=stdout)
+
+        self.assertIn('Deleted 1 expired', stdout.getvalue())
+        self.assertEqual(list(IdempotencyRecord.objects.values_list('key', flat=True)), ['key:cart-2'])
+
+
+class AsyncCatalogueTests(TestCase):
+    def setUp(self):
+        get_catalogue_cache().invalidate()
+        self.textbooks = [
+            make_textbook(title=f'Book {index}', course_code=f'GNS {100 + index}',
+                          level='nd1' if index % 2 else 'nd2')
+            for index in range(5)
+        ]
+
+    def assertSameAsSync(self, sync_url, async_url, params=None):
+        sync = self.client.get(sync_url, params)
+        asynchronous = self.client.get(async_url, params)
+        self.assertEqual(asynchronous.status_code, sync.status_code)
+        self.assertEqual(asynchronous['Content-Type'], 'application/json')
+        expected = sync.content.replace(sync_url.encode(), async_url.encode())
+        self.assertEqual(asynchronous.content, expected)
+        return asynchronous
+
+    def test_list_matches_sync_endpoint(self):
+        self.assertSameAsSync('/api/v1/textbooks/', '/api/v1/async/textbooks/', {'level': 'ND 1'})
+        self.assertSameAsSync('/api/v1/textbooks/', '/api/v1/async/textbooks/', {'search': 'book'})
+
+    def test_list_cursors_walk_every_page(self):
+        seen, params = [], {'page_size': 2}
+        url = '/api/v1/async/textbooks/'
+        while url:
+            body = self.client.get(url, params).json()
+            seen.extend(row['id'] for row in body['results'])
+            url, params = body['next'], None
+        self.assertEqual(seen, sorted((book.pk for book in self.textbooks), reverse=True))
+
+    def test_detail_and_filters_match_sync_endpoints(self):
+        pk = self.textbooks[0].pk
+        self.assertSameAsSync(f'/api/v1/textbooks/{pk}/', f'/api/v1/async/textbooks/{pk}/')
+        self.assertSameAsSync(f'/api/v1/textbooks/{pk + 100}/', f'/api/v1/async/textbooks/{pk + 100}/')
+        self.assertSameAsSync('/api/v1/textbooks/filters/', '/api/v1/async/textbooks/filters/')
+
+    def test_conditional_get_and_cache(self):
+        first = self.client.get('/api/v1/async/textbooks/')
+        second = self.client.get('/api/v1/async/textbooks/')
+        revalidated = self.client.get('/api/v1/async/textbooks/', headers={'If-None-Match': first['ETag']})
+
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(self.client.post('/api/v1/async/textbooks/').status_code, 405)
+
+
+class FastSerializationTests(TestCase):
+    def setUp(self):
+        get_catalogue_cache().invalidate()
+        self.textbooks = [
+            make_textbook(title=f'Book {index} \u00e9', course_code=f'GNS {100 + index}',
+                          price=Decimal('1999.50') + index, image=f'textbooks/cover-{index}.jpg' if index % 2 else None)
+            for index in range(5)
+        ]
+        make_order('REF-1', [(self.textbooks[0], 2), (self.textbooks[3], 1)])
+        make_order('REF-2', [(self.textbooks[1], 1)], total_amount=Decimal('12.5'))
+        make_order('REF-3')
+
+    def assertSameAsDRF(self, client, view, url, params=None):
+        fast = client.get(url, params)
+        get_catalogue_cache().invalidate()
+        with mock.patch.object(view, 'fast_serialization', False), \
+                mock.patch.object(view, 'renderer_classes', [JSONRenderer]):
+            slow = client.get(url, params)
+        get_catalogue_cache().invalidate()
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_textbook_list_matches_drf_serializer(self):
+        body = self.assertSameAsDRF(self.client, TextbookViewSet, '/api/v1/textbooks/', {'page_size': 2}).json()
+        self.assertIsNone(body['results'][0]['image'])
+        self.assertEqual(body['results'][1]['image'], 'http://testserver/media/textbooks/cover-3.jpg')
+        self.assertSameAsDRF(self.client, TextbookViewSet, '/api/v1/textbooks/', {'search': 'book', 'page_size': 3})
+
+    def test_order_list_matches_drf_serializer(self):
+        client = make_staff_client()
+        body = self.assertSameAsDRF(client, OrderViewSet, '/api/v1/orders/').json()
+        self.assertEqual([len(order['items']) for order in body['results']], [0, 1, 2])
+
+    def test_uncompilable_serializer_falls_back(self):
+        class CardSerializer(TextbookSerializer):
+            label = serializers.SerializerMethodField()
+
+            def get_label(self, textbook):
+                return str(textbook)
+
+            class Meta(TextbookSerializer.Meta):
+                fields = TextbookSerializer.Meta.fields + ['label']
+
+        self.assertIsNone(compile_serializer(CardSerializer))
+        self.assertIsNotNone(compile_serializer(TextbookSerializer))
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'text': 'caf\u00e9 \u2028\u2029 "quoted"',
+            'decimals': [Decimal('2500.00'), Decimal('0.1'), Decimal('1E+20'), Decimal('0.00001')],
+            'when': timezone.now(),
+            'day': timezone.localdate(),
+            'lazy': gettext_lazy('Pending'),
+            1: [None, True, 3, 2 ** 40],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), JSONRenderer().render(None))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def test_only_catalogue_and_order_views_use_fast_renderer(self):
+        self.assertIsInstance(TextbookViewSet().get_renderers()[0], FastJSONRenderer)
+        self.assertIsInstance(OrderViewSet().get_renderers()[0], FastJSONRenderer)
+        self.assertIs(type(ReportViewSet().get_renderers()[0]), JSONRenderer)
+
+
+class SparseFieldsetTests(TestCase):
+    card = ['id', 'price', 'title', 'course_code', 'stock', 'image', 'renditions']
+
+    def setUp(self):
+        get_catalogue_cache().invalidate()
+        self.textbooks = [make_textbook(title=f'Book {index}', course_code=f'GNS {100 + index}') for index in range(5)]
+
+    def page_query(self, queries):
+        return next(query['sql'] for query in queries if 'LIMIT' in query['sql'])
+
+    def test_card_list_narrows_payload_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/textbooks/', {'fields': 'card', 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['results'][0]), self.card)
+        self.assertNotIn('description', self.page_query(queries))
+
+        seen, url, params = [], '/api/v1/textbooks/', {'fields': 'title', 'page_size': 2}
+        while url:
+            body = self.client.get(url, params).json()
+            seen.extend(row['title'] for row in body['results'])
+            self.assertEqual({key for row in body['results'] for key in row}, {'title'})
+            url, params = body['next'], None
+        self.assertEqual(seen, [f'Book {index}' for index in reversed(range(5))])
+
+    def test_detail_loads_only_requested_columns(self):
+        pk = self.textbooks[0].pk
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/v1/textbooks/{pk}/', {'fields': 'card,description'})
+        self.assertEqual(
+            list(response.json()), ['id', 'price', 'title', 'course_code', 'description', 'stock', 'image', 'renditions']
+        )
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('is_popular', queries[-1]['sql'])
+
+    def test_unknown_fields_are_rejected(self):
+        for url in ('/api/v1/textbooks/', '/api/v1/async/textbooks/'):
+            response = self.client.get(url, {'fields': 'title,isbn'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('isbn', response.json()['fields'][0])
+
+    def test_async_matches_sync(self):
+        pk = self.textbooks[0].pk
+        for sync_url, async_url in (('/api/v1/textbooks/', '/api/v1/async/textbooks/'),
+                                    (f'/api/v1/textbooks/{pk}/', f'/api/v1/async/textbooks/{pk}/')):
+            sync = self.client.get(sync_url, {'fields': 'card'})
+            asynchronous = self.client.get(async_url, {'fields': 'card'})
+            self.assertEqual(asynchronous.content, sync.content.replace(sync_url.encode(), async_url.encode()))
+
+    def test_compiled_and_drf_paths_agree(self):
+        fast = self.client.get('/api/v1/textbooks/', {'fields': 'card'})
+        get_catalogue_cache().invalidate()
+        with mock.patch.object(TextbookViewSet, 'fast_serialization', False):
+            slow = self.client.get('/api/v1/textbooks/', {'fields': 'card'})
+        self.assertEqual(fast.content, slow.content)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+class TextbookIndexTests(TestCase):
+    def setUp(self):
+        for index in range(20):
+            make_textbook(title=f'Book {index}', is_popular=index % 5 == 0, is_new=index % 3 == 0)
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertRegex(plan, r'USING (COVERING )?INDEX core_textbook_', plan)
+        self.assertNotRegex(plan, r'SCAN core_textbook(?! USING)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_catalogue_filters_use_an_index(self):
+        for params in (
+            {'department': 'Computer Science'},
+            {'level': 'ND 1'},
+            {'department': 'Computer Science', 'level': 'ND 1'},
+            {},
+        ):
+            with self.subTest(params=params):
+                self.assertUsesIndex(textbook_queryset(params).order_by(*KeysetCursorPagination.ordering)[:21])
+
+    def test_shelves_use_partial_indexes(self):
+        self.assertUsesIndex(Textbook.objects.filter(is_popular=True).order_by('-created_at')[:10])
+        self.assertUsesIndex(Textbook.objects.filter(is_new=True).order_by('-created_at')[:10])
+
+
+class ChoiceMapTests(TestCase):
+    def test_resolves_keys_and_display_names(self):
+        departments = choices.registry['department']
+        self.assertEqual(departments.resolve('Computer Science'), 'computer_science')
+        self.assertEqual(departments.resolve(' computer science '), 'computer_science')
+        self.assertEqual(departments.resolve('computer_science'), 'computer_science')
+        self.assertIsNone(departments.resolve('All Departments'))
+        self.assertEqual(departments.label('mass_comm'), 'Mass Communication')
+        self.assertEqual(choices.registry['level'].stored_values('nd 1'), {'nd 1', 'nd1', 'ND 1'})
+        self.assertEqual(choices.registry['level'].stored_values('ND 9'), {'ND 9'})
+
+    def test_catalogue_filters_accept_keys_and_display_names(self):
+        make_textbook(title='First year', level='nd1')
+        make_textbook(title='Second year', level='nd2')
+        for level in ('ND 1', 'nd1', 'nd 1'):
+            get_catalogue_cache().invalidate()
+            body = self.client.get('/api/v1/textbooks/', {'level': level}).json()
+            self.assertEqual([row['title'] for row in body['results']], ['First year'])
+        get_catalogue_cache().invalidate()
+        self.assertEqual(len(self.client.get('/api/v1/textbooks/', {'level': 'All Levels'}).json()['results']), 2)
+
+    def test_filters_response_is_cacheable(self):
+        for url in ('/api/v1/textbooks/filters/', '/api/v1/async/textbooks/filters/'):
+            response = self.client.get(url)
+            self.assertEqual(response.json()['departments'][0], 'Computer Science')
+            self.assertEqual(response.json()['levels'], ['ND 1', 'ND 2', 'HND 1', 'HND 2'])
+            self.assertIn('max-age', response['Cache-Control'])
+            revalidated = self.client.get(url, headers={'If-None-Match': response['ETag']})
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertEqual(revalidated['ETag'], response['ETag'])
+
+    def test_department_table_reloads_after_changes(self):
+        self.assertIsNone(choices.registry['department'].resolve('estate'))
+        with self.captureOnCommitCallbacks(execute=True):
+            department = Department.objects.create(name='Estate Management', code='estate')
+        self.assertEqual(choices.registry['department'].resolve('estate management'), 'estate')
+        self.assertEqual(choices.registry['department'].department('ESTATE'), department)
+        self.assertEqual(choices.department_code(department.pk), 'estate')
+        with self.captureOnCommitCallbacks(execute=True):
+            department.delete()
+        self.assertIsNone(choices.registry['department'].resolve('estate'))
+
+
+class DepartmentForeignKeyTests(TestCase):
+    def setUp(self):
+        get_catalogue_cache().invalidate()
+        self.client = APIClient()
+
+    def test_department_is_written_and_read_as_code(self):
+        textbook = make_textbook(department='Mass Communication')
+        response = self.client.post('/api/v1/orders/', order_payload(
+            [(textbook, 1)], department='Mass Communication'
+        ), format='json')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual(order.department, get_department('mass_comm'))
+        self.assertEqual(response.json()['department'], 'mass_comm')
+        body = self.client.get('/api/v1/textbooks/').json()
+        self.assertEqual(body['results'][0]['department'], 'mass_comm')
+
+    def test_unknown_order_department_is_rejected(self):
+        textbook = make_textbook()
+        response = self.client.post('/api/v1/orders/', order_payload(
+            [(textbook, 1)], department='Basket Weaving'
+        ), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('department', response.json())
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Department.objects.filter(code=Department.UNKNOWN_CODE).exists())
+
+    def test_unknown_department_is_kept_out_of_the_catalogue(self):
+        Department.objects.create(code=Department.UNKNOWN_CODE, name=Department.UNKNOWN_NAME)
+        make_order('REF-1', department=Department.UNKNOWN_CODE, legacy_department='Basket Weaving')
+        choices.registry.invalidate('department')
+        filters = self.client.get('/api/v1/textbooks/filters/').json()
+        self.assertNotIn(Department.UNKNOWN_NAME, filters['departments'])
+        admin_choices = [label for _, label in Textbook._meta.get_field('department').get_choices(include_blank=False)]
+        self.assertNotIn(Department.UNKNOWN_NAME, admin_choices)
+
+    def test_unknown_textbook_department_is_rejected(self):
+        get_department(Department.UNKNOWN_CODE)
+        choices.registry.invalidate('department')
+        for value in ('Basket Weaving', Department.UNKNOWN_CODE):
+            with self.subTest(value=value):
+                serializer = TextbookSerializer(data={
+                    'title': 'Weaving', 'course_code': 'BSK 101', 'department': value, 'level': 'nd1', 'price': 10,
+                })
+                self.assertFalse(serializer.is_valid())
+                self.assertIn('department', serializer.errors)
+
+    def test_department_filter_uses_foreign_key(self):
+        make_textbook(title='Compilers')
+        make_textbook(title='Ledgers', department='accountancy')
+        choices.registry['department']
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get('/api/v1/textbooks/', {'department': 'Accountancy'}).json()
+        self.assertEqual([row['title'] for row in body['results']], ['Ledgers'])
+        self.assertFalse(any('core_department' in query['sql'] for query in queries))
+
+
+def cover_image(width, height, name='cover.png'):
+    """Build an uploaded PNG cover with a transparent corner."""
+    image = Image.new('RGBA', (width, height), (200, 40, 40, 255))
+    image.putpixel((0, 0), (0, 0, 0, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(IMAGE_RENDITIONS={'WIDTHS': (160, 320)})
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        get_catalogue_cache().invalidate()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.storage = Textbook._meta.get_field('image').storage
+
+    def make_textbook_with_cover(self, width=800, height=400):
+        with self.captureOnCommitCallbacks(execute=True):
+            textbook = make_textbook(image=cover_image(width, height))
+        self.assertEqual(tasks.run_pending(), 1)
+        textbook.refresh_from_db()
+        return textbook
+
+    def test_upload_generates_hashed_renditions(self):
+        textbook = self.make_textbook_with_cover()
+        renditions = textbook.image_renditions
+        self.assertEqual(renditions['source'], textbook.image.name)
+        self.assertEqual(set(renditions['webp']), {'160', '320'})
+        self.assertRegex(renditions['webp']['320'], r'^textbooks/renditions/cover-320w\.[0-9a-f]{12}\.webp$')
+        with self.storage.open(renditions['jpeg']['320']) as rendition:
+            image = Image.open(rendition)
+            self.assertEqual((image.format, image.size, image.mode), ('JPEG', (320, 160), 'RGB'))
+        body = self.client.get('/api/v1/textbooks/', {'fields': 'card'}).json()
+        self.assertEqual(
+            body['results'][0]['renditions']['webp']['160'],
+            f"http://testserver/media/{renditions['webp']['160']}",
+        )
+        detail = self.client.get(f'/api/v1/textbooks/{textbook.pk}/').json()
+        self.assertEqual(detail['renditions'], body['results'][0]['renditions'])
+
+    def test_narrow_cover_is_not_upscaled(self):
+        textbook = self.make_textbook_with_cover(width=120, height=180)
+        self.assertEqual(list(textbook.image_renditions['jpeg']), ['120'])
+
+    def test_replacing_cover_replaces_renditions(self):
+        textbook = self.make_textbook_with_cover()
+        old_files = images.rendition_names(textbook.image_renditions)
+        textbook.image = cover_image(400, 400, name='second.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            textbook.save()
+            self.assertEqual(textbook.image_renditions, {})
+        self.assertEqual(
+            sorted(Task.objects.filter(status='queued').values_list('name', flat=True)),
+            ['core.images.delete_renditions', 'core.images.generate_renditions'],
+        )
+        tasks.run_pending()
+        textbook.refresh_from_db()
+        self.assertEqual(list(textbook.image_renditions['webp']), ['160', '320'])
+        self.assertIn('second-160w', textbook.image_renditions['webp']['160'])
+        self.assertFalse(any(self.storage.exists(name) for name in old_files))
+
+        files = images.rendition_names(textbook.image_renditions)
+        with self.captureOnCommitCallbacks(execute=True):
+            textbook.delete()
+        tasks.run_pending()
+        self.assertFalse(any(self.storage.exists(name) for name in files))
+
+    def test_renditions_shared_with_another_textbook_are_kept(self):
+        textbook = self.make_textbook_with_cover()
+        files = images.rendition_names(textbook.image_renditions)
+        make_textbook(course_code='COM 112', image=textbook.image.name, image_renditions=textbook.image_renditions)
+        with self.captureOnCommitCallbacks(execute=True):
+            textbook.delete()
+        tasks.run_pending()
+        self.assertTrue(all(self.storage.exists(name) for name in files))
+        self.assertEqual(images.source_prefix(files[0]), 'textbooks/cover')
+
+    def test_unchanged_cover_is_not_regenerated(self):
+        textbook = self.make_textbook_with_cover()
+        textbook.stock = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            textbook.save()
+        self.assertFalse(Task.objects.filter(status='queued').exists())
+        self.assertFalse(images.generate_renditions(textbook.pk))
+
+
+flaky_calls = []
+
+
+@tasks.task(max_attempts=2)
+def flaky_task(value):
+    """Task failing until it has been called twice; used by TaskQueueTests."""
+    flaky_calls.append(value)
+    if len(flaky_calls) < 2:
+        raise RuntimeError('flaky')
+
+
+@override_settings(LOW_STOCK_THRESHOLD=5, ADMINS=[('Stores', 'stores@example.com')])
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        get_catalogue_cache().invalidate()
+        flaky_calls.clear()
+        self.client = APIClient()
+
+    def test_order_side_effects_run_in_background(self):
+        textbook = make_textbook(stock=7)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/orders/', order_payload([(textbook, 3)]), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(Task.objects.values_list('name', flat=True)),
+            ['core.jobs.check_stock_levels', 'core.jobs.record_order_sales', 'core.jobs.send_order_confirmation'],
+        )
+
+        self.assertEqual(tasks.run_pending(), 3)
+        self.assertEqual(set(Task.objects.values_list('status', flat=True)), {'succeeded'})
+        confirmation, alert = sorted(mail.outbox, key=lambda message: message.to)
+        self.assertEqual(confirmation.to, ['ada@example.com'])
+        self.assertIn('3 x Introduction to Programming', confirmation.body)
+        self.assertEqual(alert.to, ['stores@example.com'])
+        self.assertIn('4 left', alert.body)
+
+        # Already below the threshold: no second alert.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/orders/', order_payload([(textbook, 1)], reference='REF-0002'), format='json')
+        tasks.run_pending()
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_rejected_order_queues_nothing(self):
+        textbook = make_textbook(stock=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/orders/', order_payload([(textbook, 2)]), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.exists())
+
+    def test_failures_are_retried_with_backoff(self):
+        record = flaky_task.enqueue('a')
+        self.assertEqual(tasks.run_pending(), 1)
+        record.refresh_from_db()
+        self.assertEqual((record.status, record.attempts), ('queued', 1))
+        self.assertIn('RuntimeError: flaky', record.last_error)
+        self.assertGreater(record.run_at, timezone.now())
+        self.assertEqual(tasks.run_pending(), 0)
+
+        Task.objects.filter(pk=record.pk).update(run_at=timezone.now())
+        tasks.run_pending()
+        record.refresh_from_db()
+        self.assertEqual((record.status, record.attempts, record.last_error), ('succeeded', 2, ''))
+        self.assertEqual(flaky_calls, ['a', 'a'])
+
+    def test_tasks_fail_after_max_attempts(self):
+        record = flaky_task.enqueue('b')
+        with mock.patch.object(flaky_task, 'func', side_effect=RuntimeError('down')):
+            for _ in range(2):
+                Task.objects.filter(pk=record.pk).update(run_at=timezone.now())
+                tasks.run_pending()
+        record.refresh_from_db()
+        self.assertEqual((record.status, record.attempts), ('failed', 2))
+        self.assertIsNotNone(record.finished_at)
+
+    def test_backoff_doubles_up_to_limit(self):
+        options = {'BACKOFF': 2.0, 'MAX_BACKOFF': 10}
+        with mock.patch('core.tasks.random.uniform', return_value=1.0):
+            self.assertEqual(
+                [tasks.backoff(attempts, options).total_seconds() for attempts in (1, 2, 3, 4)],
+                [2.0, 4.0, 8.0, 10.0],
+            )
+
+    def test_claims_are_exclusive_and_lost_tasks_requeued(self):
+        record = flaky_task.enqueue('c')
+        self.assertEqual(tasks.claim('first', 5), [record.pk])
+        self.assertEqual(tasks.claim('second', 5), [])
+        self.assertIsNone(tasks.execute(record.pk, 'second'))
+
+        Task.objects.filter(pk=record.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(tasks.requeue_lost(), 1)
+        self.assertEqual(tasks.claim('second', 5), [record.pk])
+
+
+class TextbookImportTests(TestCase):
+    header = 'title,course_code,department,level,price,description,stock,is_popular\n'
+
+    def import_file(self, content, suffix='.csv', *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8') as file:
+            file.write(content)
+        self.addCleanup(os.unlink, file.name)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_textbooks', file.name, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_reading_stdin_leaves_it_open(self):
+        stdin = io.StringIO(self.header + 'Compilers,COM 411,computer_science,hnd2,4000,,2,no\n')
+        with mock.patch('sys.stdin', stdin):
+            call_command('import_textbooks', '-', '--format', 'csv', stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertFalse(stdin.closed)
+        self.assertTrue(Textbook.objects.filter(title='Compilers').exists())
+
+    def test_csv_rows_are_upserted_and_errors_reported(self):
+        existing = make_textbook(title='Data Structures', course_code='COM 212', stock=4, description='Old')
+        stdout, stderr = self.import_file(self.header + (
+            'Data Structures,COM 212,Computer Science,ND 2,3100.00,,9,yes\n'
+            'Financial Accounting,ACC 111,accountancy,nd1,2500,Ledgers,12,no\n'
+            'Broken,ACC 112,Basket Weaving,nd1,10,,1,no\n'
+            ',ACC 113,accountancy,nd1,ten,,1,no\n'
+            'Cost Accounting,ACC 211,accountancy,hnd1,4000.505,,1,no\n'
+        ), '.csv', '--batch-size', '1')
+        self.assertIn('Imported 2 textbooks, skipped 3 invalid rows', stdout)
+        self.assertEqual(stderr.splitlines(), [
+            'Row 3: department: Unknown department "Basket Weaving".',
+            'Row 4: title: This field is required.',
+            'Row 5: price: Must be a non-negative amount below 100,000,000 with at most 2 decimal places.',
+        ])
+
+        existing.refresh_from_db()
+        self.assertEqual(
+            (existing.level, existing.price, existing.stock, existing.is_popular, existing.description),
+            ('nd2', Decimal('3100.00'), 9, True, 'Old'),
+        )
+        created = Textbook.objects.get(course_code='ACC 111')
+        self.assertEqual((created.department.code, created.stock, created.description), ('accountancy', 12, 'Ledgers'))
+        self.assertEqual(Textbook.objects.count(), 2)
+
+    def test_json_array_streams_in_chunks(self):
+        rows = [
+            {'title': f'Circuit Theory {index}', 'course_code': 'EEC 115', 'department': 'electrical_engineering',
+             'level': 'HND 1', 'price': 1500 + index, 'stock': index}
+            for index in range(25)
+        ]
+        # Row 4 was already written in the first batch; row 25 is still pending.
+        for index in (3, 24):
+            rows.append({'title': f'Circuit Theory {index}', 'course_code': 'EEC 115',
+                         'department': 'electrical_engineering', 'level': 'nd1', 'price': '99.99'})
+        with mock.patch.dict(imports.READERS, json=functools.partial(imports.read_json, chunk_size=16)):
+            stdout, stderr = self.import_file(json.dumps(rows), '.json', '--batch-size', '10')
+        self.assertIn('Imported 26 textbooks, skipped 0 invalid rows, 1 rows were repeated later in the file', stdout)
+        self.assertEqual(Textbook.objects.count(), 25)
+        for title, stock in (('Circuit Theory 3', 3), ('Circuit Theory 24', 0)):
+            repeated = Textbook.objects.get(title=title)
+            self.assertEqual((repeated.level, repeated.price, repeated.stock), ('nd1', Decimal('99.99'), stock))
+
+    def test_ndjson_bad_lines_do_not_stop_the_import(self):
+        stdout, stderr = self.import_file(
+            '{"title": "Surveying", "course_code": "SUR 101", "department": "civil_engineering", '
+            '"level": "nd1", "price": 2000}\n'
+            '{not json}\n'
+            '"just a string"\n',
+            '.ndjson',
+        )
+        self.assertIn('Imported 1 textbooks, skipped 2 invalid rows', stdout)
+        self.assertTrue(stderr.startswith('Row 2: row: Invalid JSON'))
+        self.assertIn('Row 3: row: Expected an object.', stderr)
+
+    def test_dry_run_and_bad_headers(self):
+        stdout, _ = self.import_file(self.header + 'Statics,MEC 101,mechanical_engineering,nd1,100,,,\n', '.csv', '--dry-run')
+        self.assertIn('Validated 1 textbooks', stdout)
+        self.assertFalse(Textbook.objects.exists())
+        with self.assertRaisesMessage(CommandError, 'Missing CSV columns: department, level, price.'):
+            self.import_file('title,course_code\nStatics,MEC 101\n')
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser(username='admin', password='secret', email='admin@example.com')
+        self.client.force_login(user)
+        self.textbook = make_textbook()
+        for index in range(4):
+            make_order(f'REF-{index}', [(self.textbook, 1)], matric_number=f'F/ND/23/{index:04d}')
+
+    def changelist_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_order_items_do_not_query_per_row(self):
+        _, before = self.changelist_queries('/admin/core/orderitem/')
+        for index in range(4, 10):
+            make_order(f'REF-{index}', [(self.textbook, 2)])
+        _, after = self.changelist_queries('/admin/core/orderitem/')
+        self.assertEqual(len(after), len(before))
+
+    def test_large_tables_are_not_counted(self):
+        with mock.patch.object(EstimatedCountPaginator, 'exact_threshold', 2):
+            response, queries = self.changelist_queries('/admin/core/order/')
+        self.assertEqual(response.context['cl'].result_count, Order.objects.latest('id').pk)
+        self.assertFalse(any('COUNT(' in sql and 'FROM "core_order"' in sql for sql in queries))
+        self.assertFalse(any('DISTINCT' in sql and '"level"' in sql for sql in queries))
+
+    def test_search_uses_exact_and_prefix_lookups(self):
+        response, queries = self.changelist_queries('/admin/core/order/', {'q': 'F/ND/23/000'})
+        self.assertEqual(response.context['cl'].result_count, 4)
+        response, queries = self.changelist_queries('/admin/core/order/', {'q': 'REF-2'})
+        self.assertEqual([order.reference for order in response.context['cl'].result_list], ['REF-2'])
+        search = next(sql for sql in queries if 'REF-2' in sql and 'LIMIT' in sql)
+        self.assertIn('"core_order"."reference" = \'REF-2\'', search)
+        self.assertNotIn('%REF-2%', search)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+    def test_prefix_search_uses_indexes(self):
+        response, _ = self.changelist_queries('/admin/core/order/', {'q': 'f/nd/23/000'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+        for queryset, column in (
+            (Order.objects.filter(matric_number__prefix='F/ND/23/000'), 'matric_number'),
+            (Order.objects.filter(student_name__prefix='Ada'), 'student_name'),
+            (OrderItem.objects.filter(book_title__prefix='Intro'), 'book_title'),
+        ):
+            with self.subTest(column=column):
+                plan = queryset.order_by().explain()
+                self.assertRegex(plan, rf'SEARCH core_order(item)? USING (COVERING )?INDEX \w+ \({column}>\? AND {column}<\?\)')
+                self.assertNotRegex(plan, r'SCAN core_order(item)?(?! USING)')
+
+    def test_level_filter_matches_display_names(self):
+        make_order('REF-LABEL', [(self.textbook, 1)], level='ND 1')
+        make_order('REF-HND', [(self.textbook, 1)], level='hnd1')
+        response, _ = self.changelist_queries('/admin/core/order/', {'level': 'nd1'})
+        references = {order.reference for order in response.context['cl'].result_list}
+        self.assertEqual(references, {'REF-0', 'REF-1', 'REF-2', 'REF-3', 'REF-LABEL'})
+
+    def test_filtered_counts_are_capped(self):
+        with mock.patch.object(EstimatedCountPaginator, 'max_count', 3):
+            response, _ = self.changelist_queries('/admin/core/order/', {'status__exact': 'pending'})
+        self.assertEqual(response.context['cl'].result_count, 3)
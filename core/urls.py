@@ -1,13 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TextbookViewSet, OrderViewSet
+from . import async_views
+from .views import TextbookViewSet, OrderViewSet, ReportViewSet, StatsViewSet
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
 router.register(r'textbooks', TextbookViewSet)
 router.register(r'orders', OrderViewSet)
+router.register(r'reports', ReportViewSet, basename='report')
+router.register(r'stats', StatsViewSet, basename='stats')
 
 # The API URLs are now determined automatically by the router
 urlpatterns = [
     path('', include(router.urls)),
+    # Async catalogue reads for ASGI deployments
+    path('async/textbooks/', async_views.textbook_list, name='async-textbook-list'),
+    path('async/textbooks/filters/', async_views.textbook_filters, name='async-textbook-filters'),
+    path('async/textbooks/<int:pk>/', async_views.textbook_detail, name='async-textbook-detail'),
 ]
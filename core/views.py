@@ -1,15 +1,53 @@
+import hashlib
+import logging
+from decimal import Decimal
+from datetime import datetime, time, timedelta
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.shortcuts import render
-from rest_framework import viewsets, permissions, serializers
-from .models import Textbook, Order
-from .serializers import TextbookSerializer, OrderSerializer
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import viewsets, permissions, status
+from rest_framework.renderers import BrowsableAPIRenderer
+from .models import DailySales, Textbook, Order, OrderItem
+from .serializers import (
+    TextbookSerializer, OrderSerializer, OrderExportSerializer, OrderLookupSerializer, SalesReportSerializer,
+)
+from . import choices, jobs, rollups
+from .exports import EXPORT_FORMATS
+from .fastpath import CompiledListMixin, compile_serializer
+from .idempotency import (
+    IdempotencyConflict, idempotency_key, remember_response, replay_response, request_fingerprint,
+)
+from .cache import get_catalogue_cache, normalize_params
+from .pagination import KeysetCursorPagination
+from .profiling import get_profile_stats, get_profiling_settings
+from .renderers import FastJSONRenderer
+from .search import get_search_backend
+from .stock import StockContention, aggregate_quantities, reserve_stock
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from django.db.models import Q
+from django.db.models import Count, Max, Prefetch, Sum
+from django.db.models.functions import Coalesce
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db import transaction
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import ScopedRateThrottle
+from django.db import IntegrityError, OperationalError, transaction
+
+logger = logging.getLogger(__name__)
+
+# Filter options change only with a deploy (or a Department edit).
+FILTERS_CACHE_CONTROL = 'public, max-age=3600'
+
+# The catalogue and order views, whose list pages are large, render with
+# orjson; other endpoints keep DRF's JSONRenderer.
+FAST_RENDERER_CLASSES = [FastJSONRenderer, BrowsableAPIRenderer]
 
 @extend_schema(tags=['textbooks'])
-class TextbookViewSet(viewsets.ModelViewSet):
+class TextbookViewSet(CompiledListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing textbooks.
     
@@ -19,28 +57,105 @@ class TextbookViewSet(viewsets.ModelViewSet):
     queryset = Textbook.objects.all()
     serializer_class = TextbookSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetCursorPagination
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def list(self, request, *args, **kwargs):
+        """
+        List textbooks through the catalogue cache.
+        
+        Honours If-None-Match/If-Modified-Since using validators derived
+        from the row count and latest updated_at of the filtered queryset.
+        """
+        summary = self.filter_queryset(self.get_queryset()).aggregate(
+            count=Count('id'), last_modified=Max('updated_at')
+        )
+        return self.conditional_response(
+            'list', summary['last_modified'], f"count={summary['count']}",
+            lambda: super(TextbookViewSet, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve a textbook through the catalogue cache.
+        
+        Honours If-None-Match/If-Modified-Since using the textbook's updated_at.
+        """
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            last_modified = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: lookup}
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            # As DRF's get_object_or_404 does, a malformed lookup is a 404.
+            raise Http404
+        return self.conditional_response(
+            f"detail:{lookup}", last_modified, f"exists={last_modified is not None}",
+            lambda: super(TextbookViewSet, self).retrieve(request, *args, **kwargs)
+        )
+
+    def conditional_response(self, namespace, last_modified, fingerprint, handler):
+        """
+        Answer a catalogue read, short-circuiting with 304 when the client is current.
+        
+        No rows are serialized when the client's validators still match
+        (see catalogue_validators). The cached body is keyed on the same
+        ETag, so a change the cache generation missed (another process, a
+        queryset ``update()``) is never served under the new tag.
+        
+        Args:
+            namespace (str): Endpoint name used for the ETag and cache key
+            last_modified (datetime): Latest updated_at covered by the response
+            fingerprint (str): Extra state that should change the ETag
+            handler: Callable producing the full response on a miss
+        """
+        validators, conditional = catalogue_validators(self.request, namespace, last_modified, fingerprint)
+        if conditional is not None:
+            return conditional
+
+        response = self.cached_response(namespace, validators['ETag'], handler)
+        for header in ('ETag', 'Last-Modified'):
+            if header in validators:
+                response[header] = validators[header]
+        return response
+
+    def cached_response(self, namespace, etag, handler):
+        """
+        Serve response data from the catalogue cache, calling handler on a miss.
+        
+        The X-Cache header reports whether the response was a HIT or MISS.
+        """
+        # Paginated responses embed absolute next/previous links, so the
+        # origin is part of the key.
+        origin = f"{self.request.scheme}://{self.request.get_host()}"
+        version = etag.strip('"')
+        data, hit = get_catalogue_cache().get_or_set(
+            f"{origin}/{namespace}:{version}", self.request.query_params, lambda: handler().data
+        )
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
 
     @action(detail=False, methods=['get'])
     def filters(self, request):
         """
         Get available filter options for textbooks.
         
+        The body is precomputed and served with an ETag and Cache-Control,
+        so clients and proxies can reuse it (see filters_validators).
+        
         Returns:
             dict: Available departments and levels for filtering
         """
-        departments = [choice[1] for choice in Textbook.DEPARTMENT_CHOICES]
-        levels = [choice[1] for choice in Textbook.LEVEL_CHOICES]
-        
-        return Response({
-            'departments': departments,
-            'levels': levels
-        })
+        options, headers, conditional = filters_validators(request)
+        if conditional is not None:
+            return conditional
+        return Response(options.data, headers=headers)
 
     @extend_schema(
         parameters=[
             OpenApiParameter(name='department', description='Filter by department', required=False, type=str),
             OpenApiParameter(name='level', description='Filter by level', required=False, type=str),
-            OpenApiParameter(name='search', description='Search in title and course code', required=False, type=str),
+            OpenApiParameter(name='search', description='Ranked prefix search in title, course code and description', required=False, type=str),
+            OpenApiParameter(name='fields', description='Comma-separated fields to return, or "card" for the compact catalogue card', required=False, type=str),
         ]
     )
     def get_queryset(self):
@@ -50,35 +165,118 @@ class TextbookViewSet(viewsets.ModelViewSet):
         Filters:
             department: Filter by academic department
             level: Filter by academic level
-            search: Search in title and course code
-        """
-        queryset = Textbook.objects.all()
-        department = self.request.query_params.get('department', None)
-        level = self.request.query_params.get('level', None)
-        search = self.request.query_params.get('search', None)
-
-        if department and department != "All Departments":
-            department_value = next((choice[0] for choice in Textbook.DEPARTMENT_CHOICES 
-                                  if choice[1] == department), None)
-            if department_value:
-                queryset = queryset.filter(department=department_value)
-                
-        if level and level != "All Levels":
-            level_value = next((choice[0] for choice in Textbook.LEVEL_CHOICES 
-                              if choice[1] == level), None)
-            if level_value:
-                queryset = queryset.filter(level=level_value)
-
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(course_code__icontains=search)
-            )
+            search: Ranked prefix search over title, course code and description
+        """
+        return textbook_queryset(self.request.query_params, self.sparse_fields)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fields is not None:
+            kwargs.setdefault('fields', self.sparse_fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_compiled_serializer(self):
+        if not self.fast_serialization:
+            return None
+        return compile_serializer(self.get_serializer_class(), self.sparse_fields)
+
+    @cached_property
+    def sparse_fields(self):
+        """
+        Fields requested with ``?fields=`` on reads, or None for every field.
         
-        return queryset
+        Raises:
+            ValidationError: If an unknown field is requested
+        """
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        return self.get_serializer_class().requested_fields(self.request.query_params)
+
+def textbook_queryset(params, fields=None):
+    """
+    Build the catalogue queryset for the department, level and search parameters.
+    
+    Shared by TextbookViewSet and the async catalogue views. A search may
+    query the database while building the queryset (see core.search).
+    With a sparse fieldset, only the requested columns are loaded.
+    """
+    queryset = Textbook.objects.all()
+    if fields:
+        # The pagination keys are needed whichever fields are rendered.
+        columns = {field.name for field in Textbook._meta.concrete_fields}
+        sources = TextbookSerializer.field_sources()
+        queryset = queryset.only('id', 'created_at', *(sources[name] for name in fields if sources[name] in columns))
+    department = params.get('department', None)
+    level = params.get('level', None)
+    search = params.get('search', None)
+
+    # Keys and display names are both accepted; anything else, such as
+    # "All Departments", leaves the filter off.
+    department_value = choices.registry['department'].department(department)
+    if department_value:
+        queryset = queryset.filter(department=department_value)
+            
+    level_value = choices.registry['level'].resolve(level)
+    if level_value:
+        queryset = queryset.filter(level=level_value)
+
+    if search:
+        queryset = get_search_backend().filter_queryset(queryset, search)
+    
+    return queryset
+
+def catalogue_validators(request, namespace, last_modified, fingerprint):
+    """
+    Compute the ETag/Last-Modified of a catalogue read and evaluate the request's conditions.
+    
+    The strong ETag covers the endpoint, the normalized query parameters,
+    the given fingerprint and last_modified, so any change to the rows or
+    to the requested representation produces a new tag.
+    
+    Returns:
+        tuple: A response holding the validator headers, and the 304/412
+        response to send instead of the content, or None
+    """
+    params = normalize_params(request.GET)
+    stamp = last_modified.isoformat() if last_modified else ''
+    digest = hashlib.sha1(f"{namespace}|{params}|{fingerprint}|{stamp}".encode('utf-8')).hexdigest()
+
+    validators = HttpResponse()
+    validators['ETag'] = f'"{digest}"'
+    timestamp = None
+    if last_modified:
+        timestamp = int(last_modified.timestamp())
+        validators['Last-Modified'] = http_date(timestamp)
+
+    conditional = get_conditional_response(
+        request, etag=validators['ETag'], last_modified=timestamp, response=validators
+    )
+    return validators, None if conditional is validators else conditional
+
+def filters_validators(request):
+    """
+    Get the textbook filter options and evaluate the request's conditions against their ETag.
+    
+    Returns:
+        tuple: The FilterOptions, the caching headers to send with them,
+        and the 304/412 response to send instead, or None
+    """
+    options = choices.filter_options()
+    validators = HttpResponse()
+    validators['ETag'] = options.etag
+    validators['Cache-Control'] = FILTERS_CACHE_CONTROL
+    conditional = get_conditional_response(request, etag=options.etag, response=validators)
+    headers = {header: validators[header] for header in ('ETag', 'Cache-Control')}
+    return options, headers, None if conditional is validators else conditional
+
+def start_of_day(day):
+    """Return the aware datetime at which a calendar date starts in the current timezone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+# Columns OrderItemSerializer needs, plus the keys required by the prefetch.
+ORDER_ITEM_COLUMNS = ('id', 'order', 'textbook', 'quantity', 'price', 'book_title', 'course_code')
 
 @extend_schema(tags=['orders'])
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(CompiledListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing orders.
     
@@ -89,60 +287,271 @@ class OrderViewSet(viewsets.ModelViewSet):
     """
     serializer_class = OrderSerializer
     permission_classes = []
+    pagination_class = KeysetCursorPagination
+    renderer_classes = FAST_RENDERER_CLASSES
     lookup_field = 'reference'
     lookup_url_kwarg = 'reference'
     queryset = Order.objects.all()
+    export_chunk_size = 500
+    # Only applies to actions throttled with ScopedRateThrottle (lookup).
+    throttle_scope = 'order-lookup'
 
     def get_queryset(self):
         """
         Get orders queryset based on user permissions.
         Staff can see all orders, others can see their own orders.
+        
+        Items are prefetched in one query, trimmed to the columns
+        OrderItemSerializer renders.
         """
-        queryset = Order.objects.all()
+        queryset = Order.objects.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.only(*ORDER_ITEM_COLUMNS))
+        )
+        if self.action == 'lookup':
+            student = getattr(self, 'student', None)
+            if student is None:
+                return queryset.none()
+            # matric_number leads the (matric_number, student_name) index;
+            # the email is only checked against that student's orders.
+            return queryset.filter(
+                matric_number=student['matric_number'], student_email__iexact=student['email']
+            )
         if not self.request.user.is_staff:
             # Allow users to view their own orders by reference
             reference = self.kwargs.get('reference')
             if reference:
                 return queryset.filter(reference=reference)
-            return Order.objects.none()
+            return queryset.none()
         return queryset
 
+    @extend_schema(
+        parameters=[OrderExportSerializer],
+        responses={(200, 'text/csv'): str, (200, 'application/x-ndjson'): str},
+    )
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """
+        Stream orders with their items as CSV or NDJSON for staff reporting.
+        
+        Orders are read with QuerySet.iterator(), and their items are
+        prefetched one chunk at a time, so memory stays flat however many
+        orders match.
+        
+        Filters:
+            output: csv (default) or ndjson
+            status: Order status
+            department: Student department, as code or display name
+            level: Student level, as key or display name
+            date_from/date_to: Inclusive creation date range
+        """
+        params = OrderExportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+
+        queryset = Order.objects.order_by('created_at', 'id').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.only(*ORDER_ITEM_COLUMNS))
+        )
+        if 'status' in filters:
+            queryset = queryset.filter(status=filters['status'])
+        if 'department' in filters:
+            queryset = queryset.filter(department=filters['department'])
+        if 'level' in filters:
+            queryset = queryset.filter(level__in=choices.registry['level'].stored_values(filters['level']))
+        if 'date_from' in filters:
+            queryset = queryset.filter(created_at__gte=start_of_day(filters['date_from']))
+        if 'date_to' in filters:
+            queryset = queryset.filter(created_at__lt=start_of_day(filters['date_to'] + timedelta(days=1)))
+
+        stream, content_type = EXPORT_FORMATS[filters['output']]
+        response = StreamingHttpResponse(
+            stream(queryset.iterator(chunk_size=self.export_chunk_size)), content_type=content_type
+        )
+        filename = f"orders-{timezone.localdate():%Y%m%d}.{filters['output']}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @extend_schema(parameters=[OrderLookupSerializer], responses=OrderSerializer(many=True))
+    @action(detail=False, methods=['get'], throttle_classes=[ScopedRateThrottle])
+    def lookup(self, request):
+        """
+        List a student's orders, newest first, for the student themselves.
+        
+        The matric number must come with the email given at checkout. A
+        wrong email returns an empty page, the same as an unknown matric
+        number, so the endpoint does not reveal which students have
+        ordered. Requests are rate limited per client by the
+        "order-lookup" throttle scope.
+        
+        Filters:
+            matric_number: Student's matriculation number (exact)
+            email: Student's email (case-insensitive)
+        """
+        params = OrderLookupSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        self.student = params.validated_data
+        return self.list(request)
+
     def perform_create(self, serializer):
         """
         Create order with atomic transaction handling.
         
-        Validates stock availability and updates stock levels
-        for all items in the order.
+        Reserves stock for all items in the order with a single locked
+        query before the order is saved. The response is stored for
+        idempotent replay in the same transaction. The confirmation email,
+        stock alerts and sales rollup update are queued as background tasks
+        once it commits.
         
         Raises:
             ValidationError: If insufficient stock for any item
+            IntegrityError: If a concurrent request with the same
+                idempotency key or reference committed first
         """
-        items_data = self.request.data.get('items', [])
+        quantities = aggregate_quantities(serializer.validated_data.get('items', []))
+        key, fingerprint = getattr(self, 'idempotency', (None, None))
         
         with transaction.atomic():
-            # First validate stock for all items
-            for item in items_data:
-                textbook = Textbook.objects.select_for_update().get(id=item['textbook'])
-                if textbook.stock < item['quantity']:
-                    raise serializers.ValidationError({
-                        'detail': f"Insufficient stock for {textbook.title}. Only {textbook.stock} available."
-                    })
-
-            # If all stock checks pass, create order and update stock
+            reserve_stock(quantities)
             order = serializer.save()
-            
-            for item in items_data:
-                textbook = Textbook.objects.select_for_update().get(id=item['textbook'])
-                textbook.stock -= item['quantity']
-                textbook.save()
+            remember_response(key, fingerprint, status.HTTP_201_CREATED, serializer.data, order)
+            jobs.send_order_confirmation.delay(order.pk)
+            jobs.check_stock_levels.delay(list(quantities.items()))
+            items = [OrderItem(order=order, **item) for item in serializer.validated_data['items']]
+            jobs.record_order_sales.delay(rollups.dump_deltas(rollups.order_deltas(order, items, order.status)))
 
     def create(self, request, *args, **kwargs):
         """
-        Create order with debug logging.
+        Create order idempotently, logging the outcome.
+        
+        Retries carrying the same Idempotency-Key header (or, without one,
+        the same reference) and body get the first response back, without
+        locking stock again. A checkout whose transaction hits a lock
+        timeout, deadlock or serialization failure is rolled back and
+        answered with 409 (StockContention), so the client can retry it.
+        
+        Successful orders are logged at INFO (subject to sampling); rejected
+        and failed ones always are, with the submitted payload. Personal
+        fields are redacted by the logging filters.
         """
         try:
-            print("Received order data:", request.data)  # Debug log
-            return super().create(request, *args, **kwargs)
-        except Exception as e:
-            print("Order creation error:", str(e))  # Debug log
+            key = idempotency_key(request)
+            fingerprint = request_fingerprint(request.data)
+            response = replay_response(key, fingerprint)
+            if response is None:
+                self.idempotency = (key, fingerprint)
+                try:
+                    response = super().create(request, *args, **kwargs)
+                except IntegrityError:
+                    # A concurrent retry committed first; its transaction
+                    # holds the stock, ours was rolled back.
+                    response = replay_response(key, fingerprint)
+                    if response is None:
+                        raise IdempotencyConflict()
+                except OperationalError:
+                    # Lock timeout, deadlock or serialization failure: the
+                    # whole transaction was rolled back, so retrying it is safe.
+                    raise StockContention()
+        except APIException as exc:
+            logger.warning('Order rejected', extra={'errors': exc.detail, 'payload': request.data})
+            raise
+        except Exception:
+            logger.exception('Order creation failed', extra={'payload': request.data})
             raise
+        logger.info('Order replayed' if response.has_header('Idempotent-Replayed') else 'Order created', extra={
+            'reference': response.data['reference'],
+            'items': len(response.data['items']),
+            'total_amount': response.data['total_amount'],
+        })
+        return response
+
+
+@extend_schema(tags=['reports'])
+class ReportViewSet(viewsets.GenericViewSet):
+    """
+    ViewSet serving staff sales dashboards from the DailySales rollup.
+    
+    Reports never scan orders; they aggregate the precomputed daily rows.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    queryset = DailySales.objects.all()
+
+    # Rollup columns each grouping selects.
+    GROUP_COLUMNS = {
+        'day': ('date',),
+        'department': ('department',),
+        'level': ('level',),
+        'textbook': ('textbook', 'textbook__title', 'textbook__course_code'),
+    }
+
+    @extend_schema(parameters=[SalesReportSerializer])
+    @action(detail=False, methods=['get'])
+    def sales(self, request):
+        """
+        Get sales totals grouped by day, department, level or textbook.
+        
+        Returns:
+            dict: The grouping, one row per group and the overall totals
+        """
+        params = SalesReportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+
+        queryset = DailySales.objects.all()
+        if filters['status'] != 'all':
+            queryset = queryset.filter(status=filters['status'])
+        for field in ('department', 'level'):
+            if field in filters:
+                queryset = queryset.filter(**{field: filters[field]})
+        if 'date_from' in filters:
+            queryset = queryset.filter(date__gte=filters['date_from'])
+        if 'date_to' in filters:
+            queryset = queryset.filter(date__lte=filters['date_to'])
+
+        totals = {
+            'quantity': Coalesce(Sum('quantity'), 0),
+            'revenue': Coalesce(Sum('revenue'), Decimal('0')),
+            'order_count': Coalesce(Sum('order_count'), 0),
+        }
+        columns = self.GROUP_COLUMNS[filters['group_by']]
+        rows = list(queryset.values(*columns).annotate(**totals).order_by(*columns))
+        if filters['group_by'] == 'department':
+            # Grouped on the integer key; report department codes, in code order.
+            for row in rows:
+                row['department'] = choices.department_code(row['department'])
+            rows.sort(key=lambda row: row['department'])
+
+        return Response({
+            'group_by': filters['group_by'],
+            'status': filters['status'],
+            'results': rows,
+            'totals': queryset.aggregate(**totals),
+        })
+
+
+@extend_schema(tags=['stats'])
+class StatsViewSet(viewsets.ViewSet):
+    """
+    ViewSet exposing in-process performance statistics to staff.
+    
+    Figures are per worker process and reset on restart.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @action(detail=False, methods=['get', 'delete'])
+    def profiling(self, request):
+        """
+        Get the request profile histogram of every view, or clear it with DELETE.
+        
+        Returns:
+            dict: Whether profiling is enabled, per-view timings and the
+            catalogue cache hit counters
+        """
+        stats = get_profile_stats()
+        if request.method == 'DELETE':
+            stats.reset()
+            get_catalogue_cache().reset_stats()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response({
+            'enabled': get_profiling_settings()['ENABLED'],
+            'views': stats.snapshot(),
+            'catalogue_cache': get_catalogue_cache().stats(),
+        })
@@ -49,6 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.logs.CorrelationIdMiddleware',
+    # Early so it times the whole chain; inactive unless PROFILING['ENABLED'] is set
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -141,6 +144,9 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_RATES': {
+        'order-lookup': '30/hour',
+    },
 }
 
 # JWT settings
@@ -172,5 +178,106 @@ SPECTACULAR_SETTINGS = {
         {'name': 'auth', 'description': 'Authentication operations'},
         {'name': 'textbooks', 'description': 'Textbook management'},
         {'name': 'orders', 'description': 'Order management'},
+        {'name': 'reports', 'description': 'Sales and inventory reports'},
+        {'name': 'stats', 'description': 'In-process performance statistics'},
     ],
 }
+
+# Catalogue cache settings
+# BACKEND may be core.cache.RedisBackend with OPTIONS={'url': 'redis://...'}
+CATALOGUE_CACHE = {
+    'BACKEND': 'core.cache.LocalMemoryBackend',
+    'OPTIONS': {'max_entries': 1000},
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'catalogue',
+}
+
+# Textbook search settings
+# BACKEND is 'auto', 'core.search.SQLiteFTSBackend' or 'core.search.InvertedIndexBackend'
+TEXTBOOK_SEARCH = {
+    'BACKEND': 'auto',
+    'OPTIONS': {},
+}
+
+# Stock reservation at checkout
+# BACKEND is 'core.stock.LockingStockEngine' (select_for_update) or
+# 'core.stock.OptimisticStockEngine' (conditional UPDATEs, no row locks)
+STOCK_ENGINE = {
+    'BACKEND': 'core.stock.LockingStockEngine',
+    'OPTIONS': {},
+}
+
+# Cover image renditions, generated by a background task (see TASKS) after upload
+IMAGE_RENDITIONS = {
+    'WIDTHS': (160, 320, 640),
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+}
+
+# Background tasks, run by `python manage.py worker` from the core_task table
+# POOL is 'thread', 'process' or 'inline'; EAGER runs tasks in-process on commit instead
+TASKS = {
+    'CONCURRENCY': 4,
+    'POOL': 'thread',
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF': 2.0,
+    'MAX_BACKOFF': 600,
+    'LOCK_TIMEOUT': 600,
+    'EAGER': False,
+}
+
+# Seconds an order response is replayed for its Idempotency-Key (or reference);
+# run `python manage.py purge_idempotency_records` regularly to delete expired ones
+IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Staff are emailed when an order takes a textbook to this stock level or below
+LOW_STOCK_THRESHOLD = 5
+
+# Order confirmations; the console backend prints emails in development
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'EduText <no-reply@edutext.local>'
+
+# Per-request profiling (Server-Timing headers and /api/v1/stats/profiling/)
+PROFILING = {
+    'ENABLED': False,
+    'SERVER_TIMING': True,
+    'BUCKETS': (5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+}
+
+# Structured logging: JSON lines written by a background thread
+# The sample filter keeps `rate` of routine records; warnings and errors are always kept
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'correlation_id': {'()': 'core.logs.CorrelationIdFilter'},
+        'sample': {'()': 'core.logs.SamplingFilter', 'rate': 1.0},
+        'redact': {
+            '()': 'core.logs.RedactingFilter',
+            'fields': [
+                'student_email', 'student_name', 'matric_number', 'phone_number',
+                'password', 'token', 'refresh', 'access',
+            ],
+        },
+    },
+    'formatters': {
+        'json': {'()': 'core.logs.JsonFormatter'},
+    },
+    'handlers': {
+        'queue': {
+            'class': 'core.logs.QueueingHandler',
+            'target': 'logging.StreamHandler',
+            'queue_size': 10000,
+            'filters': ['correlation_id', 'sample', 'redact'],
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}